@@ -7,42 +7,180 @@ __version__ = "1.0.0"
 # Erik K. Nyquist 2022
 
 import array
+import bisect
+import bz2
+import collections
+import concurrent.futures
+import functools
+import glob
+import gzip
 import io
+import itertools
+import json
+import lzma
+import mmap
+import multiprocessing
+import operator
+import os
+import stat
+import struct
+import sys
+import time
+import zlib
 from typing import *
 
+try:
+    from boyermoore import _speedups
+except ImportError:
+    _speedups = None
+
 # We want to support Unicode strings, so instead of having an alphabet based
 # on ASCII chars or UTF-8 code points, the alphabet is based on byte values,
 # which requires an alphabet size of 256 for all possible byte values (0x0-0xff)
 ALPHABET_SIZE = 256
 
+# Patterns at least this long use the compact bad character table by default,
+# since the full table grows with ALPHABET_SIZE * len(pattern)
+COMPACT_TABLE_MIN_LENGTH = 256
+
+# Names of the string search algorithms that can be passed to preprocess
+ALGORITHMS = ("bm", "horspool", "sunday", "raita", "two-way", "byte-class", "rare-byte")
+
+# Bytes that are common in text files (source code, logs and documentation), from most to
+# least common. The "rare-byte" algorithm searches for the byte of the pattern that comes
+# latest in this list, and all bytes that are not in it are considered rarer than any
+# byte that is.
+RARE_BYTE_ORDER = (b' etisoanr/lpc\ndmub.h_fg-0y12:vxkw3S\tA,4()TC695RL*IE87N+MDPF>O<\'Bq=z"@GU'
+                   b'`jHJ#W\\[]KVXY;\r|~{}Z$&%Q!^?')
+
+# When preprocess is called with algorithm="auto", patterns of at least AUTO_BM_MIN_LENGTH
+# bytes made of no more than AUTO_BM_MAX_DISTINCT_BYTES different byte values are searched
+# with Boyer-Moore, except for patterns of at least AUTO_TWO_WAY_MIN_LENGTH bytes that
+# repeat with a period of no more than AUTO_TWO_WAY_MAX_PERIOD bytes, which are searched
+# with Two-Way. Everything else is searched with Boyer-Moore-Horspool. These thresholds
+# come from the "algorithms" suite of scripts/speed_test.py, in both backends: the good
+# suffix rule only beats Horspool's cheaper loop for long patterns over an alphabet of 2
+# bytes, and already loses on DNA (4 byte values).
+AUTO_BM_MIN_LENGTH = 32
+AUTO_BM_MAX_DISTINCT_BYTES = 2
+AUTO_TWO_WAY_MIN_LENGTH = 64
+AUTO_TWO_WAY_MAX_PERIOD = 2
+
+# Default number of bytes read from a file at a time when searching files
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# Default number of seconds that follow_file waits before checking a file for new data again
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Maximum number of bytes from the start of a file that are checksummed in a follow_file
+# checkpoint, to tell the file apart from a new file that was given the same inode number
+CHECKPOINT_HEAD_SIZE = 256
+
+# Default size in bytes of the blocks that build_index splits a file into, and of the
+# signature stored for each block, recording which 3-byte sequences occur in the block
+INDEX_BLOCK_SIZE = 16 * 1024
+INDEX_SIGNATURE_SIZE = 2048
+
+# Maximum number of 3-byte sequences from a pattern that IndexedFile looks up in the index
+INDEX_MAX_GRAMS = 64
+
+# Name of the implementation of the Boyer-Moore shift loop that is in use, either "native"
+# if the optional compiled extension is available, or "python" otherwise
+backend = "python" if _speedups is None else "native"
+
+# Maximum number of pre-processed patterns kept in the cache used by search_string,
+# search_file, and the other functions that accept a pattern instead of pre-processed data
+PATTERN_CACHE_SIZE = 512
+
 
 def _match_length(S: bytes, idx1: int, idx2: int) -> int:
-    """Return the length of the match of the substrings of S beginning at idx1 and idx2."""
+    """Return the length of the match of the substrings of S beginning at idx1 and idx2.
+
+    Slices of S are compared in steps that double in size, so that long matches are found
+    by a few comparisons of whole slices instead of a comparison of each byte.
+    """
     if idx1 == idx2:
         return len(S) - idx1
 
-    match_count = 0
-    while idx1 < len(S) and idx2 < len(S) and S[idx1] == S[idx2]:
-        match_count += 1
-        idx1 += 1
-        idx2 += 1
+    limit = len(S) - max(idx1, idx2)
+    if (limit == 0) or (S[idx1] != S[idx2]):
+        return 0
+
+    match_count = 1
+    step = 16
+    while match_count < limit:
+        step = min(step, limit - match_count)
+        a = S[idx1 + match_count:idx1 + match_count + step]
+        b = S[idx2 + match_count:idx2 + match_count + step]
+
+        if a != b:
+            # Binary search for the length of the longest matching prefix of a and b
+            low, high = 0, step
+            while high - low > 1:
+                mid = (low + high) // 2
+                if a[low:mid] == b[low:mid]:
+                    low = mid
+                else:
+                    high = mid
+
+            return match_count + low
+
+        match_count += step
+        step *= 2
+
+    return match_count
+
+def _suffix_match_length(S: bytes, idx1: int, idx2: int) -> int:
+    """Return the length of the match of the substrings of S ending at idx1 and idx2.
+
+    This is the mirror image of _match_length, comparing slices of S that end at idx1 and
+    idx2 in steps that double in size.
+    """
+    if idx1 == idx2:
+        return idx1 + 1
+
+    limit = min(idx1, idx2) + 1
+    if (limit <= 0) or (S[idx1] != S[idx2]):
+        return 0
+
+    match_count = 1
+    step = 16
+    while match_count < limit:
+        step = min(step, limit - match_count)
+        a = S[idx1 - match_count - step + 1:idx1 - match_count + 1]
+        b = S[idx2 - match_count - step + 1:idx2 - match_count + 1]
+
+        if a != b:
+            # Binary search for the length of the longest matching suffix of a and b
+            low, high = 0, step
+            while high - low > 1:
+                mid = (low + high) // 2
+                if a[step - mid:] == b[step - mid:]:
+                    low = mid
+                else:
+                    high = mid
+
+            return match_count + low
+
+        match_count += step
+        step *= 2
 
     return match_count
 
-def _fundamental_preprocess(S: bytes) -> List[int]:
+def _fundamental_preprocess(S: bytes) -> array.array:
     """Return Z, the Fundamental Preprocessing of S.
 
     Z[i] is the length of the substring beginning at i which is also a prefix of S.
     This pre-processing is done in O(n) time, where n is the length of S.
     """
+    z = array.array('q', [0]) * len(S)
     if len(S) == 0:  # Handles case of empty string
-        return []
+        return z
 
+    z[0] = len(S)
     if len(S) == 1:  # Handles case of single-character string
-        return [1]
+        return z
 
-    z = [0 for x in S]
-    z[0] = len(S)
     z[1] = _match_length(S, 0, 1)
 
     for i in range(2, 1 + z[1]):  # Optimization from exercise 1-5
@@ -70,6 +208,33 @@ def _fundamental_preprocess(S: bytes) -> List[int]:
 
     return z
 
+def _suffix_lengths(S: bytes, N: array.array):
+    """Fill N with the suffix lengths of S, where N[j] is the length of the longest substring
+    ending at j which is also a suffix of S.
+
+    This is the Fundamental Preprocessing of S reversed, computed from right to left over S
+    itself (without reversing S) by keeping track of the box [g + 1, f] of the substring
+    ending furthest to the left that is known to match a suffix of S. It takes O(n) time,
+    where n is the length of S, and N must hold n 64-bit integers.
+    """
+    m = len(S)
+    if m == 0:
+        return
+
+    N[m - 1] = m
+    g = f = m - 1
+
+    for i in range(m - 2, -1, -1):
+        if (i > g) and (N[i + m - 1 - f] < i - g):  # i falls within the box
+            N[i] = N[i + m - 1 - f]
+        else:  # Explicit match to the left of the box
+            g = min(g, i)
+            f = i
+            if (g >= 0) and (S[g] == S[g + m - 1 - f]):  # Skips the call for most mismatches
+                g -= _suffix_match_length(S, g, g + m - 1 - f)
+
+            N[i] = f - g
+
 def _bad_character_table(S: bytes) -> List[List[int]]:
     """
     Generates R for S, which is an array indexed by the position of some character c in the
@@ -79,9 +244,6 @@ def _bad_character_table(S: bytes) -> List[List[int]]:
     for the bad character rule in the Boyer-Moore string search algorithm, although it has
     a much larger size than non-constant-time solutions.
     """
-    if len(S) == 0:
-        return [[] for a in range(ALPHABET_SIZE)]
-
     R = [[-1] for a in range(ALPHABET_SIZE)]
     alpha = [-1 for a in range(ALPHABET_SIZE)]
 
@@ -92,7 +254,283 @@ def _bad_character_table(S: bytes) -> List[List[int]]:
 
     return R
 
-def _good_suffix_table(S: str) -> List[int]:
+class _ShiftTable(dict):
+    """
+    Table used in place of an array of ALPHABET_SIZE entries when the pattern is a str, mapping
+    characters to integers. Characters that were never stored map to a default value, so that
+    the table can be indexed by characters exactly like the arrays are indexed by byte values.
+    Latin-1 characters are always stored, so that searching mostly Latin-1 text rarely has to
+    fall back to the (slower) default lookup.
+    """
+    __slots__ = ['default']
+
+    def __init__(self, default: int):
+        super().__init__((chr(c), default) for c in range(ALPHABET_SIZE))
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+def _new_shift_table(S, default: int):
+    """
+    Return a new table indexed by the characters of S, with all entries set to 'default'. This
+    is an array of ALPHABET_SIZE entries if S is bytes, or a _ShiftTable if S is a str.
+    """
+    if isinstance(S, str):
+        return _ShiftTable(default)
+
+    return array.array('q', [default]) * ALPHABET_SIZE
+
+def _last_occurrences(S, end: int):
+    """
+    Return (c, i) pairs giving the position i of the last occurrence of each character c that
+    occurs in S[:end]. For bytes, each of the ALPHABET_SIZE byte values is looked for with
+    bytes.rfind, which is much faster than visiting every position of a long pattern.
+    """
+    if isinstance(S, bytes):
+        found = ((c, S.rfind(c, 0, end)) for c in range(ALPHABET_SIZE))
+        return [(c, i) for c, i in found if i >= 0]
+
+    return dict(zip(S[:end], range(end))).items()
+
+def _compact_bad_character_table(S: bytes) -> array.array:
+    """
+    Generates a compact alternative to R for S, which is an array of length ALPHABET_SIZE
+    holding the position of the last occurrence of each character c in S, or -1 if c does not
+    occur in S. This only takes O(|S|) time to build, at the cost of sometimes giving a smaller
+    shift than R, since the last occurrence of c may be to the right of the mismatch.
+    """
+    R = _new_shift_table(S, -1)
+
+    for c, i in _last_occurrences(S, len(S)):
+        R[c] = i
+
+    return R
+
+def _horspool_shift_table(S: bytes) -> array.array:
+    """
+    Generates the shift table used by the Boyer-Moore-Horspool and Raita algorithms. For each
+    character c, the table holds the distance from the last occurrence of c in S[:-1] to the
+    end of S, or |S| if c does not occur in S[:-1]. After comparing an alignment of S whose
+    last character is aligned with c, S can always be shifted by this amount.
+    """
+    plen = len(S)
+    R = _new_shift_table(S, plen)
+
+    for c, i in _last_occurrences(S, plen - 1):
+        R[c] = plen - 1 - i
+
+    return R
+
+def _sunday_shift_table(S: bytes) -> array.array:
+    """
+    Generates the shift table used by Sunday's quick search algorithm. For each character c,
+    the table holds the distance from the last occurrence of c in S to the position just past
+    the end of S, or |S|+1 if c does not occur in S. After comparing an alignment of S, S can
+    always be shifted by the entry for the character just past the end of the alignment.
+    """
+    plen = len(S)
+    R = _new_shift_table(S, plen + 1)
+
+    for c, i in _last_occurrences(S, plen):
+        R[c] = plen - i
+
+    return R
+
+def _rare_byte_table(S) -> array.array:
+    """
+    Generates the table used by the "rare-byte" algorithm, which holds the offset in S of
+    its rarest byte (or character, if S is a str) according to RARE_BYTE_ORDER.
+    """
+    ranks = [RARE_BYTE_ORDER.find(c) if c < 128 else -1 for c in
+             (S if isinstance(S, bytes) else map(ord, S))]
+    ranks = [len(RARE_BYTE_ORDER) if r < 0 else r for r in ranks]
+    return array.array('q', [ranks.index(max(ranks)) if ranks else 0])
+
+
+def _period(S: bytes) -> int:
+    """
+    Return the period of S, which is the smallest p > 0 such that S[i] == S[i + p] for all
+    valid i, or |S| if there is no such p smaller than |S|. This is the smallest p for which
+    the substring beginning at p is also a prefix of S, so it can be read from the Z-array.
+    """
+    Z = _fundamental_preprocess(S)
+
+    for p in range(1, len(S)):
+        if p + Z[p] == len(S):
+            return p
+
+    return len(S)
+
+def _maximal_suffix(S: bytes, reverse: bool) -> Tuple[int, int]:
+    """
+    Return (i, p), where S[i + 1:] is the lexicographically largest suffix of S (or the
+    smallest, if reverse is True) and p is the period of that suffix. This takes O(|S|) time.
+    """
+    max_suffix = -1
+    j = 0
+    k = p = 1
+
+    while j + k < len(S):
+        a = S[j + k]
+        b = S[max_suffix + k]
+
+        if (a > b) if reverse else (a < b):  # Suffix starting at j + 1 is smaller, skip it
+            j += k
+            k = 1
+            p = j - max_suffix
+        elif a == b:
+            if k != p:
+                k += 1
+            else:
+                j += p
+                k = 1
+        else:  # Suffix starting at j + 1 is larger
+            max_suffix = j
+            j += 1
+            k = p = 1
+
+    return max_suffix, p
+
+def _two_way_table(S: bytes) -> array.array:
+    """
+    Generates the parameters used by the Two-Way algorithm for S, as an array of 3 integers.
+    The first is the position 'crit' of a critical factorization S[:crit], S[crit:] of S. The
+    second is the shift used after the right half of S has matched, which is the period of
+    S if S[:crit] is a suffix of S[crit:crit + period], and max(crit, |S| - crit) + 1 (a lower
+    bound for the period of S) otherwise. The third is 1 in the first case, where the search
+    needs to remember how much of S is already known to match after the shift, and 0 otherwise.
+    """
+    suffix1, period1 = _maximal_suffix(S, False)
+    suffix2, period2 = _maximal_suffix(S, True)
+
+    if suffix1 > suffix2:
+        crit, period = suffix1 + 1, period1
+    else:
+        crit, period = suffix2 + 1, period2
+
+    if S[:crit] == S[period:period + crit]:
+        return array.array('q', [crit, period, 1])
+
+    return array.array('q', [crit, max(crit, len(S) - crit) + 1, 0])
+
+# Mask with a bit set for every byte value, used for byte classes
+_ANY_BYTE = (1 << ALPHABET_SIZE) - 1
+
+def _fold_case(mask: int) -> int:
+    """
+    Return a byte class mask with both cases set for each ASCII letter that is set in mask.
+    """
+    for c in range(ord('A'), ord('Z') + 1):
+        both = (1 << c) | (1 << (c + 32))
+        if mask & both:
+            mask |= both
+
+    return mask
+
+def _byte_classes(S: bytes, ignore_case: bool, wildcards: bool) -> List[int]:
+    """
+    Return a list of masks, one for each byte matched by S, where bit c of mask i is set if
+    byte value c matches position i. If wildcards is True, "?" matches any byte, "[...]"
+    matches any byte inside the brackets, which may include ranges such as "0-9" and starts
+    with "!" or "^" to match any byte not inside the brackets, and a backslash matches the
+    next byte literally. If ignore_case is True, ASCII letters match in either case.
+    """
+    masks = []
+    i = 0
+
+    def next_byte(i):
+        if i >= len(S):
+            raise ValueError("Incomplete wildcard pattern")
+
+        if S[i] == ord('\\'):
+            if i + 1 >= len(S):
+                raise ValueError("Incomplete wildcard pattern")
+
+            return S[i + 1], i + 2
+
+        return S[i], i + 1
+
+    while i < len(S):
+        c = S[i]
+
+        if (not wildcards) or (c not in b'?['):
+            c, i = next_byte(i) if wildcards else (c, i + 1)
+            mask = 1 << c
+        elif c == ord('?'):
+            mask = _ANY_BYTE
+            i += 1
+        else:
+            i += 1
+            negate = (i < len(S)) and (S[i] in b'!^')
+            i += negate
+            mask = 0
+
+            # A "]" straight after the opening bracket is part of the class
+            while (i >= len(S)) or (S[i] != ord(']')) or (mask == 0):
+                low, i = next_byte(i)
+                high = low
+                if (i + 1 < len(S)) and (S[i] == ord('-')) and (S[i + 1] != ord(']')):
+                    high, i = next_byte(i + 1)
+                    if high < low:
+                        raise ValueError(f"Invalid range in byte class: {chr(low)}-{chr(high)}")
+
+                mask |= ((1 << (high + 1)) - 1) ^ ((1 << low) - 1)
+
+            i += 1
+            if negate:
+                # Fold first, so that both cases of a letter are excluded from the class
+                mask = (_fold_case(mask) if ignore_case else mask) ^ _ANY_BYTE
+
+            if mask == 0:
+                raise ValueError("Byte class does not match any byte value")
+
+        masks.append(_fold_case(mask) if ignore_case else mask)
+
+    return masks
+
+def _class_shift_table(masks: List[int]) -> array.array:
+    """
+    Generates the shift table used by the "byte-class" algorithm, which is the shift table of
+    the Boyer-Moore-Horspool algorithm with each pattern position standing for all of the
+    byte values in its class. For each character c, the table holds the distance from the
+    last position in the pattern (excluding the last position) that matches c to the end of
+    the pattern, or the length of the pattern if no position matches c.
+    """
+    plen = len(masks)
+    R = array.array('q', [plen]) * ALPHABET_SIZE
+    remaining = _ANY_BYTE
+
+    # Working backwards, each byte value only needs to be set once, at its last occurrence
+    for i in range(plen - 2, -1, -1):
+        new = masks[i] & remaining
+        remaining ^= new
+
+        while new:
+            low = new & -new
+            R[low.bit_length() - 1] = plen - 1 - i
+            new ^= low
+
+        if not remaining:
+            break
+
+    return R
+
+def _class_mask_table(masks: List[int]) -> array.array:
+    """
+    Generates the table of byte class masks used by the "byte-class" algorithm. Each mask is
+    stored as 4 64-bit words, so that byte value c matches position i if bit (c % 64) of the
+    entry at (4 * i) + (c // 64) is set.
+    """
+    F = array.array('q')
+    for mask in masks:
+        for shift in range(0, ALPHABET_SIZE, 64):
+            word = (mask >> shift) & 0xffffffffffffffff
+            F.append(word - (1 << 64) if word >= (1 << 63) else word)
+
+    return F
+
+def _good_suffix_table(N: array.array) -> array.array:
     """
     Generates L for S, an array used in the implementation of the strong good suffix rule.
     L[i] = k, the largest position in S such that S[i:] (the suffix of S starting at i) matches
@@ -101,75 +539,74 @@ def _good_suffix_table(S: str) -> List[int]:
     matches the substring of T matched by a suffix of P in the previous match attempt.
     Specifically, if the mismatch took place at position i-1 in P, the shift magnitude is given
     by the equation len(P) - L[i]. In the case that L[i] = -1, the full shift table is used.
-    Since only proper suffixes matter, L[0] = -1.
+    Since only proper suffixes matter, L[0] = -1. L is built from N, the suffix lengths of S
+    filled in by _suffix_lengths.
     """
-    L = [-1 for c in S]
-    N = _fundamental_preprocess(S[::-1])  # S[::-1] reverses S
-    N.reverse()
+    m = len(N)
+    L = array.array('q', [-1]) * m
 
-    for j in range(0, len(S) - 1):
-        i = len(S) - N[j]
-        if i != len(S):
+    for j in range(0, m - 1):
+        i = m - N[j]
+        if i != m:
             L[i] = j
 
     return L
 
-def _full_shift_table(S: str) -> List[int]:
+def _full_shift_table(N: array.array) -> array.array:
     """
     Generates F for S, an array used in a special case of the good suffix rule in the Boyer-Moore
     string search algorithm. F[i] is the length of the longest suffix of S[i:] that is also a
     prefix of S. In the cases it is used, the shift magnitude of the pattern P relative to the
-    text T is len(P) - F[i] for a mismatch occurring at i-1.
+    text T is len(P) - F[i] for a mismatch occurring at i-1. F is built from N, the suffix
+    lengths of S filled in by _suffix_lengths.
     """
-    F = [0 for c in S]
-    Z = _fundamental_preprocess(S)
+    m = len(N)
+    F = array.array('q', [0]) * m
 
-    longest = 0
-    for i, zv in enumerate(reversed(Z)):
-        longest = max(zv, longest) if zv == i + 1 else longest
-        F[-i - 1] = longest
+    # The prefix of length j is also a suffix of S (a border of S) if N[j - 1] == j. F[i] is
+    # the longest border that fits in S[i:], so F holds each border over a run of positions,
+    # from the longest border (S itself, at position 0) to the shortest.
+    start = 0
+    for j in reversed([j for j in range(1, m + 1) if N[j - 1] == j]):
+        end = m - j + 1
+        F[start:end] = array.array('q', [j]) * (end - start)
+        start = end
 
     return F
 
-def _base_search_file(R, L, F, P, T, T_size, greedy) -> List[int]:
+def _scan(R, L, F, P, T, T_size, k, previous_k, base, greedy, matches) -> Tuple[int, int]:
     """
     Implementation of the Boyer-Moore string search algorithm. This finds all occurrences of P
-    in T, and incorporates numerous ways of pre-processing the pattern to determine the optimal
-    amount to shift the string and skip comparisons. In practice it runs in O(m) (and even
-    sublinear) time, where m is the length of T. This implementation performs a case-insensitive
-    search on ASCII alphabetic characters, spaces not included.
+    in T[:T_size], and incorporates numerous ways of pre-processing the pattern to determine the
+    optimal amount to shift the string and skip comparisons. In practice it runs in O(m) (and even
+    sublinear) time, where m is the length of T.
+
+    The search starts at alignment k (the index in T of the last character of P), and
+    offsets of all occurrences are appended to 'matches' with 'base' added to them. If greedy
+    is False, the search stops after the first occurrence. Returns the final values of k and
+    previous_k, so that the search can be resumed when more data is available.
     """
-    matches = []
     plen = len(P)
 
-
-    if plen == 0 or T_size == 0 or T_size < plen:
-        return []
-
-    k = plen - 1      # Represents alignment of end of P relative to T
-    previous_k = -1     # Represents alignment in previous phase (Galil's rule)
-
     while k < T_size:
         i = plen - 1  # Character to compare in P
         h = k         # Character to compare in T
 
-        T.seek(h)
-        peeked = T.read(1)[0]
+        peeked = T[h]
 
         while i >= 0 and h > previous_k and P[i] == peeked:  # Matches starting from end of P
             i -= 1
             h -= 1
 
-            T.seek(h if h >= 0 else 0)
-            peeked = T.read(1)[0]
+            peeked = T[h]
 
         if i == -1 or h == previous_k:  # Match has been found (Galil's rule)
-            matches.append(k - plen + 1)
+            matches.append(base + k - plen + 1)
+            previous_k = k  # Shifting by the period of P keeps everything up to k matched
+            k += plen - F[1] if plen > 1 else 1
 
             if not greedy:
-                return matches
-
-            k += plen - F[1] if plen > 1 else 1
+                return k, previous_k
 
         else:  # No match, shift by max of bad character and good suffix rules
             char_shift = i - R[peeked][i]
@@ -181,28 +618,27 @@ def _base_search_file(R, L, F, P, T, T_size, greedy) -> List[int]:
             else:               # Matched suffix appears in P
                 suffix_shift = plen - 1 - L[i + 1]
 
-            shift = char_shift if char_shift > suffix_shift else suffix_shift
-            previous_k = k if shift >= i + 1 else previous_k  # Galil's rule
+            # Galil's rule only holds when the good suffix rule decides the shift
+            if char_shift > suffix_shift:
+                shift = char_shift
+                previous_k = -1
+            else:
+                shift = suffix_shift
+                previous_k = k if shift >= i + 1 else -1
+
             k += shift
 
-    return matches
+    return k, previous_k
 
 
-def _base_search_str(R, L, F, P, T, T_size, greedy) -> List[int]:
+def _scan_compact(R, L, F, P, T, T_size, k, previous_k, base, greedy, matches) -> Tuple[int, int]:
     """
-    Copy of _base_search_file, but slightly modified to handle a byte string instead
-    of a file handle. Duplicates a lot of code, BUT avoids additional branches or
-    function calls in the inner loop.
+    Copy of _scan, but slightly modified to use the compact bad character table generated by
+    _compact_bad_character_table. Duplicates a lot of code, BUT avoids additional branches
+    in the inner loop.
     """
-    matches = []
     plen = len(P)
 
-    if plen == 0 or T_size == 0 or T_size < plen:
-        return []
-
-    k = plen - 1      # Represents alignment of end of P relative to T
-    previous_k = -1     # Represents alignment in previous phase (Galil's rule)
-
     while k < T_size:
         i = plen - 1  # Character to compare in P
         h = k         # Character to compare in T
@@ -216,15 +652,15 @@ def _base_search_str(R, L, F, P, T, T_size, greedy) -> List[int]:
             peeked = T[h]
 
         if i == -1 or h == previous_k:  # Match has been found (Galil's rule)
-            matches.append(k - plen + 1)
+            matches.append(base + k - plen + 1)
+            previous_k = k  # Shifting by the period of P keeps everything up to k matched
+            k += plen - F[1] if plen > 1 else 1
 
             if not greedy:
-                return matches
-
-            k += plen - F[1] if plen > 1 else 1
+                return k, previous_k
 
         else:  # No match, shift by max of bad character and good suffix rules
-            char_shift = i - R[peeked][i]
+            char_shift = i - R[peeked]
 
             if i + 1 == plen:  # Mismatch happened on first attempt
                 suffix_shift = 1
@@ -233,100 +669,3475 @@ def _base_search_str(R, L, F, P, T, T_size, greedy) -> List[int]:
             else:               # Matched suffix appears in P
                 suffix_shift = plen - 1 - L[i + 1]
 
-            shift = char_shift if char_shift > suffix_shift else suffix_shift
-            previous_k = k if shift >= i + 1 else previous_k  # Galil's rule
+            # Galil's rule only holds when the good suffix rule decides the shift
+            if char_shift > suffix_shift:
+                shift = char_shift
+                previous_k = -1
+            else:
+                shift = suffix_shift
+                previous_k = k if shift >= i + 1 else -1
+
             k += shift
 
-    return matches
+    return k, previous_k
 
 
-def preprocess(pattern) -> Tuple:
+def _scan_horspool(R, L, F, P, T, T_size, k, previous_k, base, greedy, matches) -> Tuple[int, int]:
     """
-    Pre-process a pattern, for use with boyermoore_string_pp or boyermoore_file_pp.
-
-    :param pattern: pattern to pre-process. Must be either str or bytes.
-    :return: tuple of preprocessed data
-    :rtype: tuple
+    Implementation of the Boyer-Moore-Horspool algorithm, with the same arguments and return
+    value as _scan. R must be generated by _horspool_shift_table, and L, F and previous_k are
+    not used. Only the last character of each alignment is compared one at a time, and the
+    whole alignment is compared in one go if it matches, which is cheap in python.
     """
-    if isinstance(pattern, str):
-        pattern = pattern.encode()
-    elif not isinstance(pattern, bytes):
-        raise ValueError("Pattern must be str or bytes")
+    last = len(P) - 1
+    p_last = P[last]
 
-    R = _bad_character_table(pattern)
-    L = array.array('q', _good_suffix_table(pattern))
-    F = array.array('q', _full_shift_table(pattern))
+    while k < T_size:
+        c = T[k]
 
-    return R, L, F, array.array('B', list(pattern))
+        if c == p_last and T[k - last:k + 1] == P:
+            matches.append(base + k - last)
+            k += R[c]
 
+            if not greedy:
+                return k, previous_k
+        else:
+            k += R[c]
 
-def search_string_pp(pp_data, string, greedy=True) -> List[int]:
-    """
-    Search for all occurrences of a pre-processed pattern inside a string.
+    return k, previous_k
 
-    :param pp_data: return value from boyermoore.preprocess
-    :param string: input data to search for pattern inside. Must be either str or bytes.
-    :param bool greedy: If True, all occurrences will be returned. If False, \
-        the search will stop after the first occurrence and only the first \
-        occurrence will be returned.
-    :return: list of byte offsets of all occurrences that were found
-    :rtype: [int]
+
+def _scan_raita(R, L, F, P, T, T_size, k, previous_k, base, greedy, matches) -> Tuple[int, int]:
     """
-    R, L, F, P = pp_data
-    return _base_search_str(R, L, F, P, string, len(string), greedy)
+    Implementation of Raita's variant of the Boyer-Moore-Horspool algorithm, with the same
+    arguments and return value as _scan. R must be generated by _horspool_shift_table, and
+    L, F and previous_k are not used. The last, first and middle characters of each alignment
+    are compared before the rest, which rejects most alignments early on natural language text.
+    """
+    last = len(P) - 1
+    mid = last // 2
+    p_last = P[last]
+    p_first = P[0]
+    p_mid = P[mid]
+
+    while k < T_size:
+        c = T[k]
+        s = k - last
+
+        if c == p_last and T[s] == p_first and T[s + mid] == p_mid and T[s:k + 1] == P:
+            matches.append(base + s)
+            k += R[c]
+
+            if not greedy:
+                return k, previous_k
+        else:
+            k += R[c]
+
+    return k, previous_k
 
 
-def search_file_pp(pp_data, filename, greedy=True) -> List[int]:
+def _scan_sunday(R, L, F, P, T, T_size, k, previous_k, base, greedy, matches) -> Tuple[int, int]:
     """
-    Search for all occurrences of a pre-processed pattern inside a file.
+    Implementation of Sunday's quick search algorithm, with the same arguments and return
+    value as _scan. R must be generated by _sunday_shift_table, and L, F and previous_k are
+    not used. The shift is decided by the character just past the end of each alignment; if
+    that character is not in T[:T_size] yet, the shift is 1.
+    """
+    last = len(P) - 1
+    p_first = P[0]
 
-    :param pp_data: return value from boyermoore.preprocess
-    :param str filename: name of file search for pattern in
-    :param bool greedy: If True, all occurrences will be returned. If False, \
-        the search will stop after the first occurrence and only the first \
-        occurrence will be returned.
-    :return: list of byte offsets of all occurrences that were found
-    :rtype: [int]
+    while k < T_size:
+        s = k - last
+
+        if T[s] == p_first and T[s:k + 1] == P:
+            matches.append(base + s)
+            k += R[T[k + 1]] if k + 1 < T_size else 1
+
+            if not greedy:
+                return k, previous_k
+        else:
+            k += R[T[k + 1]] if k + 1 < T_size else 1
+
+    return k, previous_k
+
+
+# Number of bytes that _scan_in_chunks copies out of a buffer at a time
+_SCAN_CHUNK_SIZE = 64 * 1024
+
+def _scan_in_chunks(scan, plen, T, T_size, k, previous_k, base, greedy,
+                    matches) -> Tuple[int, int]:
     """
-    R, L, F, P = pp_data
-    fh = open(filename, 'rb')
-    fh.seek(0, 2)
-    data_size = fh.tell()
-    fh.seek(0)
-    return _base_search_file(R, L, F, P, fh, data_size, greedy)
+    Run 'scan', one of the scan functions with everything before T already bound, over a
+    buffer that has no find method, such as a memoryview. The buffer is copied into bytes
+    one chunk of _SCAN_CHUNK_SIZE bytes at a time, so that bytes.find and the comparisons
+    run at C speed without copying the whole buffer. Consecutive chunks overlap by
+    plen - 1 bytes, so that every alignment is in one of them. Only for scan functions
+    that do not use previous_k, which is passed through unchanged.
+    """
+    last = plen - 1
+    found = len(matches)
+
+    while k < T_size:
+        start = k - last
+        end = min(start + _SCAN_CHUNK_SIZE + last, T_size)
+        k, previous_k = scan(bytes(T[start:end]), end - start, k - start, previous_k,
+                             base + start, greedy, matches)
+        k += start
+
+        if (not greedy) and (len(matches) > found):
+            break
 
+    return k, previous_k
 
-def search_string(pattern, string, greedy=True) -> List[int]:
+
+def _scan_rare_byte(R, L, F, P, T, T_size, k, previous_k, base, greedy, matches) -> Tuple[int, int]:
     """
-    Pre-process a pattern and search for all occurences inside a string.
+    Rare byte prefilter, with the same arguments and return value as _scan. L must be
+    generated by _rare_byte_table, and R, F and previous_k are not used. The find method of
+    T skips ahead, at C speed, to the next occurrence of the rarest byte of P, and only the
+    alignment that lines that byte of P up with it is compared. Buffers with no find method
+    are searched in chunks copied into bytes by _scan_in_chunks.
+    """
+    if not hasattr(T, 'find'):
+        scan = functools.partial(_scan_rare_byte, R, L, F, P)
+        return _scan_in_chunks(scan, len(P), T, T_size, k, previous_k, base, greedy, matches)
 
-    :param pattern: pattern to search for. Must be either str or bytes.
-    :param string: input data to search for pattern inside. Must be either str or bytes.
-    :param bool greedy: If True, all occurrences will be returned. If False, \
-        the search will stop after the first occurrence and only the first \
-        occurrence will be returned.
-    :return: list of byte offsets of all occurrences that were found
-    :rtype: [int]
+    last = len(P) - 1
+    rare = L[0]
+    needle = P[rare:rare + 1]
+    find = T.find
+
+    while k < T_size:
+        pos = find(needle, k - last + rare, T_size - last + rare)
+        if pos < 0:
+            return T_size, previous_k
+
+        k = pos - rare + last
+
+        if T[k - last:k + 1] == P:
+            matches.append(base + k - last)
+            k += 1
+
+            if not greedy:
+                return k, previous_k
+        else:
+            k += 1
+
+    return k, previous_k
+
+
+def _scan_two_way(R, L, F, P, T, T_size, k, previous_k, base, greedy, matches) -> Tuple[int, int]:
     """
-    R, L, F, P = preprocess(pattern)
-    return _base_search_str(R, L, F, P, string, len(string), greedy)
+    Implementation of the Crochemore-Perrin Two-Way algorithm, with the same arguments and
+    return value as _scan. L must be generated by _two_way_table, and R and F are not used.
+    The right half of P is compared left to right, then the left half right to left. This
+    runs in O(m) time and O(1) extra space however periodic P and T are, since a prefix of P
+    that is known to match after shifting by the period of P is never compared again.
+    previous_k is the position in T of the last byte of that prefix, like in Galil's rule.
+    """
+    plen = len(P)
+    crit, period, periodic = L
+
+    while k < T_size:
+        j = k - plen + 1                         # Start of the current alignment in T
+        memory = max(previous_k - j + 1, 0)      # Length of prefix known to match
+        i = max(crit, memory)
+
+        while i < plen and P[i] == T[j + i]:     # Compare right half of P, left to right
+            i += 1
+
+        if i < plen:  # Mismatch in right half, no occurrence can start before T[j + i - crit + 1]
+            k += i - crit + 1
+            previous_k = -1
+            continue
 
+        i = crit - 1
+        while i >= memory and P[i] == T[j + i]:  # Compare left half of P, right to left
+            i -= 1
+
+        # Shifting by the period of P keeps everything up to k matched
+        previous_k = k if periodic else -1
+        k += period
+
+        if i < memory:  # Match has been found
+            matches.append(base + j)
+
+            if not greedy:
+                return k, previous_k
+
+    return k, previous_k
 
-def search_file(pattern, filename, greedy=True) -> List[int]:
+
+def _scan_byte_class(R, L, F, P, T, T_size, k, previous_k, base, greedy, matches) -> Tuple[int, int]:
     """
-    Pre-process a pattern and search for all occurences inside a file.
+    Implementation of the Boyer-Moore-Horspool algorithm for patterns made of byte classes,
+    with the same arguments and return value as _scan. R must be generated by
+    _class_shift_table, F by _class_mask_table, L[0] must be the number of byte classes, and
+    P and previous_k are not used. Each alignment is compared from right to left, checking
+    whether each byte of T is in the class for that position.
+    """
+    last = L[0] - 1
 
-    :param pattern: pattern to search for. Must be either str or bytes.
-    :param filename: name of file to search for pattern in
-    :param bool greedy: If True, all occurrences will be returned. If False, \
-        the search will stop after the first occurrence and only the first \
-        occurrence will be returned.
-    :return: list of byte offsets of all occurrences that were found
-    :rtype: [int]
+    while k < T_size:
+        s = k - last
+        i = last
+
+        while i >= 0:
+            c = T[s + i]
+            if not (F[(i << 2) | (c >> 6)] >> (c & 63)) & 1:
+                break
+
+            i -= 1
+
+        if i < 0:
+            matches.append(base + s)
+            k += R[T[k]]
+
+            if not greedy:
+                return k, previous_k
+        else:
+            k += R[T[k]]
+
+    return k, previous_k
+
+
+def _scan_stats(stats, R, L, F, P, T, T_size, k, previous_k, base, greedy,
+                matches) -> Tuple[int, int]:
     """
-    R, L, F, P = preprocess(pattern)
-    fh = open(filename, 'rb')
-    fh.seek(0, 2)
-    data_size = fh.tell()
-    fh.seek(0)
-    return _base_search_file(R, L, F, P, fh, data_size, greedy)
+    Copy of _scan (or _scan_compact, if R is a compact bad character table) which also counts
+    the work done in 'stats'. This is only used when stats are requested, so that counting
+    does not slow down the other searches.
+    """
+    plen = len(P)
+    compact = not isinstance(R, list)
+    alignments = comparisons = found = total_shift = max_shift = 0
+    bad_character = good_suffix = galil_skips = galil_resets = 0
+
+    try:
+        while k < T_size:
+            alignments += 1
+            i = plen - 1  # Character to compare in P
+            h = k         # Character to compare in T
+
+            peeked = T[h]
+
+            while i >= 0 and h > previous_k:  # Matches starting from end of P
+                comparisons += 1
+                if P[i] != peeked:
+                    break
+
+                i -= 1
+                h -= 1
+
+                peeked = T[h]
+
+            if i == -1 or h == previous_k:  # Match has been found (Galil's rule)
+                if i >= 0:
+                    galil_skips += 1
+
+                matches.append(base + k - plen + 1)
+                found += 1
+                previous_k = k
+                shift = plen - F[1] if plen > 1 else 1
+                k += shift
+                total_shift += shift
+                max_shift = max(max_shift, shift)
+
+                if not greedy:
+                    return k, previous_k
+
+            else:  # No match, shift by max of bad character and good suffix rules
+                char_shift = i - (R[peeked] if compact else R[peeked][i])
+
+                if i + 1 == plen:  # Mismatch happened on first attempt
+                    suffix_shift = 1
+                elif L[i + 1] == -1:  # Matched suffix does not appear anywhere in P
+                    suffix_shift = plen - F[i + 1]
+                else:               # Matched suffix appears in P
+                    suffix_shift = plen - 1 - L[i + 1]
+
+                if char_shift > suffix_shift:
+                    bad_character += 1
+                    shift = char_shift
+                    next_previous_k = -1
+                else:
+                    good_suffix += 1
+                    shift = suffix_shift
+                    next_previous_k = k if shift >= i + 1 else -1
+
+                if previous_k >= 0 and next_previous_k < 0:
+                    galil_resets += 1
+
+                previous_k = next_previous_k
+                k += shift
+                total_shift += shift
+                max_shift = max(max_shift, shift)
+
+        return k, previous_k
+    finally:
+        stats._add_scan(alignments, comparisons, found, total_shift, max_shift)
+        stats.bad_character_shifts += bad_character
+        stats.good_suffix_shifts += good_suffix
+        stats.galil_skips += galil_skips
+        stats.galil_resets += galil_resets
+
+
+def _scan_shift_stats(stats, order, ahead, classes, R, L, F, P, T, T_size, k, previous_k, base,
+                      greedy, matches) -> Tuple[int, int]:
+    """
+    Copy of _scan_horspool, _scan_raita, _scan_sunday and _scan_byte_class, which also counts
+    the work done in 'stats'. The positions of each alignment are compared one at a time in
+    the order given by 'order', and the shift is decided by the character just past the end
+    of each alignment if 'ahead' is True, or by the last character of each alignment if not.
+    If 'classes' is True, positions are compared using the byte classes in F instead of P.
+    """
+    last = len(order) - 1
+    alignments = comparisons = found = total_shift = max_shift = 0
+
+    try:
+        while k < T_size:
+            alignments += 1
+            s = k - last
+
+            for i in order:
+                c = T[s + i]
+                comparisons += 1
+                if classes:
+                    if not (F[(i << 2) | (c >> 6)] >> (c & 63)) & 1:
+                        break
+                elif P[i] != c:
+                    break
+            else:
+                matches.append(base + s)
+                found += 1
+
+            if ahead:
+                shift = R[T[k + 1]] if k + 1 < T_size else 1
+            else:
+                shift = R[T[k]]
+
+            k += shift
+            total_shift += shift
+            max_shift = max(max_shift, shift)
+
+            if found and not greedy:
+                return k, previous_k
+
+        return k, previous_k
+    finally:
+        stats._add_scan(alignments, comparisons, found, total_shift, max_shift)
+
+
+def _scan_two_way_stats(stats, R, L, F, P, T, T_size, k, previous_k, base, greedy,
+                        matches) -> Tuple[int, int]:
+    """
+    Copy of _scan_two_way which also counts the work done in 'stats'.
+    """
+    plen = len(P)
+    crit, period, periodic = L
+    alignments = comparisons = found = total_shift = max_shift = 0
+
+    try:
+        while k < T_size:
+            alignments += 1
+            j = k - plen + 1
+            memory = max(previous_k - j + 1, 0)
+            i = max(crit, memory)
+
+            while i < plen:
+                comparisons += 1
+                if P[i] != T[j + i]:
+                    break
+
+                i += 1
+
+            if i < plen:
+                shift = i - crit + 1
+                previous_k = -1
+            else:
+                i = crit - 1
+                while i >= memory:
+                    comparisons += 1
+                    if P[i] != T[j + i]:
+                        break
+
+                    i -= 1
+
+                previous_k = k if periodic else -1
+                shift = period
+
+                if i < memory:
+                    matches.append(base + j)
+                    found += 1
+
+            k += shift
+            total_shift += shift
+            max_shift = max(max_shift, shift)
+
+            if found and not greedy:
+                return k, previous_k
+
+        return k, previous_k
+    finally:
+        stats._add_scan(alignments, comparisons, found, total_shift, max_shift)
+
+
+def _scan_rare_byte_stats(stats, R, L, F, P, T, T_size, k, previous_k, base, greedy,
+                          matches) -> Tuple[int, int]:
+    """
+    Copy of _scan_rare_byte which also counts the work done in 'stats'. Only the alignments
+    that line up the rare byte are counted, and the shift after each of them is the
+    distance to the next one.
+    """
+    if not hasattr(T, 'find'):
+        scan = functools.partial(_scan_rare_byte_stats, stats, R, L, F, P)
+        return _scan_in_chunks(scan, len(P), T, T_size, k, previous_k, base, greedy, matches)
+
+    last = len(P) - 1
+    rare = L[0]
+    needle = P[rare:rare + 1]
+    find = T.find
+    alignments = comparisons = found = total_shift = max_shift = 0
+    current = None  # Last alignment that was compared, until its shift is known
+
+    try:
+        while k < T_size:
+            pos = find(needle, k - last + rare, T_size - last + rare)
+            k = T_size if pos < 0 else pos - rare + last
+
+            if current is not None:
+                total_shift += k - current
+                max_shift = max(max_shift, k - current)
+                current = None
+
+            if pos < 0:
+                return k, previous_k
+
+            alignments += 1
+            s = k - last
+
+            for i in range(last + 1):
+                comparisons += 1
+                if T[s + i] != P[i]:
+                    break
+            else:
+                matches.append(base + s)
+                found += 1
+
+            current = k
+            k += 1
+
+            if found and not greedy:
+                return k, previous_k
+
+        return k, previous_k
+    finally:
+        if current is not None:
+            total_shift += k - current
+            max_shift = max(max_shift, k - current)
+
+        stats._add_scan(alignments, comparisons, found, total_shift, max_shift)
+
+
+# Python implementations of the shift loop for each algorithm, by name. The native backend
+# has a function with the same name, without the leading underscore, for each of these.
+_SCANNERS = {
+    "scan": _scan,
+    "scan_compact": _scan_compact,
+    "scan_horspool": _scan_horspool,
+    "scan_raita": _scan_raita,
+    "scan_sunday": _scan_sunday,
+    "scan_two_way": _scan_two_way,
+    "scan_byte_class": _scan_byte_class,
+    "scan_rare_byte": _scan_rare_byte,
+}
+
+
+def _stats_scanner(pp_data, stats):
+    """
+    Return a scan function for a pre-processed pattern that counts the work done in 'stats',
+    with the same arguments and return value as _scan. The python implementation is always
+    used, since the native backend does not count anything.
+    """
+    if pp_data.algorithm == "bm":
+        return functools.partial(_scan_stats, stats)
+
+    if pp_data.algorithm == "two-way":
+        return functools.partial(_scan_two_way_stats, stats)
+
+    if pp_data.algorithm == "rare-byte":
+        return functools.partial(_scan_rare_byte_stats, stats)
+
+    last = len(pp_data) - 1
+    if pp_data.algorithm == "horspool":
+        order = [last] + list(range(last))
+    elif pp_data.algorithm == "raita":
+        order = list(dict.fromkeys([last, 0, last // 2] + list(range(1, last))))
+    elif pp_data.algorithm == "sunday":
+        order = list(range(last + 1))
+    else:
+        order = list(range(last, -1, -1))
+
+    return functools.partial(_scan_shift_stats, stats, order, pp_data.algorithm == "sunday",
+                             pp_data.algorithm == "byte-class")
+
+
+def _is_byte_buffer(T) -> bool:
+    """
+    Return True if T exports a buffer of single bytes, or is an ASCII str (which stores one
+    byte per character), which is needed by the native backend.
+    """
+    if isinstance(T, (bytes, bytearray, mmap.mmap)):
+        return True
+
+    if isinstance(T, str):
+        return T.isascii()
+
+    try:
+        with memoryview(T) as view:
+            return view.itemsize == 1
+    except TypeError:
+        return False
+
+
+def _scanner(pp_data, T):
+    """
+    Return the scan function for the algorithm and tables of a pre-processed pattern. The
+    native backend is used if it is available and both P and T are buffers of bytes,
+    otherwise the python implementation is used.
+    """
+    if pp_data.algorithm == "bm":
+        name = "scan_compact" if pp_data.compact else "scan"
+    else:
+        name = "scan_" + pp_data.algorithm.replace("-", "_")
+
+    if (_speedups is not None) and isinstance(pp_data.P, bytes) and _is_byte_buffer(T):
+        return getattr(_speedups, name)
+
+    return _SCANNERS[name]
+
+
+def _read_blocks(T, block_size, size=None):
+    """
+    Generator that yields blocks of up to 'block_size' bytes from T, which may be either a
+    readable file-like object or an iterable of bytes-like objects, until T is exhausted.
+    If T is a file-like object and size is not None, no more than 'size' bytes are read.
+    """
+    if hasattr(T, 'read'):
+        while size is None or size > 0:
+            block = T.read(block_size if size is None else min(block_size, size))
+            if not block:
+                return
+
+            if size is not None:
+                size -= len(block)
+
+            yield block
+    else:
+        for block in T:
+            if block:
+                yield block
+
+
+class _BlockSearch(object):
+    """
+    Searches a sequence of consecutive blocks of bytes for all occurrences of P, one block
+    at a time, so that the search can be suspended and resumed between blocks.
+    The Boyer-Moore shift loop is run over an in-memory window made up of the current block
+    plus up to len(P) - 1 bytes carried over from the end of the previous window, so that
+    occurrences spanning a block boundary are still found.
+    """
+    __slots__ = ('pp_data', 'greedy', 'scan', 'window', 'base', 'k', 'previous_k')
+
+    def __init__(self, pp_data, greedy, base=0):
+        self.pp_data = pp_data
+        self.greedy = greedy
+        self.scan = _scanner(pp_data, b'')
+        self.window = b''
+        self.base = base                    # Offset of the first byte in the window
+        self.k = len(pp_data) - 1           # Alignment of end of P relative to window
+        self.previous_k = -1                # Alignment in previous phase (Galil's rule)
+
+    def feed(self, block) -> List[int]:
+        """
+        Search the next block, and return the offsets, plus 'base', of all occurrences of P
+        that end inside it, relative to the start of the first block.
+        """
+        R, L, F, P = self.pp_data
+        plen = len(self.pp_data)
+
+        # Drop everything before the earliest byte the current alignment can reach
+        keep = self.k - plen + 1
+        self.window = self.window[keep:] + block
+        self.base += keep
+
+        matches = []
+        self.k, self.previous_k = self.scan(R, L, F, P, self.window, len(self.window),
+                                            self.k - keep, self.previous_k - keep, self.base,
+                                            self.greedy, matches)
+        return matches
+
+
+class _StatsBlockSearch(_BlockSearch):
+    """
+    Copy of _BlockSearch which counts the work done in 'stats'.
+    """
+    __slots__ = ('stats',)
+
+    def __init__(self, pp_data, greedy, stats, base=0):
+        super().__init__(pp_data, greedy, base)
+        self.scan = _stats_scanner(pp_data, stats)
+        self.stats = stats
+
+    def feed(self, block) -> List[int]:
+        self.stats.bytes_scanned += len(block)
+        return super().feed(block)
+
+
+def _iter_search_blocks(pp_data, blocks, greedy, base=0, stats=None) -> Iterator[int]:
+    """
+    Generator that searches a sequence of consecutive blocks of bytes for all occurrences
+    of P, and yields the offset of each occurrence, plus 'base', relative to the start of
+    the first block. If 'stats' is not None, the work done is counted in it.
+    """
+    if len(pp_data) == 0:
+        return
+
+    if stats is None:
+        search = _BlockSearch(pp_data, greedy, base)
+    else:
+        search = _StatsBlockSearch(pp_data, greedy, stats, base)
+
+    for block in blocks:
+        matches = search.feed(block)
+
+        if matches:
+            yield from matches
+
+            if not greedy:
+                return
+
+
+def _base_search_file(pp_data, T, greedy, block_size=DEFAULT_BLOCK_SIZE, base=0,
+                      size=None) -> List[int]:
+    """
+    Search a file handle for all occurrences of P. The file is read sequentially in blocks
+    of 'block_size' bytes, using only forward reads, so T does not need to be seekable.
+    If size is not None, no more than 'size' bytes are read. 'base' is added to all
+    offsets.
+    """
+    return list(_iter_search_blocks(pp_data, _read_blocks(T, block_size, size), greedy, base))
+
+
+def _stats_search_file(pp_data, T, greedy, block_size, stats, base=0, size=None) -> List[int]:
+    """
+    Copy of _base_search_file which counts the work done, and the reads from T, in 'stats'.
+    """
+    blocks = _count_reads(_read_blocks(T, block_size, size), stats)
+    return list(_iter_search_blocks(pp_data, blocks, greedy, base, stats))
+
+
+def _search_buffer(T):
+    """
+    Return T in a form that the scan functions can search without copying it. str, bytes,
+    bytearray and mmap objects are returned as they are, and any other object supporting
+    the buffer protocol (memoryview, array, NumPy arrays etc.) is returned as a flat
+    memoryview of its bytes. Buffers that are not contiguous in memory, such as strided
+    slices, are copied into bytes, in the order that their elements are indexed in.
+    """
+    if isinstance(T, (str, bytes, bytearray, mmap.mmap)):
+        return T
+
+    view = memoryview(T)
+    if not view.c_contiguous:
+        return view.tobytes()
+
+    if (view.format != 'B') or (view.ndim != 1):
+        view = view.cast('B')
+
+    return view
+
+
+def _base_search_str(pp_data, T, T_size, greedy, start=0) -> List[int]:
+    """
+    Search T[start:T_size], where T is an in-memory byte string, for all occurrences of P,
+    without copying any of T. If T is a str, the pattern is searched for as a str, and the
+    offsets are character offsets.
+    """
+    if isinstance(T, str):
+        pp_data = _str_pattern(pp_data, T)
+
+    R, L, F, P = pp_data
+    matches = []
+    plen = len(pp_data)
+
+    if plen == 0 or T_size - start < plen:
+        return []
+
+    _scanner(pp_data, T)(R, L, F, P, T, T_size, start + plen - 1, -1, 0, greedy, matches)
+    return matches
+
+
+def _stats_search_str(pp_data, T, T_size, greedy, stats, start=0) -> List[int]:
+    """
+    Copy of _base_search_str which counts the work done in 'stats'.
+    """
+    if isinstance(T, str):
+        pp_data = _text_pattern(pp_data)
+
+    R, L, F, P = pp_data
+    matches = []
+    plen = len(pp_data)
+    stats.bytes_scanned += max(T_size - start, 0)
+
+    if plen == 0 or T_size - start < plen:
+        return []
+
+    _stats_scanner(pp_data, stats)(R, L, F, P, T, T_size, start + plen - 1, -1, 0, greedy,
+                                   matches)
+    return matches
+
+
+def _iter_search_str(pp_data, T, start, end, max_matches) -> Iterator[int]:
+    """
+    Generator that searches T[start:end] for occurrences of P, and yields the offset in T
+    of each occurrence as soon as it is found, until 'max_matches' have been yielded.
+    """
+    R, L, F, P = pp_data
+    plen = len(pp_data)
+
+    if plen == 0 or max_matches == 0:
+        return
+
+    k = start + plen - 1  # Represents alignment of end of P relative to T
+    previous_k = -1       # Represents alignment in previous phase (Galil's rule)
+    matches = []
+    scan = _scanner(pp_data, T)
+
+    while k < end:
+        k, previous_k = scan(R, L, F, P, T, end, k, previous_k, 0, False, matches)
+        if not matches:
+            return
+
+        yield matches.pop()
+
+        if max_matches is not None:
+            max_matches -= 1
+            if max_matches == 0:
+                return
+
+
+def _check_iter_args(max_matches, start, end):
+    """
+    Validate the arguments shared by all the iter_search_* functions.
+    """
+    if (max_matches is not None) and (max_matches < 0):
+        raise ValueError("max_matches must not be negative")
+
+    if start < 0:
+        raise ValueError("start must not be negative")
+
+    if (end is not None) and (end < start):
+        raise ValueError("end must not be less than start")
+
+
+def _compression(header: bytes) -> Optional[str]:
+    """
+    Detect the compression format of data starting with 'header', which should hold the
+    first 10 bytes of the data (or all of it, if it is shorter), by its magic bytes.
+    Returns the name of the format, or None if the data is not compressed in a
+    supported format.
+    """
+    if header.startswith(b'\x1f\x8b\x08'):
+        return "gzip"
+
+    if header.startswith(b'\xfd7zXZ\x00'):
+        return "xz"
+
+    if header.startswith(b'\x28\xb5\x2f\xfd'):
+        return "zstd"
+
+    # "BZh" is also plain text, so the block size digit and the magic bytes of the
+    # first block (or of the end of stream, for empty data) are checked too
+    if ((len(header) >= 10) and header.startswith(b'BZh') and (header[3] in b'123456789')
+            and (header[4:10] in (b'1AY&SY', b'\x17rE8P\x90'))):
+        return "bz2"
+
+    return None
+
+
+def _zstandard():
+    """
+    Import and return the zstandard module, which is only needed for zstd compressed
+    files, and so is not a dependency of this package.
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("the zstandard module is needed to search zstd compressed "
+                          "files (pip install zstandard)") from None
+
+    return zstandard
+
+
+def _decompressor(fh, compression):
+    """
+    Return a readable binary file-like object that yields the decompressed contents of
+    fh, which holds data compressed in the named format.
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fh, mode='rb')
+
+    if compression == "bz2":
+        return bz2.BZ2File(fh)
+
+    if compression == "xz":
+        return lzma.LZMAFile(fh)
+
+    return _zstandard().ZstdDecompressor().stream_reader(fh, read_across_frames=True)
+
+
+def _decompressed(fh):
+    """
+    Return a readable binary file-like object that yields the decompressed contents of
+    fh, if fh is compressed in a supported format, or fh itself if it is not. fh must be
+    a buffered binary reader, so that its first bytes can be checked without consuming
+    them.
+    """
+    compression = _compression(fh.peek(10)[:10])
+    if compression is None:
+        return fh
+
+    return _decompressor(fh, compression)
+
+
+class _LimitedReader(object):
+    """
+    Readable file-like object that reads no more than a fixed number of bytes from
+    another one, so that a decompressor can be given a range of a file.
+    """
+    __slots__ = ['fh', 'remaining']
+
+    def __init__(self, fh, size):
+        self.fh = fh
+        self.remaining = size
+
+    def read(self, size=-1):
+        if (size is None) or (size < 0) or (size > self.remaining):
+            size = self.remaining
+
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def _zstd_frame_offsets(data) -> List[int]:
+    """
+    Return the offsets of all zstd frames (not including skippable frames) in a bytes-like
+    object holding a whole zstd compressed file, by walking frame and block headers
+    without decompressing anything. Raises ValueError if the data is not valid.
+    """
+    offsets = []
+    pos = 0
+    size = len(data)
+
+    while pos < size:
+        if size - pos < 8:
+            raise ValueError("truncated zstd frame")
+
+        magic = struct.unpack_from('<I', data, pos)[0]
+
+        if (magic & 0xFFFFFFF0) == 0x184D2A50:
+            # Skippable frame, followed by a 4-byte frame size
+            pos += 8 + struct.unpack_from('<I', data, pos + 4)[0]
+            continue
+
+        if magic != 0xFD2FB528:
+            raise ValueError("invalid zstd frame")
+
+        offsets.append(pos)
+
+        descriptor = data[pos + 4]
+        single_segment = (descriptor >> 5) & 1
+        content_size_flag = descriptor >> 6
+        pos += (5 + (1 - single_segment) + (0, 1, 2, 4)[descriptor & 3]
+                + (single_segment, 2, 4, 8)[content_size_flag])
+
+        while True:
+            if size - pos < 3:
+                raise ValueError("truncated zstd block")
+
+            header = data[pos] | (data[pos + 1] << 8) | (data[pos + 2] << 16)
+            block_type = (header >> 1) & 3
+            if block_type == 3:
+                raise ValueError("invalid zstd block")
+
+            # RLE blocks hold a single byte, no matter how many times it is repeated
+            pos += 3 + (1 if block_type == 1 else header >> 3)
+            if header & 1:
+                break
+
+        if descriptor & 4:
+            pos += 4  # Content checksum
+
+    if pos != size:
+        raise ValueError("truncated zstd frame")
+
+    return offsets
+
+
+def _member_offsets(filename, compression, count) -> List[int]:
+    """
+    Return the offsets of up to 'count' gzip members or zstd frames in a file, spread as
+    evenly through the file as the members or frames allow, starting with 0. Any of the
+    offsets for gzip files may be false positives inside compressed data, which are
+    detected when the data before them turns out to be truncated.
+    """
+    with open(filename, 'rb') as fh:
+        try:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            return [0]
+
+    with mapped:
+        size = len(mapped)
+        targets = [(size * i) // count for i in range(1, count)]
+        offsets = {0}
+
+        if compression == "zstd":
+            try:
+                frames = _zstd_frame_offsets(mapped)
+            except (ValueError, IndexError, struct.error):
+                return [0]
+
+            for target in targets:
+                i = bisect.bisect_left(frames, target)
+                if i < len(frames):
+                    offsets.add(frames[i])
+
+            return sorted(offsets)
+
+        for target in targets:
+            pos = mapped.find(b'\x1f\x8b\x08', target)
+
+            # Reserved header flag bits are never set in a real gzip member header
+            while (pos > 0) and ((pos + 10 > size) or (mapped[pos + 3] & 0xE0)):
+                pos = mapped.find(b'\x1f\x8b\x08', pos + 1)
+
+            if pos > 0:
+                offsets.add(pos)
+
+        return sorted(offsets)
+
+
+# Pre-processed pattern data for the current worker process, set once per worker by
+# _parallel_init so that it does not need to be sent along with every byte range
+_parallel_pp_data = None
+
+# Shared multiprocessing.Value holding the index of the first byte range in which an
+# occurrence has been found so far, set by _parallel_init for non-greedy searches
+_parallel_first_match = None
+
+
+def _parallel_init(pp_data, first_match=None):
+    """
+    Initializer for worker processes used by search_file_parallel_pp.
+    """
+    global _parallel_pp_data, _parallel_first_match
+    _parallel_pp_data = pp_data
+    _parallel_first_match = first_match
+
+
+def _until_found_before(blocks, index) -> Iterator[bytes]:
+    """
+    Generator that yields each block from 'blocks', until an occurrence has been found in
+    a byte range before range number 'index' by another worker, which makes the rest of
+    this range irrelevant to a non-greedy search.
+    """
+    for block in blocks:
+        if _parallel_first_match.value < index:
+            return
+
+        yield block
+
+
+def _parallel_search_range(filename, start, end, greedy, block_size, index=0) -> List[int]:
+    """
+    Search for occurrences of the worker's pre-processed pattern that begin in the
+    byte range [start, end) of a file, which is range number 'index'. Runs in a worker
+    process. If greedy is False, the search stops at the first occurrence, or as soon as
+    an occurrence has been found in an earlier range.
+    """
+    size = end - start + len(_parallel_pp_data) - 1  # Overlap with the next range
+
+    with open(filename, 'rb') as fh:
+        fh.seek(start)
+        blocks = _read_blocks(fh, block_size, size)
+        if not greedy:
+            blocks = _until_found_before(blocks, index)
+
+        matches = [m for m in _iter_search_blocks(_parallel_pp_data, blocks, greedy, start)
+                   if m < end]
+
+    if matches and not greedy:
+        with _parallel_first_match.get_lock():
+            _parallel_first_match.value = min(_parallel_first_match.value, index)
+
+    return matches
+
+
+def _file_errors() -> Tuple[type, ...]:
+    """
+    Return the exception types that mean a single file could not be searched, and should
+    be reported without stopping the search of other files. Besides OSError, corrupt or
+    truncated compressed data raises a different error for each format.
+    """
+    errors = (OSError, EOFError, ImportError, zlib.error, lzma.LZMAError)
+
+    zstandard = sys.modules.get("zstandard")
+    if zstandard is not None:
+        errors += (zstandard.ZstdError,)
+
+    return errors
+
+
+def _parallel_search_file(filename, greedy, block_size, decompress):
+    """
+    Search for occurrences of the worker's pre-processed pattern in a whole file.
+    Runs in a worker process. Returns a (filename, offsets, error) tuple, where error
+    is the exception raised if the file could not be searched, or None.
+    """
+    max_matches = None if greedy else 1
+    try:
+        matches = list(_iter_search_file(_parallel_pp_data, filename, 0, None, max_matches,
+                                         block_size, decompress))
+    except _file_errors() as e:
+        return filename, [], e
+
+    return filename, matches, None
+
+
+def _parallel_search_members(filename, compression, start, end, block_size):
+    """
+    Decompress the gzip members or zstd frames in the byte range [start, end) of a file,
+    and search the decompressed data for all occurrences of the worker's pre-processed
+    pattern. Runs in a worker process. Returns a (decompressed size, offsets, head, tail)
+    tuple, where head and tail are the first and last len(pattern) - 1 decompressed
+    bytes, or None if the range does not hold whole members or frames.
+    """
+    keep = len(_parallel_pp_data) - 1
+    head = b''
+    tail = b''
+    size = 0
+
+    def blocks(reader):
+        nonlocal head, tail, size
+        for block in _read_blocks(reader, block_size):
+            if len(head) < keep:
+                head += block[:keep - len(head)]
+
+            if keep:
+                tail = (tail + block[-keep:])[-keep:]
+
+            size += len(block)
+            yield block
+
+    try:
+        with open(filename, 'rb') as fh:
+            fh.seek(start)
+            reader = _decompressor(_LimitedReader(fh, end - start), compression)
+            matches = list(_iter_search_blocks(_parallel_pp_data, blocks(reader), True))
+    except Exception:
+        # Any decompression error means that 'start' or 'end' is not really the start of
+        # a member or frame, and the caller falls back to decompressing the whole file
+        return None
+
+    return size, matches, head, tail
+
+
+def _join_member_results(pp_data, results) -> List[int]:
+    """
+    Combine the results of _parallel_search_members for consecutive ranges of a file
+    into offsets in the whole decompressed data, including occurrences that span the
+    boundaries between ranges.
+    """
+    keep = len(pp_data) - 1
+    matches = set()
+    base = 0
+
+    for i, (size, offsets, _, _) in enumerate(results):
+        matches.update(base + offset for offset in offsets)
+
+        if keep and (i > 0):
+            # Join the decompressed data on either side of this boundary. A range may
+            # decompress to fewer than len(pattern) - 1 bytes, so neighbours are
+            # collected until there is enough data on each side.
+            before = b''
+            for j in range(i - 1, -1, -1):
+                if len(before) >= keep:
+                    break
+                before = results[j][3] + before
+
+            after = b''
+            for j in range(i, len(results)):
+                if len(after) >= keep:
+                    break
+                after += results[j][2]
+
+            before = before[-keep:]
+            window = before + after[:keep]
+
+            for offset in _base_search_str(pp_data, window, len(window), True):
+                if offset < len(before):
+                    matches.add(base - len(before) + offset)
+
+        base += size
+
+    return sorted(matches)
+
+
+def _search_members_parallel(pp_data, filename, compression, greedy, workers,
+                             block_size) -> Optional[List[int]]:
+    """
+    Search a gzip file with multiple members, or a zstd file with multiple frames, by
+    decompressing and searching groups of members or frames in separate processes.
+    Returns None if the file cannot be split up like this.
+    """
+    starts = _member_offsets(filename, compression, workers)
+    if len(starts) < 2:
+        return None
+
+    ranges = zip(starts, starts[1:] + [os.path.getsize(filename)])
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_parallel_init,
+                                                initargs=(pp_data,)) as executor:
+        futures = [executor.submit(_parallel_search_members, filename, compression, start, end,
+                                   block_size) for start, end in ranges]
+        results = [future.result() for future in futures]
+
+    if None in results:
+        return None
+
+    matches = _join_member_results(pp_data, results)
+    return matches if greedy else matches[:1]
+
+
+def _expand_paths(paths, recursive) -> Iterator[str]:
+    """
+    Generator that yields the names of all files referred to by 'paths', which may be a
+    single path or an iterable of paths. Each path may be a file, a directory (all files
+    inside it are included) or a glob pattern.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+
+    for path in paths:
+        path = os.fspath(path)
+
+        if any(c in path for c in '*?['):
+            names = sorted(glob.glob(path, recursive=recursive))
+        else:
+            names = [path]
+
+        for name in names:
+            if not os.path.isdir(name):
+                yield name
+            elif recursive:
+                for root, dirs, files in os.walk(name):
+                    dirs.sort()
+                    for f in sorted(files):
+                        yield os.path.join(root, f)
+            else:
+                for f in sorted(os.listdir(name)):
+                    full = os.path.join(name, f)
+                    if not os.path.isdir(full):
+                        yield full
+
+
+def _file_size(filename) -> int:
+    """
+    Return the size of a file, or 0 if it cannot be found out, in which case the error is
+    reported when the file is searched.
+    """
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def _search_files(pp_data, paths, greedy, workers, recursive, block_size, decompress,
+                  onerror=None) -> Iterator[Tuple[str, int]]:
+    """
+    Generator that searches every file referred to by 'paths', and yields a (filename, offset)
+    tuple for each occurrence found. Files that cannot be searched are skipped, after
+    calling onerror(filename, error) if onerror is not None.
+    """
+    filenames = _expand_paths(paths, recursive)
+    max_matches = None if greedy else 1
+
+    if workers == 1:
+        for filename in filenames:
+            try:
+                for offset in _iter_search_file(pp_data, filename, 0, None, max_matches,
+                                                block_size, decompress):
+                    yield filename, offset
+            except _file_errors() as e:
+                if onerror is not None:
+                    onerror(filename, e)
+
+        return
+
+    # Largest files first, so that one big file does not end up running on its own at the end
+    filenames = sorted(filenames, key=_file_size, reverse=True)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_parallel_init,
+                                                initargs=(pp_data,)) as executor:
+        futures = [executor.submit(_parallel_search_file, f, greedy, block_size, decompress)
+                   for f in filenames]
+
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                filename, matches, error = future.result()
+                if (error is not None) and (onerror is not None):
+                    onerror(filename, error)
+
+                for offset in matches:
+                    yield filename, offset
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _encode_pattern(pattern) -> bytes:
+    """
+    Return a pattern as bytes, encoding it as UTF-8 if it is a str. Lone surrogates are
+    encoded as they would be in a str that is searched directly.
+    """
+    if isinstance(pattern, str):
+        return pattern.encode('utf-8', 'surrogatepass')
+    elif not isinstance(pattern, bytes):
+        raise ValueError("Pattern must be str or bytes")
+
+    return pattern
+
+
+def _utf8_chunks(T: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Generator that encodes T as UTF-8, DEFAULT_BLOCK_SIZE characters at a time, and yields
+    a (character offset, encoded bytes) tuple for each chunk, so that the encoding of a large
+    str can be processed without holding a full copy of it in memory.
+    """
+    for pos in range(0, len(T), DEFAULT_BLOCK_SIZE):
+        yield pos, T[pos:pos + DEFAULT_BLOCK_SIZE].encode('utf-8', 'surrogatepass')
+
+
+def _utf8_offsets(T: str, offsets) -> Iterator[int]:
+    """
+    Generator that converts character offsets in T, which must be in ascending order, to
+    the corresponding byte offsets in the UTF-8 encoding of T, without encoding all of T.
+    """
+    if T.isascii():
+        yield from offsets
+        return
+
+    pos = 0          # Character offset reached so far
+    byte_pos = 0     # Byte offset of T[pos]
+    for offset in offsets:
+        while pos < offset:
+            end = min(offset, pos + DEFAULT_BLOCK_SIZE)
+            byte_pos += len(T[pos:end].encode('utf-8', 'surrogatepass'))
+            pos = end
+
+        yield byte_pos
+
+
+def _char_offsets(T: str, offsets) -> Iterator[int]:
+    """
+    Generator that converts byte offsets in the UTF-8 encoding of T, which must be in
+    ascending order, to the corresponding character offsets in T. Byte offsets that are
+    not at the start of a character are converted to None.
+    """
+    if T.isascii():
+        yield from offsets
+        return
+
+    offsets = iter(offsets)
+    offset = next(offsets, None)
+    byte_pos = 0
+
+    for pos, chunk in _utf8_chunks(T):
+        while (offset is not None) and (offset < byte_pos + len(chunk)):
+            head = chunk[:offset - byte_pos]
+            if (chunk[len(head)] & 0xc0) == 0x80:  # UTF-8 continuation byte
+                yield None
+            else:
+                yield pos + len(head.decode('utf-8', 'surrogatepass'))
+
+            offset = next(offsets, None)
+
+        byte_pos += len(chunk)
+
+
+def _build_automaton(patterns: List[bytes]) -> Tuple:
+    """
+    Build an Aho-Corasick automaton for a list of patterns. Returns a tuple (G, X, O, N), where
+    G[s] is a dict mapping byte values to the next state for state s (the dict for the root state
+    0 has an entry for all ALPHABET_SIZE byte values), X[s] is the failure state for state s,
+    O[s] is a tuple of the indices of all patterns that end at state s, and N[i] is the length of
+    pattern i. Empty patterns are never matched.
+    """
+    G = [{}]
+    O = [[]]
+
+    for index, pattern in enumerate(patterns):
+        if len(pattern) == 0:
+            continue
+
+        state = 0
+        for c in pattern:
+            if c not in G[state]:
+                G.append({})
+                O.append([])
+                G[state][c] = len(G) - 1
+
+            state = G[state][c]
+
+        O[state].append(index)
+
+    X = array.array('q', [0]) * len(G)
+
+    # Breadth-first traversal, so that failure states are always computed before they are
+    # used. States one level below the root always fail back to the root.
+    queue = list(G[0].values())
+    for state in queue:
+        for c, next_state in G[state].items():
+            fail = X[state]
+            while fail and c not in G[fail]:
+                fail = X[fail]
+
+            X[next_state] = G[fail].get(c, 0)
+            O[next_state].extend(O[X[next_state]])
+            queue.append(next_state)
+
+    for c in range(ALPHABET_SIZE):
+        G[0].setdefault(c, 0)
+
+    return G, X, [tuple(o) for o in O], array.array('q', [len(p) for p in patterns])
+
+
+def _scan_many(G, X, O, N, T, state, base, matches) -> int:
+    """
+    Run the Aho-Corasick automaton over all of T, starting at 'state'. A (pattern index, offset)
+    tuple is appended to 'matches' for each occurrence of each pattern that ends in T, with 'base'
+    added to the offset. Returns the final state, so that the search can be resumed when more
+    data is available.
+    """
+    for h, c in enumerate(T):
+        while c not in G[state]:
+            state = X[state]
+
+        state = G[state][c]
+
+        for index in O[state]:
+            matches.append((index, base + h - N[index] + 1))
+
+    return state
+
+
+class SearchStats(object):
+    """
+    Counters describing the work done by searches. Pass a SearchStats object as the 'stats'
+    argument of search_string, search_file, search_file_mmap, search_stream, or the versions
+    of those ending with "_pp", to collect them. Counters are added to by each search, so one
+    object can collect totals for many searches. Searches that collect stats always use the
+    python implementation of the shift loop, even if the native backend is available, so
+    they are slower than searches that do not.
+
+    Attributes:
+
+    * preprocess_time: seconds spent pre-processing patterns
+    * search_time: seconds spent searching, including read_time
+    * read_time: seconds spent waiting for reads from files and streams
+    * reads: number of blocks read from files and streams
+    * bytes_read: number of bytes read from files and streams
+    * bytes_scanned: number of bytes of data searched
+    * alignments: number of alignments of the pattern that were tried
+    * comparisons: number of characters of the data compared against the pattern
+    * matches: number of occurrences found
+    * total_shift: sum of the shifts after every alignment
+    * max_shift: largest shift after any alignment
+    * bad_character_shifts: number of shifts decided by the bad character rule ("bm" only)
+    * good_suffix_shifts: number of shifts decided by the good suffix rule ("bm" only)
+    * galil_skips: number of occurrences confirmed without comparing the part of the \
+      alignment already known to match, by Galil's rule ("bm" only)
+    * galil_resets: number of times the part of the data known to match was forgotten, \
+      because the bad character rule decided the shift ("bm" only)
+    """
+    __slots__ = ['preprocess_time', 'search_time', 'read_time', 'reads', 'bytes_read',
+                 'bytes_scanned', 'alignments', 'comparisons', 'matches', 'total_shift',
+                 'max_shift', 'bad_character_shifts', 'good_suffix_shifts', 'galil_skips',
+                 'galil_resets']
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0.0 if name.endswith('_time') else 0)
+
+    @property
+    def average_shift(self) -> float:
+        """
+        Average shift after each alignment
+        """
+        return self.total_shift / self.alignments if self.alignments else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        Return all counters, and the average shift, as a dict.
+
+        :return: dict mapping counter names to values
+        :rtype: dict
+        """
+        ret = {name: getattr(self, name) for name in self.__slots__}
+        ret['average_shift'] = self.average_shift
+        return ret
+
+    def __repr__(self):
+        counters = ", ".join(f"{name}={value!r}" for name, value in self.as_dict().items())
+        return f"{self.__class__.__name__}({counters})"
+
+    def _add_scan(self, alignments, comparisons, matches, total_shift, max_shift):
+        self.alignments += alignments
+        self.comparisons += comparisons
+        self.matches += matches
+        self.total_shift += total_shift
+        self.max_shift = max(self.max_shift, max_shift)
+
+
+def _timed_call(stats, name, func, *args):
+    """
+    Call func(*args) and return the result, adding the time taken to the attribute 'name'
+    of 'stats'.
+    """
+    start_time = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        setattr(stats, name, getattr(stats, name) + time.perf_counter() - start_time)
+
+
+def _timed_offsets(offsets, stats) -> Iterator[int]:
+    """
+    Generator that yields each offset from the iterator 'offsets', adding the time spent
+    producing them (but not the time spent by the caller between them) to stats.search_time.
+    """
+    while True:
+        start_time = time.perf_counter()
+        try:
+            offset = next(offsets)
+        except StopIteration:
+            return
+        finally:
+            stats.search_time += time.perf_counter() - start_time
+
+        yield offset
+
+
+def _count_reads(blocks, stats) -> Iterator[bytes]:
+    """
+    Generator that yields each block from 'blocks', counting the number of blocks and bytes
+    read, and the time spent waiting for them, in 'stats'.
+    """
+    blocks = iter(blocks)
+    while True:
+        start_time = time.perf_counter()
+        block = next(blocks, None)
+        stats.read_time += time.perf_counter() - start_time
+
+        if block is None:
+            return
+
+        stats.reads += 1
+        stats.bytes_read += len(block)
+        yield block
+
+
+class Pattern(object):
+    """
+    Pre-processed pattern data, returned by boyermoore.preprocess. Can be passed
+    to any of the search functions ending with "_pp", pickled, or saved with
+    to_bytes() and loaded again with from_bytes(). For backwards compatibility,
+    iterating over a Pattern yields the tables (R, L, F, P).
+    """
+    __slots__ = ['R', 'L', 'F', 'P', 'algorithm', '_text', '_reversed']
+
+    # Serialized format: header, followed by the pattern bytes, followed by the R, L and
+    # F tables as little-endian 64-bit signed integers
+    _MAGIC = b'BMPT'
+    _VERSION = 1
+    _HEADER = struct.Struct('<4sBBBxQ')  # Magic, version, algorithm, compact flag, pattern length
+
+    def __init__(self, R, L, F, P, algorithm="bm"):
+        self.R = R
+        self.L = L
+        self.F = F
+        self.P = P
+        self.algorithm = algorithm
+        self._text = None  # Tables for searching str data, built by _text_pattern when needed
+        self._reversed = None  # Tables for searching backwards, built by _reversed_pattern
+
+    def __iter__(self):
+        return iter((self.R, self.L, self.F, self.P))
+
+    def __len__(self):
+        if self.algorithm == "byte-class":
+            return self.L[0]  # Wildcard syntax in P does not match any bytes itself
+
+        return len(self.P)
+
+    def __reduce__(self):
+        return (Pattern.from_bytes, (self.to_bytes(),))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.P!r}, algorithm={self.algorithm!r})"
+
+    @property
+    def pattern(self) -> bytes:
+        """
+        The pattern that was pre-processed, as bytes
+        """
+        return self.P
+
+    @property
+    def compact(self) -> bool:
+        """
+        True if this pattern uses Boyer-Moore with the compact bad character table
+        """
+        return (self.algorithm == "bm") and not isinstance(self.R, list)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize this pattern, so that it can be loaded again with Pattern.from_bytes.
+
+        :return: serialized pattern data
+        :rtype: bytes
+        """
+        tables = array.array('q')
+        for table in (self.R if (self.algorithm == "bm") and not self.compact else [self.R]):
+            tables.extend(table)
+
+        tables.extend(self.L)
+        tables.extend(self.F)
+
+        if sys.byteorder == 'big':
+            tables.byteswap()
+
+        header = self._HEADER.pack(self._MAGIC, self._VERSION, ALGORITHMS.index(self.algorithm),
+                                   self.compact, len(self.P))
+        return header + self.P + tables.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data) -> 'Pattern':
+        """
+        Load a pattern that was serialized with Pattern.to_bytes.
+
+        :param data: serialized pattern data. Must be bytes, or any other object \
+            supporting the buffer protocol, such as a memoryview or mmap.
+        :return: loaded pattern
+        :rtype: boyermoore.Pattern
+        """
+        data = memoryview(data).cast('B')
+        if len(data) < cls._HEADER.size:
+            raise ValueError("Serialized pattern data is truncated")
+
+        magic, version, algorithm, compact, plen = cls._HEADER.unpack_from(data)
+        if (magic != cls._MAGIC) or (version != cls._VERSION) or (algorithm >= len(ALGORITHMS)):
+            raise ValueError("Data is not a serialized pattern, or has an unsupported version")
+
+        algorithm = ALGORITHMS[algorithm]
+        if algorithm == "bm":
+            row_size = 1 if compact else plen + 1
+            R_size, L_size, F_size = ALPHABET_SIZE * row_size, plen, plen
+        elif algorithm == "two-way":
+            R_size, L_size, F_size = 0, 3, 0
+        elif algorithm == "rare-byte":
+            R_size, L_size, F_size = 0, 1, 0
+        elif algorithm == "byte-class":
+            # The size of the mask table depends on the number of byte classes in L[0]
+            R_size, L_size = ALPHABET_SIZE, 3
+            F_size = max(((len(data) - cls._HEADER.size - plen) // 8) - R_size - L_size, 0)
+        else:
+            R_size, L_size, F_size = ALPHABET_SIZE, 0, 0
+
+        tables_start = cls._HEADER.size + plen
+        if len(data) != tables_start + ((R_size + L_size + F_size) * 8):
+            raise ValueError("Serialized pattern data has the wrong size")
+
+        P = bytes(data[cls._HEADER.size:tables_start])
+
+        tables = array.array('q')
+        tables.frombytes(data[tables_start:])
+        if sys.byteorder == 'big':
+            tables.byteswap()
+
+        if (algorithm != "bm") or compact:
+            R = tables[:R_size]
+        else:
+            R = [tables[i:i + row_size] for i in range(0, R_size, row_size)]
+
+        L = tables[R_size:R_size + L_size]
+        F = tables[R_size + L_size:]
+        if (algorithm == "byte-class") and (len(F) != 4 * L[0]):
+            raise ValueError("Serialized pattern data has the wrong size")
+
+        pattern = cls(R, L, F, P, algorithm)
+        pattern._check_tables()
+        return pattern
+
+    def _check_tables(self):
+        """
+        Check that every value in the tables is in the range that the search loops rely on,
+        so that corrupted or crafted serialized data cannot make a search loop forever, or
+        shift the native backend outside of the data being searched. Every shift must be
+        between 1 and len(P) + 1. Raises ValueError if any value is out of range.
+        """
+        n = len(self)
+        if n == 0:
+            return  # Empty patterns are never searched for, whatever their tables hold
+
+        def check(values, low, high, name):
+            if len(values) and ((min(values) < low) or (max(values) > high)):
+                raise ValueError(f"Serialized pattern data has an invalid {name} table")
+
+        if self.algorithm in ["horspool", "raita", "byte-class"]:
+            check(self.R, 1, n, "R")
+        elif self.algorithm == "sunday":
+            check(self.R, 1, n + 1, "R")
+        elif self.algorithm == "rare-byte":
+            check(self.L, 0, n - 1, "L")
+        elif self.algorithm == "two-way":
+            crit, period, periodic = self.L
+            check([crit], 0, n - 1, "L")
+            check([period], 1, n if periodic else n + 1, "L")
+            check([periodic], 0, 1, "L")
+        elif self.algorithm == "bm":
+            if self.compact:
+                check(self.R, -1, n - 1, "R")
+            else:
+                # The bad character shift at position i is i - R[c][i], so R[c][i] < i
+                for row in self.R:
+                    check(row, -1, n - 1, "R")
+                    if not all(map(operator.lt, row, range(n + 1))):
+                        raise ValueError("Serialized pattern data has an invalid R table")
+
+            check(self.L, -1, n - 2, "L")
+            check(self.F[:1], 0, n, "F")
+            check(self.F[1:], 0, n - 1, "F")
+
+        if self.algorithm == "byte-class":
+            check(self.L[:1], 1, len(self.P), "L")
+            check(self.L[1:], 0, 1, "L")
+
+
+def _choose_algorithm(pattern: bytes) -> str:
+    """
+    Choose the algorithm to use for a pattern when preprocess is called with algorithm="auto".
+    Horspool's single table and simple loop wins whenever the bad character rule gives
+    reasonable shifts, while the good suffix rule of Boyer-Moore only pays for itself on
+    long patterns made of two byte values, where it does not. Long patterns with a very
+    small period, such as runs of zero bytes, use Two-Way, which never compares the same
+    byte of the data twice no matter how densely they occur.
+    """
+    distinct = len(set(pattern))
+    if ((len(pattern) >= AUTO_TWO_WAY_MIN_LENGTH) and (distinct <= AUTO_TWO_WAY_MAX_PERIOD) and
+            (_period(pattern) <= AUTO_TWO_WAY_MAX_PERIOD)):
+        return "two-way"
+
+    if (len(pattern) >= AUTO_BM_MIN_LENGTH) and (distinct <= AUTO_BM_MAX_DISTINCT_BYTES):
+        return "bm"
+
+    return "horspool"
+
+
+def preprocess(pattern, compact_table=None, algorithm="auto", ignore_case=False,
+               wildcards=False) -> Pattern:
+    """
+    Pre-process a pattern, for use with boyermoore_string_pp or boyermoore_file_pp.
+
+    :param pattern: pattern to pre-process. Must be either str or bytes.
+    :param compact_table: Only used by the "bm" algorithm. If True, use a bad character \
+        table with one entry per byte value, which is much smaller and faster to build. \
+        If False, use the full bad character table with one entry per byte value per \
+        pattern position, which can produce larger shifts. If None, the compact table is \
+        used for patterns of COMPACT_TABLE_MIN_LENGTH bytes or more.
+    :param str algorithm: string search algorithm to use. Must be one of "bm" \
+        (Boyer-Moore), "horspool" (Boyer-Moore-Horspool), "sunday" (Sunday's quick \
+        search), "raita" (Raita's variant of Boyer-Moore-Horspool), "two-way" \
+        (Crochemore-Perrin Two-Way, which runs in linear time with constant extra space \
+        even for highly periodic patterns and data), "rare-byte" (skip to each \
+        occurrence of the rarest byte of the pattern with bytes.find, or memchr in the \
+        native backend, and compare only the alignments around it) or "auto" (choose one \
+        of "bm", "horspool" and "two-way" based on the length and contents of the \
+        pattern). "byte-class" (Boyer-Moore-Horspool, with each pattern position \
+        matching a class of byte values) is the only algorithm that supports ignore_case \
+        and wildcards, and is always used when either of them is set. All algorithms \
+        find exactly the same occurrences.
+    :param bool ignore_case: If True, ASCII letters in the pattern match both upper and \
+        lower case letters in the data.
+    :param bool wildcards: If True, "?" in the pattern matches any byte, and "[...]" \
+        matches any of the bytes inside the brackets, which may include ranges such as \
+        "[0-9]", or any byte that is not inside the brackets if the first character \
+        inside is "!" or "^". A backslash makes the next character match literally. These \
+        match single bytes, so only ASCII characters should be used inside brackets.
+    :return: preprocessed data
+    :rtype: boyermoore.Pattern
+    """
+    pattern = _encode_pattern(pattern)
+
+    if ignore_case or wildcards:
+        if algorithm not in ["auto", "byte-class"]:
+            raise ValueError("ignore_case and wildcards are only supported by the "
+                             "\"byte-class\" algorithm")
+
+        algorithm = "byte-class"
+
+    if algorithm == "byte-class":
+        masks = _byte_classes(pattern, ignore_case, wildcards)
+        return Pattern(_class_shift_table(masks),
+                       array.array('q', [len(masks), ignore_case, wildcards]),
+                       _class_mask_table(masks), pattern, algorithm)
+
+    if algorithm == "auto":
+        algorithm = _choose_algorithm(pattern)
+    elif algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{algorithm}'")
+
+    if compact_table is None:
+        compact_table = len(pattern) >= COMPACT_TABLE_MIN_LENGTH
+
+    return _build_pattern(pattern, compact_table, algorithm)
+
+
+def _build_pattern(pattern, compact_table, algorithm) -> Pattern:
+    """
+    Build the tables for a pattern, which may be bytes or a str, using the given algorithm.
+    """
+    if algorithm in ["horspool", "raita"]:
+        return Pattern(_horspool_shift_table(pattern), array.array('q'), array.array('q'),
+                       pattern, algorithm)
+
+    if algorithm == "sunday":
+        return Pattern(_sunday_shift_table(pattern), array.array('q'), array.array('q'),
+                       pattern, algorithm)
+
+    if algorithm == "two-way":
+        return Pattern(array.array('q'), _two_way_table(pattern), array.array('q'),
+                       pattern, algorithm)
+
+    if algorithm == "rare-byte":
+        return Pattern(array.array('q'), _rare_byte_table(pattern), array.array('q'),
+                       pattern, algorithm)
+
+    if compact_table:
+        R = _compact_bad_character_table(pattern)
+    else:
+        R = [array.array('q', row) for row in _bad_character_table(pattern)]
+
+    N = array.array('q', [0]) * len(pattern)
+    if (_speedups is None) or (not isinstance(pattern, bytes)):
+        _suffix_lengths(pattern, N)
+    else:
+        _speedups.suffix_lengths(pattern, N)
+
+    L = _good_suffix_table(N)
+    F = _full_shift_table(N)
+
+    return Pattern(R, L, F, pattern, algorithm)
+
+
+def _text_pattern(pp_data) -> Pattern:
+    """
+    Return the version of a pre-processed pattern used to search str data, which has the
+    pattern decoded from UTF-8 and tables indexed by characters instead of byte values, so
+    that offsets are character offsets. It is built the first time it is needed, and kept
+    with pp_data for later searches.
+    """
+    if pp_data.algorithm == "byte-class":
+        raise ValueError("Patterns using ignore_case or wildcards can only be searched for "
+                         "in bytes")
+
+    if pp_data._text is None:
+        try:
+            pattern = pp_data.P.decode('utf-8', 'surrogatepass')
+        except UnicodeDecodeError:
+            raise ValueError("Pattern is not valid UTF-8, so it cannot be searched for in a str")
+
+        pp_data._text = _build_pattern(pattern, True, pp_data.algorithm)
+
+    return pp_data._text
+
+
+def _str_pattern(pp_data, T: str) -> Pattern:
+    """
+    Return the version of a pre-processed pattern used to search str T. The native backend
+    searches an ASCII str for an ASCII pattern using the byte tables, since character offsets
+    and byte offsets are the same, otherwise the tables from _text_pattern are used.
+    """
+    if ((_speedups is not None) and (pp_data.algorithm != "byte-class") and T.isascii() and
+            pp_data.P.isascii()):
+        return pp_data
+
+    return _text_pattern(pp_data)
+
+
+def _reversed_pattern(pp_data) -> Pattern:
+    """
+    Return the version of a pre-processed pattern used to search data backwards, which is
+    pre-processed with the same algorithm, for the pattern reversed. Searching the reversed
+    data for the reversed pattern finds the occurrences of the pattern from last to first.
+    It is built the first time it is needed, and kept with pp_data for later searches.
+    """
+    if pp_data._reversed is not None:
+        return pp_data._reversed
+
+    if pp_data.algorithm == "byte-class":
+        plen, ignore_case, wildcards = pp_data.L
+        masks = _byte_classes(pp_data.P, ignore_case, wildcards)[::-1]
+        reversed_pp = Pattern(_class_shift_table(masks), array.array('q', pp_data.L),
+                              _class_mask_table(masks), pp_data.P, pp_data.algorithm)
+    else:
+        reversed_pp = _build_pattern(pp_data.P[::-1], pp_data.compact, pp_data.algorithm)
+
+        if not pp_data.P.isascii():
+            # Reversing the UTF-8 encoding of a str does not give the UTF-8 encoding of the
+            # reversed str, so the tables for searching reversed str data are built here
+            try:
+                text = pp_data.P.decode('utf-8', 'surrogatepass')
+            except UnicodeDecodeError:
+                pass
+            else:
+                reversed_pp._text = _build_pattern(text[::-1], True, pp_data.algorithm)
+
+    pp_data._reversed = reversed_pp
+    return reversed_pp
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def _cached_preprocess(pattern: bytes) -> Pattern:
+    """
+    Pre-process a pattern, re-using the result of a previous call for the same pattern.
+    """
+    return preprocess(pattern)
+
+
+def _preprocess_cached(pattern, stats=None) -> Pattern:
+    """
+    Pre-process a pattern using the pattern cache. The pattern is encoded before the cache
+    lookup, so that a str and its UTF-8 encoding share the same cache entry. If 'stats' is
+    not None, the time taken is added to stats.preprocess_time.
+    """
+    if stats is None:
+        return _cached_preprocess(_encode_pattern(pattern))
+
+    return _timed_call(stats, 'preprocess_time', _preprocess_cached, pattern)
+
+
+def pattern_cache_info():
+    """
+    Return statistics for the cache of pre-processed patterns used by search_string,
+    search_file, and the other functions that accept a pattern instead of
+    pre-processed data.
+
+    :return: named tuple with fields hits, misses, maxsize and currsize
+    :rtype: functools._CacheInfo
+    """
+    return _cached_preprocess.cache_info()
+
+
+def pattern_cache_clear():
+    """
+    Remove all entries from the cache of pre-processed patterns, and reset its statistics.
+    """
+    _cached_preprocess.cache_clear()
+
+
+def preprocess_many(patterns) -> Tuple:
+    """
+    Pre-process multiple patterns, for use with search_string_many_pp or search_file_many_pp.
+
+    :param patterns: patterns to pre-process. Each pattern must be either str or bytes.
+    :return: tuple of preprocessed data
+    :rtype: tuple
+    """
+    return _build_automaton([_encode_pattern(p) for p in patterns])
+
+
+def search_string_pp(pp_data, string, greedy=True, byte_offsets=False, stats=None, start=0,
+                     end=None) -> List[int]:
+    """
+    Search for all occurrences of a pre-processed pattern inside a string.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param string: input data to search for pattern inside. Must be either str, or any \
+        object supporting the buffer protocol (bytes, bytearray, memoryview, mmap, \
+        array.array, NumPy arrays etc.), which is searched in place, without copying it, \
+        unless it is not contiguous in memory. A str is searched directly, without \
+        encoding it, and offsets are character offsets.
+    :param bool greedy: If True, all occurrences will be returned. If False, \
+        the search will stop after the first occurrence and only the first \
+        occurrence will be returned.
+    :param bool byte_offsets: If True and string is a str, return the byte offset of each \
+        occurrence in the UTF-8 encoding of string, instead of the character offset.
+    :param stats: SearchStats object to count the work done by the search in. If None, \
+        nothing is counted.
+    :param int start: offset to start searching at
+    :param int end: offset to stop searching at. Only occurrences that end \
+        before this offset will be returned. If None, the search continues to the end \
+        of the string.
+    :return: list of offsets of all occurrences that were found
+    :rtype: [int]
+    """
+    _check_iter_args(None, start, end)
+
+    string = _search_buffer(string)
+    end = len(string) if end is None else min(end, len(string))
+
+    if stats is None:
+        matches = _base_search_str(pp_data, string, end, greedy, start)
+    else:
+        matches = _timed_call(stats, 'search_time', _stats_search_str, pp_data, string,
+                              end, greedy, stats, start)
+
+    if byte_offsets and isinstance(string, str):
+        return list(_utf8_offsets(string, matches))
+
+    return matches
+
+
+def search_file_pp(pp_data, filename, greedy=True, block_size=DEFAULT_BLOCK_SIZE,
+                   stats=None, decompress=True, start=0, end=None) -> List[int]:
+    """
+    Search for all occurrences of a pre-processed pattern inside a file.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param str filename: name of file search for pattern in
+    :param bool greedy: If True, all occurrences will be returned. If False, \
+        the search will stop after the first occurrence and only the first \
+        occurrence will be returned.
+    :param int block_size: number of bytes to read from the file at a time
+    :param stats: SearchStats object to count the work done by the search in. If None, \
+        nothing is counted.
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data, as are start and end.
+    :param int start: byte offset to start searching at
+    :param int end: byte offset to stop searching at. Only occurrences that end \
+        before this offset will be returned. If None, the search continues to the end \
+        of the file.
+    :return: list of byte offsets of all occurrences that were found
+    :rtype: [int]
+    """
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    _check_iter_args(None, start, end)
+    size = None if end is None else end - start
+
+    with open(filename, 'rb') as fh:
+        if decompress:
+            fh = _decompressed(fh)
+
+        if start:
+            fh.seek(start)
+
+        if stats is None:
+            return _base_search_file(pp_data, fh, greedy, block_size, start, size)
+
+        return _timed_call(stats, 'search_time', _stats_search_file, pp_data, fh, greedy,
+                           block_size, stats, start, size)
+
+
+def search_file_mmap_pp(pp_data, filename, greedy=True, stats=None, decompress=True,
+                        start=0, end=None) -> List[int]:
+    """
+    Search for all occurrences of a pre-processed pattern inside a file, by
+    memory-mapping the file instead of reading it. Falls back to the same
+    buffered reader used by search_file_pp for files that cannot be mapped,
+    such as empty files, pipes and other non-regular files, and for compressed
+    files that are decompressed.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param str filename: name of file search for pattern in
+    :param bool greedy: If True, all occurrences will be returned. If False, \
+        the search will stop after the first occurrence and only the first \
+        occurrence will be returned.
+    :param stats: SearchStats object to count the work done by the search in. If None, \
+        nothing is counted.
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data, as are start and end.
+    :param int start: byte offset to start searching at
+    :param int end: byte offset to stop searching at. Only occurrences that end \
+        before this offset will be returned. If None, the search continues to the end \
+        of the file.
+    :return: list of byte offsets of all occurrences that were found
+    :rtype: [int]
+    """
+    _check_iter_args(None, start, end)
+    size = None if end is None else end - start
+
+    with open(filename, 'rb') as fh:
+        mapped = None
+        reader = _decompressed(fh) if decompress else fh
+
+        if (reader is fh) and stat.S_ISREG(os.fstat(fh.fileno()).st_mode):
+            try:
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty files cannot be mapped
+                pass
+
+        if mapped is None:
+            if start:
+                reader.seek(start)
+
+            if stats is None:
+                return _base_search_file(pp_data, reader, greedy, DEFAULT_BLOCK_SIZE, start,
+                                         size)
+
+            return _timed_call(stats, 'search_time', _stats_search_file, pp_data, reader,
+                               greedy, DEFAULT_BLOCK_SIZE, stats, start, size)
+
+        with mapped:
+            T_size = len(mapped) if end is None else min(end, len(mapped))
+            if stats is None:
+                return _base_search_str(pp_data, mapped, T_size, greedy, start)
+
+            return _timed_call(stats, 'search_time', _stats_search_str, pp_data, mapped,
+                               T_size, greedy, stats, start)
+
+
+def search_stream_pp(pp_data, stream, block_size=DEFAULT_BLOCK_SIZE,
+                     stats=None) -> Iterator[int]:
+    """
+    Search for all occurrences of a pre-processed pattern inside a stream of bytes,
+    yielding the byte offset of each occurrence as soon as it is found. Only the
+    current block and up to len(pattern) - 1 bytes from the previous block are held
+    in memory, so unbounded streams can be searched.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param stream: stream to search for pattern inside. Must be either a readable \
+        binary file-like object (e.g. the return value of open(), gzip.open() or \
+        socket.makefile('rb')), or an iterable of bytes-like objects.
+    :param int block_size: number of bytes to read at a time, if stream is a \
+        file-like object
+    :param stats: SearchStats object to count the work done by the search in. If None, \
+        nothing is counted.
+    :return: generator yielding byte offsets of all occurrences that were found
+    :rtype: generator
+    """
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    if stats is None:
+        return _iter_search_blocks(pp_data, _read_blocks(stream, block_size), True)
+
+    blocks = _count_reads(_read_blocks(stream, block_size), stats)
+    return _timed_offsets(_iter_search_blocks(pp_data, blocks, True, stats=stats), stats)
+
+
+def iter_search_string_pp(pp_data, string, max_matches=None, start=0, end=None,
+                          byte_offsets=False) -> Iterator[int]:
+    """
+    Search for occurrences of a pre-processed pattern inside a string, yielding the
+    offset of each occurrence as soon as it is found. The search stops as soon
+    as the caller stops iterating.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param string: input data to search for pattern inside. Must be either str, or any \
+        object supporting the buffer protocol, which is searched in place. A str is \
+        searched directly, without encoding it, and offsets are character offsets.
+    :param int max_matches: maximum number of occurrences to yield. If None, all \
+        occurrences will be yielded.
+    :param int start: offset to start searching at
+    :param int end: offset to stop searching at. Only occurrences that end \
+        before this offset will be yielded. If None, the search continues to the end \
+        of the string.
+    :param bool byte_offsets: If True and string is a str, yield the byte offset of each \
+        occurrence in the UTF-8 encoding of string, instead of the character offset.
+    :return: generator yielding offsets of occurrences that were found
+    :rtype: generator
+    """
+    _check_iter_args(max_matches, start, end)
+
+    string = _search_buffer(string)
+    end = len(string) if end is None else min(end, len(string))
+    if not isinstance(string, str):
+        return _iter_search_str(pp_data, string, start, end, max_matches)
+
+    matches = _iter_search_str(_str_pattern(pp_data, string), string, start, end, max_matches)
+    return _utf8_offsets(string, matches) if byte_offsets else matches
+
+
+def rsearch_string_pp(pp_data, string, max_matches=None, start=0, end=None,
+                      block_size=DEFAULT_BLOCK_SIZE) -> List[int]:
+    """
+    Search for occurrences of a pre-processed pattern inside a string backwards, starting
+    from the end, and return their offsets from last to first. The string is searched in
+    blocks of 'block_size' bytes, so finding the last few occurrences only searches as
+    much of the end of the string as is needed to find them.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param string: input data to search for pattern inside. Must be either str, or any \
+        object supporting the buffer protocol. A str is searched directly, without \
+        encoding it, and offsets are character offsets.
+    :param int max_matches: maximum number of occurrences to return. If None, all \
+        occurrences will be returned.
+    :param int start: offset to stop searching at. Only occurrences that start at \
+        or after this offset will be returned.
+    :param int end: offset to start searching backwards from. Only occurrences that end \
+        before this offset will be returned. If None, the search starts at the end of the \
+        string.
+    :param int block_size: number of bytes (or characters, if string is a str) to \
+        reverse and search at a time
+    :return: list of offsets of occurrences that were found, from last to first
+    :rtype: [int]
+    """
+    _check_iter_args(max_matches, start, end)
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    string = _search_buffer(string)
+    end = len(string) if end is None else min(end, len(string))
+
+    reversed_pp = _reversed_pattern(pp_data)
+    if isinstance(string, str):
+        reversed_pp = _str_pattern(reversed_pp, string)
+
+    def read(low, high):
+        data = string[low:high]
+        return data.tobytes() if isinstance(data, memoryview) else data
+
+    return list(_iter_rsearch(reversed_pp, read, start, end, max_matches, block_size))
+
+
+def _search_file_reverse(pp_data, filename, max_matches, start, end, block_size,
+                         decompress) -> List[int]:
+    """
+    Open a file, and search the byte range [start, end) backwards for occurrences of P.
+    Files that cannot be read backwards (compressed files that are decompressed, pipes
+    etc.) are searched forwards instead, keeping only the last 'max_matches' occurrences.
+    """
+    with open(filename, 'rb') as fh:
+        reader = _decompressed(fh) if decompress else fh
+
+        if (reader is not fh) or not fh.seekable():
+            if start:
+                reader.seek(start)
+
+            size = None if end is None else end - start
+            blocks = _read_blocks(reader, block_size, size)
+            matches = collections.deque(_iter_search_blocks(pp_data, blocks, True, start),
+                                        max_matches)
+            matches.reverse()
+            return list(matches)
+
+        def read(low, high):
+            fh.seek(low)
+            return fh.read(high - low)
+
+        size = fh.seek(0, os.SEEK_END)
+        end = size if end is None else min(end, size)
+        return list(_iter_rsearch(_reversed_pattern(pp_data), read, start, end, max_matches,
+                                  block_size))
+
+
+def _iter_search_file(pp_data, filename, start, end, max_matches, block_size,
+                      decompress) -> Iterator[int]:
+    """
+    Generator that opens a file, and searches the byte range [start, end) for occurrences
+    of P, until 'max_matches' have been yielded. If 'decompress' is True and the file is
+    compressed, the range is in the decompressed data.
+    """
+    if max_matches == 0:
+        return
+
+    with open(filename, 'rb') as fh:
+        if decompress:
+            fh = _decompressed(fh)
+
+        if start:
+            fh.seek(start)
+
+        size = None if end is None else end - start
+        blocks = _read_blocks(fh, block_size, size)
+        matches = _iter_search_blocks(pp_data, blocks, True, start)
+        yield from itertools.islice(matches, max_matches)
+
+
+def _checkpoint_head(fh, offset) -> int:
+    """
+    Return the CRC32 of the first CHECKPOINT_HEAD_SIZE bytes of file handle fh, or of the
+    first 'offset' bytes if that is less. The position of fh is left unchanged.
+    """
+    position = fh.tell()
+    fh.seek(0)
+    head = fh.read(min(offset, CHECKPOINT_HEAD_SIZE))
+    fh.seek(position)
+    return zlib.crc32(head)
+
+
+def _iter_rsearch(reversed_pp, read, start, end, max_matches, block_size) -> Iterator[int]:
+    """
+    Generator that searches the data in the range [start, end) backwards for occurrences of
+    P, and yields the offset of each occurrence, from last to first, until 'max_matches'
+    have been yielded. 'reversed_pp' must be the return value of _reversed_pattern (or of
+    _str_pattern for it, if the data is a str), and 'read(low, high)' must return the data
+    in the range [low, high). The data is read in blocks of 'block_size' bytes starting
+    from the end, plus up to len(P) - 1 bytes after each block, and each block is reversed
+    and searched for the reversed pattern.
+    """
+    plen = len(reversed_pp)
+    if plen == 0 or max_matches == 0:
+        return
+
+    high = end  # All occurrences starting at or after 'high' have been yielded
+
+    while high > start:
+        low = max(start, high - block_size)
+        top = min(high + plen - 1, end)
+
+        if top - low >= plen:
+            window = read(low, top)[::-1]
+
+            for offset in _iter_search_str(reversed_pp, window, 0, len(window), max_matches):
+                yield top - offset - plen
+
+                if max_matches is not None:
+                    max_matches -= 1
+                    if max_matches == 0:
+                        return
+
+        high = low
+
+
+def _read_checkpoint(checkpoint, fh) -> Optional[int]:
+    """
+    Return the offset to resume searching file handle fh at, from a checkpoint file written
+    by _write_checkpoint, or None if the checkpoint file does not exist. If the checkpoint
+    was written for a different file (the file was rotated since), or an offset past the
+    end of the file (the file was truncated since), 0 is returned.
+    """
+    try:
+        with open(checkpoint, 'r') as fh_checkpoint:
+            data = json.load(fh_checkpoint)
+
+        device, inode, offset, head = data['device'], data['inode'], data['offset'], data['head']
+    except FileNotFoundError:
+        return None
+    except (ValueError, TypeError, KeyError):
+        raise ValueError(f"'{checkpoint}' is not a valid checkpoint file")
+
+    st = os.fstat(fh.fileno())
+    if (((device, inode) != (st.st_dev, st.st_ino)) or (offset > st.st_size) or
+            (head != _checkpoint_head(fh, offset))):
+        return 0
+
+    return offset
+
+
+def _write_checkpoint(checkpoint, fh, offset):
+    """
+    Save the offset to resume searching file handle fh at in a checkpoint file. The
+    checkpoint file is replaced atomically, so that it is never left half written.
+    """
+    st = os.fstat(fh.fileno())
+    data = {'device': st.st_dev, 'inode': st.st_ino, 'offset': offset,
+            'head': _checkpoint_head(fh, offset)}
+
+    temp_path = checkpoint + ".tmp"
+    with open(temp_path, 'w') as fh_checkpoint:
+        json.dump(data, fh_checkpoint)
+
+    os.replace(temp_path, checkpoint)
+
+
+def _follow_file(pp_data, filename, from_offset, poll_interval, block_size, checkpoint,
+                 timeout) -> Iterator[int]:
+    """
+    Generator that searches a file from 'from_offset', and then keeps searching the data
+    appended to it, yielding the offset of each occurrence of P as soon as it is found. If
+    the file is replaced (a different file exists at 'filename') or truncated, the search
+    starts again at the start of the new data, once everything left in the old file has been
+    searched. If 'timeout' is not None, the generator returns once no data has been appended
+    for 'timeout' seconds.
+    """
+    plen = len(pp_data)
+    if plen == 0:
+        return
+
+    fh = open(filename, 'rb')
+    try:
+        st = os.fstat(fh.fileno())
+        offset = None if checkpoint is None else _read_checkpoint(checkpoint, fh)
+        if offset is None:
+            offset = st.st_size if from_offset is None else from_offset
+
+        idle_since = time.monotonic()
+
+        while True:
+            fh.seek(offset)
+            search = _BlockSearch(pp_data, True, offset)
+            position = offset
+            saved = None
+
+            while True:
+                # Every occurrence found so far has been handed over to the caller by now, so
+                # a restarted process only needs to search from where the next one could be
+                resume = max(position - plen + 1, offset)
+                if (checkpoint is not None) and (resume != saved):
+                    _write_checkpoint(checkpoint, fh, resume)
+                    saved = resume
+
+                block = fh.read(block_size)
+                if block:
+                    position += len(block)
+                    idle_since = time.monotonic()
+                    yield from search.feed(block)
+                    continue
+
+                try:
+                    new_st = os.stat(filename)
+                except FileNotFoundError:
+                    # Rotated, and the new file has not been created yet
+                    new_st = st
+
+                if (new_st.st_dev, new_st.st_ino) != (st.st_dev, st.st_ino):
+                    fh.close()
+                    fh = open(filename, 'rb')
+                    st = os.fstat(fh.fileno())
+                    break
+
+                if os.fstat(fh.fileno()).st_size < position:
+                    break
+
+                if (timeout is not None) and (time.monotonic() - idle_since >= timeout):
+                    return
+
+                time.sleep(poll_interval)
+
+            offset = 0
+    finally:
+        fh.close()
+
+
+async def _async_search_file(pp_data, filename, block_size, executor) -> AsyncIterator[int]:
+    """
+    Async generator that opens a file and searches it for all occurrences of P. Each block
+    is read and searched by a single call in the executor, so the event loop is only
+    blocked for as long as it takes to hand over one block at a time.
+    """
+    # asyncio is only imported when needed, since it takes longer to import than this module
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    files = []
+
+    def open_file():
+        files.append(open(filename, 'rb'))
+        return files[0]
+
+    def close_file(future=None):
+        for fh in files:
+            fh.close()
+
+    # Cancelling the await of a call in the executor does not stop the call, so each call
+    # is shielded, and the file is only closed once the last one has finished
+    pending = loop.run_in_executor(executor, open_file)
+
+    try:
+        fh = await asyncio.shield(pending)
+        if len(pp_data) == 0:
+            return
+
+        search = _BlockSearch(pp_data, True)
+
+        def search_block():
+            block = fh.read(block_size)
+            return block, (search.feed(block) if block else [])
+
+        while True:
+            pending = loop.run_in_executor(executor, search_block)
+            block, matches = await asyncio.shield(pending)
+            if not block:
+                return
+
+            for offset in matches:
+                yield offset
+    finally:
+        if pending.done():
+            close_file()
+        else:
+            # If this wait is cancelled too, the file is still closed when the call finishes
+            pending.add_done_callback(close_file)
+            await asyncio.wait([pending])
+
+
+async def _async_search_stream(pp_data, reader, block_size, executor) -> AsyncIterator[int]:
+    """
+    Async generator that reads blocks from an asyncio stream reader on the event loop,
+    and searches each block for all occurrences of P in the executor.
+    """
+    import asyncio
+
+    if len(pp_data) == 0:
+        return
+
+    loop = asyncio.get_running_loop()
+    search = _BlockSearch(pp_data, True)
+
+    while True:
+        block = await reader.read(block_size)
+        if not block:
+            return
+
+        for offset in await loop.run_in_executor(executor, search.feed, block):
+            yield offset
+
+
+def iter_search_file_pp(pp_data, filename, max_matches=None, start=0, end=None,
+                        block_size=DEFAULT_BLOCK_SIZE, decompress=True) -> Iterator[int]:
+    """
+    Search for occurrences of a pre-processed pattern inside a file, yielding the
+    byte offset of each occurrence as soon as it is found. The search stops, and the
+    file is closed, as soon as the caller stops iterating.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param str filename: name of file search for pattern in
+    :param int max_matches: maximum number of occurrences to yield. If None, all \
+        occurrences will be yielded.
+    :param int start: byte offset to start searching at
+    :param int end: byte offset to stop searching at. Only occurrences that end \
+        before this offset will be yielded. If None, the search continues to the end \
+        of the file.
+    :param int block_size: number of bytes to read from the file at a time
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data, as are start and end.
+    :return: generator yielding byte offsets of occurrences that were found
+    :rtype: generator
+    """
+    _check_iter_args(max_matches, start, end)
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    return _iter_search_file(pp_data, filename, start, end, max_matches, block_size, decompress)
+
+
+def search_file_reverse_pp(pp_data, filename, max_matches=None, start=0, end=None,
+                           block_size=DEFAULT_BLOCK_SIZE, decompress=True) -> List[int]:
+    """
+    Search for occurrences of a pre-processed pattern inside a file backwards, starting
+    from the end, and return their byte offsets from last to first. The file is read
+    backwards in blocks of 'block_size' bytes, so finding the last few occurrences in a
+    large file only reads as much of the end of the file as is needed to find them.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param str filename: name of file search for pattern in
+    :param int max_matches: maximum number of occurrences to return. If None, all \
+        occurrences will be returned.
+    :param int start: byte offset to stop searching at. Only occurrences that start at \
+        or after this offset will be returned.
+    :param int end: byte offset to start searching backwards from. Only occurrences that \
+        end before this offset will be returned. If None, the search starts at the end of \
+        the file.
+    :param int block_size: number of bytes to read from the file at a time
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data, as are start and end. Compressed data \
+        cannot be read backwards, so the whole of a compressed file is searched, as are \
+        files that cannot be read backwards, such as pipes.
+    :return: list of byte offsets of occurrences that were found, from last to first
+    :rtype: [int]
+    """
+    _check_iter_args(max_matches, start, end)
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    return _search_file_reverse(pp_data, filename, max_matches, start, end, block_size,
+                                decompress)
+
+
+def follow_file_pp(pp_data, filename, from_offset=0, poll_interval=DEFAULT_POLL_INTERVAL,
+                   block_size=DEFAULT_BLOCK_SIZE, checkpoint=None, timeout=None) -> Iterator[int]:
+    """
+    Search for occurrences of a pre-processed pattern inside a file that is being appended
+    to, such as a log file, yielding the byte offset of each occurrence as soon as it is
+    found, like "tail -f". After the end of the file is reached, the file is checked for new
+    data every 'poll_interval' seconds, and only the new data (plus up to len(pattern) - 1
+    bytes before it) is searched. If the file is rotated (replaced by a new file with the
+    same name) or truncated (detected when it becomes shorter than the data searched so
+    far), the rest of the old file is searched, and then the new data is searched from the
+    start, with offsets relative to the start of the new data. The
+    search stops, and the file is closed, as soon as the caller stops iterating.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param str filename: name of file search for pattern in
+    :param int from_offset: byte offset to start searching at. If None, only data \
+        appended after the call is searched.
+    :param float poll_interval: number of seconds to wait before checking for new data \
+        again, after reaching the end of the file
+    :param int block_size: number of bytes to read from the file at a time
+    :param str checkpoint: name of a file to save the progress of the search in. The \
+        checkpoint is updated once the caller has received all of the occurrences found \
+        so far, and if it exists when follow_file_pp is called, the search resumes where \
+        it left off instead of starting at from_offset, so that a restarted process does \
+        not search the file again. Occurrences that were yielded just before the process \
+        stopped may be yielded again. If None, no checkpoint is saved.
+    :param float timeout: If not None, stop once no data has been appended to the file \
+        for this many seconds. If None, the search never stops by itself.
+    :return: generator yielding byte offsets of occurrences that were found
+    :rtype: generator
+    """
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    if (from_offset is not None) and (from_offset < 0):
+        raise ValueError("from_offset must not be negative")
+
+    if poll_interval < 0:
+        raise ValueError("poll_interval must not be negative")
+
+    return _follow_file(pp_data, filename, from_offset, poll_interval, block_size, checkpoint,
+                        timeout)
+
+
+def async_search_file_pp(pp_data, filename, block_size=DEFAULT_BLOCK_SIZE,
+                         executor=None) -> AsyncIterator[int]:
+    """
+    Search for all occurrences of a pre-processed pattern inside a file, from a coroutine,
+    yielding the byte offset of each occurrence as soon as it is found. Reading and
+    searching each block is done in an executor, so the event loop is never blocked
+    for longer than it takes to start searching one block. The search stops, and the
+    file is closed, as soon as the caller stops iterating or the task is cancelled.
+    One pre-processed pattern can be shared by any number of concurrent searches.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param str filename: name of file search for pattern in
+    :param int block_size: number of bytes to read and search in the executor at a time
+    :param executor: concurrent.futures.Executor to read and search blocks in. If \
+        None, the default executor of the event loop is used.
+    :return: async generator yielding byte offsets of all occurrences that were found
+    :rtype: async generator
+    """
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    return _async_search_file(pp_data, filename, block_size, executor)
+
+
+def async_search_stream_pp(pp_data, reader, block_size=DEFAULT_BLOCK_SIZE,
+                           executor=None) -> AsyncIterator[int]:
+    """
+    Search for all occurrences of a pre-processed pattern inside an asyncio stream,
+    yielding the byte offset of each occurrence as soon as it is found. Blocks are read
+    on the event loop, and each block is searched in an executor. Only the current block
+    and up to len(pattern) - 1 bytes from the previous block are held in memory, so
+    unbounded streams can be searched.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param reader: stream to search for pattern inside, such as an asyncio.StreamReader. \
+        Must have a read(n) coroutine method that returns up to n bytes, or b'' at EOF.
+    :param int block_size: maximum number of bytes to read and search at a time
+    :param executor: concurrent.futures.Executor to search blocks in. If None, the \
+        default executor of the event loop is used.
+    :return: async generator yielding byte offsets of all occurrences that were found
+    :rtype: async generator
+    """
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    return _async_search_stream(pp_data, reader, block_size, executor)
+
+
+def search_file_parallel_pp(pp_data, filename, greedy=True, workers=None,
+                            block_size=DEFAULT_BLOCK_SIZE, decompress=True) -> List[int]:
+    """
+    Search for all occurrences of a pre-processed pattern inside a file, using multiple
+    processes. The file is split into one byte range per worker, and each range is
+    searched in a separate process. Compressed files are split at the boundaries
+    between gzip members or zstd frames, if there are any, and are otherwise
+    decompressed and searched in the calling process.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param str filename: name of file search for pattern in
+    :param bool greedy: If True, all occurrences will be returned. If False, \
+        the search will stop after the first occurrence and only the first \
+        occurrence will be returned.
+    :param int workers: number of worker processes to use. If None, the number of \
+        CPUs on the system will be used.
+    :param int block_size: number of bytes to read from the file at a time
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data.
+    :return: list of byte offsets of all occurrences that were found
+    :rtype: [int]
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    elif workers < 1:
+        raise ValueError("workers must be greater than 0")
+
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    compression = None
+    if decompress:
+        with open(filename, 'rb') as fh:
+            compression = _compression(fh.read(10))
+
+    if compression is not None:
+        matches = None
+        if (len(pp_data) > 0) and (workers > 1) and (compression in ("gzip", "zstd")):
+            matches = _search_members_parallel(pp_data, filename, compression, greedy, workers,
+                                               block_size)
+
+        if matches is None:
+            matches = search_file_pp(pp_data, filename, greedy, block_size)
+
+        return matches
+
+    file_size = os.path.getsize(filename)
+    range_size = max(-(-file_size // workers), 1)
+    ranges = [(s, min(s + range_size, file_size)) for s in range(0, file_size, range_size)]
+
+    matches = []
+
+    # Workers searching ranges after the first range with an occurrence stop early, since
+    # the executor waits for all running workers before it can be shut down
+    first_match = None if greedy else multiprocessing.Value('q', len(ranges))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_parallel_init,
+                                                initargs=(pp_data, first_match)) as executor:
+        futures = [executor.submit(_parallel_search_range, filename, start, end, greedy,
+                                   block_size, i)
+                   for i, (start, end) in enumerate(ranges)]
+
+        # Ranges are in file order, so the first range with an occurrence has the earliest one
+        for future in futures:
+            matches.extend(future.result())
+
+            if matches and not greedy:
+                for f in futures:
+                    f.cancel()
+
+                break
+
+    return matches
+
+
+def search_files_pp(pp_data, paths, greedy=True, workers=None, recursive=True,
+                    block_size=DEFAULT_BLOCK_SIZE, decompress=True,
+                    onerror=None) -> Iterator[Tuple[str, int]]:
+    """
+    Search for all occurrences of a pre-processed pattern inside many files, using
+    multiple processes. Each file is searched in a single process, and results for each
+    file are yielded as soon as that file has been searched, so results for different
+    files may arrive in any order.
+
+    :param pp_data: return value from boyermoore.preprocess
+    :param paths: file to search, directory containing files to search, or glob \
+        pattern matching files to search, or an iterable of any of those.
+    :param bool greedy: If True, all occurrences in each file will be returned. If \
+        False, only the first occurrence in each file will be returned.
+    :param int workers: number of worker processes to use. If None, the number of \
+        CPUs on the system will be used. If 1, all files are searched in the \
+        calling process, in order.
+    :param bool recursive: If True, directories are searched recursively, and \
+        ``**`` in glob patterns matches any files and zero or more directories.
+    :param int block_size: number of bytes to read from each file at a time
+    :param bool decompress: If True, files compressed with gzip, bz2, xz or zstd, \
+        detected by their first few bytes, are decompressed as they are searched, and offsets \
+        are byte offsets in the decompressed data.
+    :param onerror: Files that cannot be searched (missing files, broken symbolic links, \
+        files that cannot be read, corrupt compressed files etc.) are skipped. If onerror \
+        is not None, onerror(filename, error) is called for each of them, with the \
+        exception that was raised, which may also be raised again to stop the search.
+    :return: generator yielding a (filename, byte offset) tuple for each occurrence
+    :rtype: generator
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    elif workers < 1:
+        raise ValueError("workers must be greater than 0")
+
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    return _search_files(pp_data, paths, greedy, workers, recursive, block_size, decompress,
+                         onerror)
+
+
+def search_string_many_pp(pp_data, string, start=0, end=None) -> List[Tuple[int, int]]:
+    """
+    Search for all occurrences of multiple pre-processed patterns inside a string, in a
+    single pass.
+
+    :param pp_data: return value from boyermoore.preprocess_many
+    :param string: input data to search for patterns inside. Must be either str, or any \
+        object supporting the buffer protocol, which is searched in place. If string is \
+        a str, its UTF-8 encoding is searched a piece at a time, and offsets are \
+        character offsets.
+    :param int start: offset to start searching at
+    :param int end: offset to stop searching at. Only occurrences that end \
+        before this offset will be returned. If None, the search continues to the end \
+        of the string.
+    :return: list of (pattern index, offset) tuples for all occurrences that were \
+        found, sorted by offset and then pattern index
+    :rtype: [(int, int)]
+    """
+    _check_iter_args(None, start, end)
+
+    G, X, O, N = pp_data
+    matches = []
+
+    if not isinstance(string, str):
+        with memoryview(_search_buffer(string)) as view:
+            _scan_many(G, X, O, N, view[start:end], 0, start, matches)
+
+        matches.sort(key=lambda m: (m[1], m[0]))
+        return matches
+
+    if start or (end is not None):
+        return [(index, start + offset) for index, offset in
+                search_string_many_pp(pp_data, string[start:end])]
+
+    state = 0
+    base = 0
+    for _, chunk in _utf8_chunks(string):
+        state = _scan_many(G, X, O, N, chunk, state, base, matches)
+        base += len(chunk)
+
+    matches.sort(key=lambda m: (m[1], m[0]))
+    offsets = _char_offsets(string, [m[1] for m in matches])
+    return [(index, offset) for (index, _), offset in zip(matches, offsets) if offset is not None]
+
+
+def search_file_many_pp(pp_data, filename, block_size=DEFAULT_BLOCK_SIZE,
+                        decompress=True) -> List[Tuple[int, int]]:
+    """
+    Search for all occurrences of multiple pre-processed patterns inside a file, in a
+    single pass.
+
+    :param pp_data: return value from boyermoore.preprocess_many
+    :param str filename: name of file search for patterns in
+    :param int block_size: number of bytes to read from the file at a time
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data.
+    :return: list of (pattern index, byte offset) tuples for all occurrences that were \
+        found, sorted by byte offset and then pattern index
+    :rtype: [(int, int)]
+    """
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    G, X, O, N = pp_data
+    matches = []
+    state = 0
+    base = 0
+
+    with open(filename, 'rb') as fh:
+        if decompress:
+            fh = _decompressed(fh)
+
+        for block in _read_blocks(fh, block_size):
+            state = _scan_many(G, X, O, N, block, state, base, matches)
+            base += len(block)
+
+    matches.sort(key=lambda m: (m[1], m[0]))
+    return matches
+
+
+def _trigram_bit(a: int, b: int, c: int, bits: int) -> int:
+    """
+    Return the signature bit, in a signature of 'bits' bits, for the 3-byte sequence a, b, c.
+    """
+    return ((((((a << 16) | (b << 8) | c) * 2654435761) & 0xFFFFFFFF) >> 8) % bits)
+
+
+def _block_signature(T, start, end, signature):
+    """
+    Set the bit chosen by _trigram_bit in the bytearray 'signature' for every 3-byte
+    sequence in T that starts at an offset in [start, end).
+    """
+    end = min(end, len(T) - 2)
+    if end <= start:
+        return
+
+    data = T[start:end + 2]
+    bits = len(signature) * 8
+
+    for a, b, c in set(zip(data, data[1:], data[2:])):
+        bit = _trigram_bit(a, b, c, bits)
+        signature[bit >> 3] |= 1 << (bit & 7)
+
+
+# Tables for bytes.translate that map each byte to 1 if a given bit is set in it, or 0
+_BIT_TABLES = [bytes((v >> bit) & 1 for v in range(256)) for bit in range(8)]
+
+
+class IndexedFile(object):
+    """
+    A file with an index built by boyermoore.build_index, which can be searched for any
+    number of patterns without reading the whole file. The index records which 3-byte
+    sequences occur in each fixed-size block of the file, and only the blocks that could
+    contain an occurrence are searched. Patterns shorter than 3 bytes, and case-insensitive
+    or wildcard patterns, cannot be looked up in the index, so the whole file is searched
+    for them.
+
+    The index assumes that the file is only ever appended to. Data appended since the
+    index was built or last updated is searched directly, until update() is called.
+    Searches do not check that the indexed data is unchanged, so if the file may have
+    been changed in any other way, call update() first, which checks the CRC-32 of the
+    indexed data and rebuilds the index if it differs.
+    """
+    __slots__ = ['filename', 'index_path', 'block_size', 'signature_size', 'indexed_size',
+                 '_checksum', '_index']
+
+    # Index file format: header, followed by one signature per block of the file
+    _MAGIC = b'BMIX'
+    _VERSION = 1
+
+    # Magic, version, block size, signature size, indexed file size, CRC-32 of indexed data
+    _HEADER = struct.Struct('<4sB3xIIQI4x')
+
+    def __init__(self, filename, index_path):
+        """
+        :param str filename: name of the indexed file
+        :param str index_path: name of the index file written by build_index
+        """
+        self.filename = filename
+        self.index_path = index_path
+        self._index = None
+        self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}({self.filename!r}, {self.index_path!r}, "
+                f"indexed_size={self.indexed_size})")
+
+    @classmethod
+    def _read_header(cls, fh) -> Tuple[int, int, int, int]:
+        """
+        Read and validate the header of an open index file. Returns a tuple of
+        (block size, signature size, indexed file size, checksum).
+        """
+        header = fh.read(cls._HEADER.size)
+        if len(header) < cls._HEADER.size:
+            raise ValueError(f"{fh.name} is not a boyermoore index file")
+
+        magic, version, block_size, signature_size, size, checksum = cls._HEADER.unpack(header)
+        if magic != cls._MAGIC:
+            raise ValueError(f"{fh.name} is not a boyermoore index file")
+
+        if version != cls._VERSION:
+            raise ValueError(f"unsupported index file version {version}")
+
+        return block_size, signature_size, size, checksum
+
+    def _load(self):
+        with open(self.index_path, 'rb') as fh:
+            header = self._read_header(fh)
+            self.block_size, self.signature_size, self.indexed_size, self._checksum = header
+
+            expected_size = self._HEADER.size + self.blocks * self.signature_size
+            if os.fstat(fh.fileno()).st_size < expected_size:
+                raise ValueError(f"{self.index_path} is truncated")
+
+            if self.blocks > 0:
+                self._index = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def blocks(self) -> int:
+        """
+        Number of blocks of the file that are indexed
+        """
+        return -(-self.indexed_size // self.block_size)
+
+    def close(self):
+        """
+        Close the index. The IndexedFile cannot be searched after it is closed.
+        """
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def update(self):
+        """
+        Index any data that has been appended to the file since the index was built or
+        last updated, and write it to the index file. The indexed data is read once to
+        check its CRC-32, and if the file was changed in any way other than appending to
+        it, the whole index is rebuilt. Otherwise only the appended data is indexed.
+        """
+        self.close()
+        build_index(self.filename, self.index_path, self.block_size, self.signature_size)
+        self._load()
+
+    def _candidate_blocks(self, P: bytes) -> bytes:
+        """
+        Return a bytes object with one byte for each indexed block, which is 1 if an
+        occurrence of P could start in the block, or 0 if it cannot.
+        """
+        n = self.blocks
+        bits = self.signature_size * 8
+        first = self._HEADER.size
+        last = first + n * self.signature_size
+        step = max(1, -(-(len(P) - 2) // INDEX_MAX_GRAMS))
+        candidates = None
+
+        for i in range(0, len(P) - 2, step):
+            bit = _trigram_bit(P[i], P[i + 1], P[i + 2], bits)
+
+            # One byte per block, which is 1 if the block contains this 3-byte sequence.
+            # Block b is stored in bits 8b to 8b + 7 of an int, so that the whole index
+            # column can be shifted and combined at once.
+            column = self._index[first + (bit >> 3):last:self.signature_size]
+            found = int.from_bytes(column.translate(_BIT_TABLES[bit & 7]), 'little')
+
+            # The sequence at offset i of an occurrence starting in block b is in block
+            # b + i // block_size, or the block after that
+            shift = i // self.block_size
+            possible = found >> (8 * shift)
+            if i % self.block_size:
+                possible |= found >> (8 * (shift + 1))
+
+            candidates = possible if candidates is None else candidates & possible
+            if not candidates:
+                return bytes(n)
+
+        return candidates.to_bytes(n, 'little')
+
+    def _candidate_ranges(self, pp_data, size) -> List[Tuple[int, int]]:
+        """
+        Return a sorted list of (start, end) tuples, such that every occurrence of P in a
+        file of 'size' bytes starts at an offset in one of the ranges [start, end).
+        """
+        plen = len(pp_data)
+        last_start = size - plen + 1
+
+        if (plen < 3) or (pp_data.algorithm == "byte-class") or (self.blocks == 0):
+            return [(0, last_start)]
+
+        # Only occurrences made of 3-byte sequences that were all in the file when it was
+        # indexed can be looked up in the index, and anything after that is searched
+        indexed_end = min(last_start, self.indexed_size - plen + 1)
+        ranges = []
+        candidates = self._candidate_blocks(pp_data.P)
+        block = candidates.find(1)
+
+        while (block >= 0) and (block * self.block_size < indexed_end):
+            run_end = candidates.find(0, block)
+            if run_end < 0:
+                run_end = len(candidates)
+
+            ranges.append((block * self.block_size, min(run_end * self.block_size, indexed_end)))
+            block = candidates.find(1, run_end)
+
+        if indexed_end < last_start:
+            start = max(indexed_end, 0)
+            if ranges and (ranges[-1][1] >= start):
+                start = ranges.pop()[0]
+
+            ranges.append((start, last_start))
+
+        return ranges
+
+    def search_pp(self, pp_data, greedy=True) -> List[int]:
+        """
+        Search for all occurrences of a pre-processed pattern inside the file.
+
+        :param pp_data: return value from boyermoore.preprocess
+        :param bool greedy: If True, all occurrences will be returned. If False, \
+            the search will stop after the first occurrence and only the first \
+            occurrence will be returned.
+        :return: list of byte offsets of all occurrences that were found
+        :rtype: [int]
+        """
+        with open(self.filename, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size < self.indexed_size:
+                raise ValueError(f"{self.filename} is smaller than when it was indexed")
+
+            plen = len(pp_data)
+            if plen == 0 or size < plen:
+                return []
+
+            R, L, F, P = pp_data
+            matches = []
+
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as T:
+                scan = _scanner(pp_data, T)
+
+                for start, end in self._candidate_ranges(pp_data, size):
+                    # Occurrences starting before 'end' finish before end + len(P) - 1
+                    scan(R, L, F, P, T, end + plen - 1, start + plen - 1, -1, 0, greedy,
+                         matches)
+
+                    if matches and not greedy:
+                        break
+
+            return matches
+
+    def search(self, pattern, greedy=True) -> List[int]:
+        """
+        Pre-process a pattern and search for all occurrences inside the file.
+
+        :param pattern: pattern to search for. Must be either str or bytes.
+        :param bool greedy: If True, all occurrences will be returned. If False, \
+            the search will stop after the first occurrence and only the first \
+            occurrence will be returned.
+        :return: list of byte offsets of all occurrences that were found
+        :rtype: [int]
+        """
+        return self.search_pp(_preprocess_cached(pattern), greedy)
+
+
+def build_index(filename, index_path, block_size=None, signature_size=None):
+    """
+    Build an index of a file, for searching it many times with boyermoore.IndexedFile.
+    The index records which 3-byte sequences occur in each block of the file, in one
+    signature of 'signature_size' bytes per block, so it is roughly
+    signature_size / block_size times the size of the file.
+
+    If index_path already holds an index of the file, and the file has only been
+    appended to since, the index is updated instead, and only the appended data (and the
+    last indexed block) is indexed. The data that was already indexed is still read
+    once, to check that its CRC-32 is unchanged.
+
+    :param str filename: name of file to index
+    :param str index_path: name of index file to create or update
+    :param int block_size: size of the blocks that the file is split into, in bytes. If \
+        None, the block size of an existing index is kept, or INDEX_BLOCK_SIZE is used.
+    :param int signature_size: size of the signature stored for each block, in bytes. \
+        Larger signatures make the index bigger, but let it rule out more blocks. If \
+        None, the signature size of an existing index is kept, or INDEX_SIGNATURE_SIZE \
+        is used.
+    """
+    header = None
+    if os.path.exists(index_path):
+        with open(index_path, 'rb') as fh:
+            header = IndexedFile._read_header(fh)
+
+    if block_size is None:
+        block_size = INDEX_BLOCK_SIZE if header is None else header[0]
+
+    if signature_size is None:
+        signature_size = INDEX_SIGNATURE_SIZE if header is None else header[1]
+
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    if signature_size < 1:
+        raise ValueError("signature_size must be greater than 0")
+
+    signature_func = _block_signature if _speedups is None else _speedups.block_signature
+
+    with open(filename, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+
+        # Empty files cannot be mapped
+        T = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b''
+
+    try:
+        first_block = 0
+        indexed_size = 0
+        checksum = 0
+
+        if ((header is not None) and (header[:2] == (block_size, signature_size))
+                and (header[2] <= size)):
+            with memoryview(T) as view:
+                old_checksum = zlib.crc32(view[:header[2]])
+
+            if old_checksum == header[3]:
+                # The 3-byte sequences starting in the last 2 indexed bytes were incomplete,
+                # so the block containing them, and every block after it, is indexed again
+                indexed_size, checksum = header[2:]
+                first_block = max(indexed_size - 2, 0) // block_size
+
+        with open(index_path, 'r+b' if first_block else 'wb') as out:
+            if not first_block:
+                # An index that was not finished covers nothing, and is rebuilt next time
+                out.write(IndexedFile._HEADER.pack(IndexedFile._MAGIC, IndexedFile._VERSION,
+                                                   block_size, signature_size, 0, 0))
+
+            out.seek(IndexedFile._HEADER.size + first_block * signature_size)
+            out.truncate()
+
+            blocks = -(-size // block_size)
+            for block in range(first_block, blocks):
+                signature = bytearray(signature_size)
+                signature_func(T, block * block_size, (block + 1) * block_size, signature)
+                out.write(signature)
+
+            with memoryview(T) as view:
+                checksum = zlib.crc32(view[indexed_size:size], checksum)
+
+            out.seek(0)
+            out.write(IndexedFile._HEADER.pack(IndexedFile._MAGIC, IndexedFile._VERSION,
+                                               block_size, signature_size, size, checksum))
+    finally:
+        if size > 0:
+            T.close()
+
+
+def search_string(pattern, string, greedy=True, byte_offsets=False, stats=None, start=0,
+                  end=None) -> List[int]:
+    """
+    Pre-process a pattern and search for all occurences inside a string.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param string: input data to search for pattern inside. Must be either str, or any \
+        object supporting the buffer protocol (bytes, bytearray, memoryview, mmap, \
+        array.array, NumPy arrays etc.), which is searched in place, without copying it, \
+        unless it is not contiguous in memory. A str is searched directly, without \
+        encoding it, and offsets are character offsets.
+    :param bool greedy: If True, all occurrences will be returned. If False, \
+        the search will stop after the first occurrence and only the first \
+        occurrence will be returned.
+    :param bool byte_offsets: If True and string is a str, return the byte offset of each \
+        occurrence in the UTF-8 encoding of string, instead of the character offset.
+    :param stats: SearchStats object to count the work done by the search in. If None, \
+        nothing is counted.
+    :param int start: offset to start searching at
+    :param int end: offset to stop searching at. Only occurrences that end \
+        before this offset will be returned. If None, the search continues to the end \
+        of the string.
+    :return: list of offsets of all occurrences that were found
+    :rtype: [int]
+    """
+    return search_string_pp(_preprocess_cached(pattern, stats), string, greedy, byte_offsets,
+                            stats, start, end)
+
+
+def search_file(pattern, filename, greedy=True, block_size=DEFAULT_BLOCK_SIZE,
+                stats=None, decompress=True, start=0, end=None) -> List[int]:
+    """
+    Pre-process a pattern and search for all occurences inside a file.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param filename: name of file to search for pattern in
+    :param bool greedy: If True, all occurrences will be returned. If False, \
+        the search will stop after the first occurrence and only the first \
+        occurrence will be returned.
+    :param int block_size: number of bytes to read from the file at a time
+    :param stats: SearchStats object to count the work done by the search in. If None, \
+        nothing is counted.
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data, as are start and end.
+    :param int start: byte offset to start searching at
+    :param int end: byte offset to stop searching at. Only occurrences that end \
+        before this offset will be returned. If None, the search continues to the end \
+        of the file.
+    :return: list of byte offsets of all occurrences that were found
+    :rtype: [int]
+    """
+    return search_file_pp(_preprocess_cached(pattern, stats), filename, greedy, block_size,
+                          stats, decompress, start, end)
+
+
+def search_file_mmap(pattern, filename, greedy=True, stats=None, decompress=True, start=0,
+                     end=None) -> List[int]:
+    """
+    Pre-process a pattern and search for all occurences inside a memory-mapped file.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param filename: name of file to search for pattern in
+    :param bool greedy: If True, all occurrences will be returned. If False, \
+        the search will stop after the first occurrence and only the first \
+        occurrence will be returned.
+    :param stats: SearchStats object to count the work done by the search in. If None, \
+        nothing is counted.
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data, as are start and end.
+    :param int start: byte offset to start searching at
+    :param int end: byte offset to stop searching at. Only occurrences that end \
+        before this offset will be returned. If None, the search continues to the end \
+        of the file.
+    :return: list of byte offsets of all occurrences that were found
+    :rtype: [int]
+    """
+    return search_file_mmap_pp(_preprocess_cached(pattern, stats), filename, greedy, stats,
+                               decompress, start, end)
+
+
+def search_stream(pattern, stream, block_size=DEFAULT_BLOCK_SIZE,
+                  stats=None) -> Iterator[int]:
+    """
+    Pre-process a pattern and search for all occurences inside a stream of bytes,
+    yielding the byte offset of each occurrence as soon as it is found.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param stream: stream to search for pattern inside. Must be either a readable \
+        binary file-like object, or an iterable of bytes-like objects.
+    :param int block_size: number of bytes to read at a time, if stream is a \
+        file-like object
+    :param stats: SearchStats object to count the work done by the search in. If None, \
+        nothing is counted.
+    :return: generator yielding byte offsets of all occurrences that were found
+    :rtype: generator
+    """
+    return search_stream_pp(_preprocess_cached(pattern, stats), stream, block_size, stats)
+
+
+def iter_search_string(pattern, string, max_matches=None, start=0, end=None,
+                       byte_offsets=False) -> Iterator[int]:
+    """
+    Pre-process a pattern and search for occurrences inside a string, yielding the
+    offset of each occurrence as soon as it is found.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param string: input data to search for pattern inside. Must be either str, or any \
+        object supporting the buffer protocol, which is searched in place. A str is \
+        searched directly, without encoding it, and offsets are character offsets.
+    :param int max_matches: maximum number of occurrences to yield. If None, all \
+        occurrences will be yielded.
+    :param int start: offset to start searching at
+    :param int end: offset to stop searching at. If None, the search continues \
+        to the end of the string.
+    :param bool byte_offsets: If True and string is a str, yield the byte offset of each \
+        occurrence in the UTF-8 encoding of string, instead of the character offset.
+    :return: generator yielding offsets of occurrences that were found
+    :rtype: generator
+    """
+    return iter_search_string_pp(_preprocess_cached(pattern), string, max_matches, start, end,
+                                 byte_offsets)
+
+
+def rsearch_string(pattern, string, max_matches=None, start=0, end=None,
+                   block_size=DEFAULT_BLOCK_SIZE) -> List[int]:
+    """
+    Pre-process a pattern and search for occurrences inside a string backwards, starting
+    from the end, returning their offsets from last to first.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param string: input data to search for pattern inside. Must be either str, or any \
+        object supporting the buffer protocol. A str is searched directly, without \
+        encoding it, and offsets are character offsets.
+    :param int max_matches: maximum number of occurrences to return. If None, all \
+        occurrences will be returned.
+    :param int start: offset to stop searching at
+    :param int end: offset to start searching backwards from. If None, the search \
+        starts at the end of the string.
+    :param int block_size: number of bytes (or characters, if string is a str) to \
+        reverse and search at a time
+    :return: list of offsets of occurrences that were found, from last to first
+    :rtype: [int]
+    """
+    return rsearch_string_pp(_preprocess_cached(pattern), string, max_matches, start, end,
+                             block_size)
+
+
+def iter_search_file(pattern, filename, max_matches=None, start=0, end=None,
+                     block_size=DEFAULT_BLOCK_SIZE, decompress=True) -> Iterator[int]:
+    """
+    Pre-process a pattern and search for occurrences inside a file, yielding the
+    byte offset of each occurrence as soon as it is found.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param filename: name of file to search for pattern in
+    :param int max_matches: maximum number of occurrences to yield. If None, all \
+        occurrences will be yielded.
+    :param int start: byte offset to start searching at
+    :param int end: byte offset to stop searching at. If None, the search continues \
+        to the end of the file.
+    :param int block_size: number of bytes to read from the file at a time
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data.
+    :return: generator yielding byte offsets of occurrences that were found
+    :rtype: generator
+    """
+    return iter_search_file_pp(_preprocess_cached(pattern), filename, max_matches, start, end,
+                               block_size, decompress)
+
+
+def search_file_reverse(pattern, filename, max_matches=None, start=0, end=None,
+                        block_size=DEFAULT_BLOCK_SIZE, decompress=True) -> List[int]:
+    """
+    Pre-process a pattern and search for occurrences inside a file backwards, starting
+    from the end, returning their byte offsets from last to first.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param filename: name of file to search for pattern in
+    :param int max_matches: maximum number of occurrences to return. If None, all \
+        occurrences will be returned.
+    :param int start: byte offset to stop searching at
+    :param int end: byte offset to start searching backwards from. If None, the search \
+        starts at the end of the file.
+    :param int block_size: number of bytes to read from the file at a time
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data.
+    :return: list of byte offsets of occurrences that were found, from last to first
+    :rtype: [int]
+    """
+    return search_file_reverse_pp(_preprocess_cached(pattern), filename, max_matches, start,
+                                  end, block_size, decompress)
+
+
+def follow_file(pattern, filename, from_offset=0, poll_interval=DEFAULT_POLL_INTERVAL,
+                block_size=DEFAULT_BLOCK_SIZE, checkpoint=None, timeout=None) -> Iterator[int]:
+    """
+    Pre-process a pattern and search for occurrences inside a file that is being appended
+    to, yielding the byte offset of each occurrence as soon as it is found. See
+    follow_file_pp for details.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param filename: name of file to search for pattern in
+    :param int from_offset: byte offset to start searching at. If None, only data \
+        appended after the call is searched.
+    :param float poll_interval: number of seconds to wait before checking for new data \
+        again, after reaching the end of the file
+    :param int block_size: number of bytes to read from the file at a time
+    :param str checkpoint: name of a file to save the progress of the search in, so that \
+        the search can be resumed by a restarted process. If None, no checkpoint is saved.
+    :param float timeout: If not None, stop once no data has been appended to the file \
+        for this many seconds. If None, the search never stops by itself.
+    :return: generator yielding byte offsets of occurrences that were found
+    :rtype: generator
+    """
+    return follow_file_pp(_preprocess_cached(pattern), filename, from_offset, poll_interval,
+                          block_size, checkpoint, timeout)
+
+
+def async_search_file(pattern, filename, block_size=DEFAULT_BLOCK_SIZE,
+                      executor=None) -> AsyncIterator[int]:
+    """
+    Pre-process a pattern and search for all occurrences inside a file from a coroutine,
+    yielding the byte offset of each occurrence as soon as it is found.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param filename: name of file to search for pattern in
+    :param int block_size: number of bytes to read and search in the executor at a time
+    :param executor: concurrent.futures.Executor to read and search blocks in. If \
+        None, the default executor of the event loop is used.
+    :return: async generator yielding byte offsets of all occurrences that were found
+    :rtype: async generator
+    """
+    return async_search_file_pp(_preprocess_cached(pattern), filename, block_size, executor)
+
+
+def async_search_stream(pattern, reader, block_size=DEFAULT_BLOCK_SIZE,
+                        executor=None) -> AsyncIterator[int]:
+    """
+    Pre-process a pattern and search for all occurrences inside an asyncio stream,
+    yielding the byte offset of each occurrence as soon as it is found.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param reader: stream to search for pattern inside, such as an asyncio.StreamReader
+    :param int block_size: maximum number of bytes to read and search at a time
+    :param executor: concurrent.futures.Executor to search blocks in. If None, the \
+        default executor of the event loop is used.
+    :return: async generator yielding byte offsets of all occurrences that were found
+    :rtype: async generator
+    """
+    return async_search_stream_pp(_preprocess_cached(pattern), reader, block_size, executor)
+
+
+def search_file_parallel(pattern, filename, greedy=True, workers=None,
+                         block_size=DEFAULT_BLOCK_SIZE, decompress=True) -> List[int]:
+    """
+    Pre-process a pattern and search for all occurences inside a file, using multiple
+    processes.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param filename: name of file to search for pattern in
+    :param bool greedy: If True, all occurrences will be returned. If False, \
+        the search will stop after the first occurrence and only the first \
+        occurrence will be returned.
+    :param int workers: number of worker processes to use. If None, the number of \
+        CPUs on the system will be used.
+    :param int block_size: number of bytes to read from the file at a time
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data.
+    :return: list of byte offsets of all occurrences that were found
+    :rtype: [int]
+    """
+    return search_file_parallel_pp(_preprocess_cached(pattern), filename, greedy, workers,
+                                   block_size, decompress)
+
+
+def search_files(pattern, paths, greedy=True, workers=None, recursive=True,
+                 block_size=DEFAULT_BLOCK_SIZE, decompress=True,
+                 onerror=None) -> Iterator[Tuple[str, int]]:
+    """
+    Pre-process a pattern and search for all occurences inside many files, using
+    multiple processes.
+
+    :param pattern: pattern to search for. Must be either str or bytes.
+    :param paths: file to search, directory containing files to search, or glob \
+        pattern matching files to search, or an iterable of any of those.
+    :param bool greedy: If True, all occurrences in each file will be returned. If \
+        False, only the first occurrence in each file will be returned.
+    :param int workers: number of worker processes to use. If None, the number of \
+        CPUs on the system will be used. If 1, all files are searched in the \
+        calling process, in order.
+    :param bool recursive: If True, directories are searched recursively.
+    :param int block_size: number of bytes to read from each file at a time
+    :param bool decompress: If True, files compressed with gzip, bz2, xz or zstd, \
+        detected by their first few bytes, are decompressed as they are searched, and offsets \
+        are byte offsets in the decompressed data.
+    :param onerror: Files that cannot be searched (missing files, broken symbolic links, \
+        files that cannot be read, corrupt compressed files etc.) are skipped. If onerror \
+        is not None, onerror(filename, error) is called for each of them, with the \
+        exception that was raised, which may also be raised again to stop the search.
+    :return: generator yielding a (filename, byte offset) tuple for each occurrence
+    :rtype: generator
+    """
+    return search_files_pp(_preprocess_cached(pattern), paths, greedy, workers, recursive,
+                           block_size, decompress, onerror)
+
+
+def search_string_many(patterns, string, start=0, end=None) -> List[Tuple[int, int]]:
+    """
+    Pre-process multiple patterns and search for all occurrences of each of them inside
+    a string, in a single pass.
+
+    :param patterns: patterns to search for. Each pattern must be either str or bytes.
+    :param string: input data to search for patterns inside. Must be either str, or any \
+        object supporting the buffer protocol, which is searched in place. If string is \
+        a str, offsets are character offsets.
+    :param int start: offset to start searching at
+    :param int end: offset to stop searching at. If None, the search continues to the \
+        end of the string.
+    :return: list of (pattern index, offset) tuples for all occurrences that were \
+        found, sorted by offset and then pattern index
+    :rtype: [(int, int)]
+    """
+    return search_string_many_pp(preprocess_many(patterns), string, start, end)
+
+
+def search_file_many(patterns, filename, block_size=DEFAULT_BLOCK_SIZE,
+                     decompress=True) -> List[Tuple[int, int]]:
+    """
+    Pre-process multiple patterns and search for all occurrences of each of them inside
+    a file, in a single pass.
+
+    :param patterns: patterns to search for. Each pattern must be either str or bytes.
+    :param filename: name of file to search for patterns in
+    :param int block_size: number of bytes to read from the file at a time
+    :param bool decompress: If True, a file compressed with gzip, bz2, xz or zstd, \
+        detected by its first few bytes, is decompressed as it is searched, and offsets \
+        are byte offsets in the decompressed data.
+    :return: list of (pattern index, byte offset) tuples for all occurrences that were \
+        found, sorted by byte offset and then pattern index
+    :rtype: [(int, int)]
+    """
+    return search_file_many_pp(preprocess_many(patterns), filename, block_size, decompress)
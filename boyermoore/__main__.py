@@ -0,0 +1,483 @@
+"""
+Command-line interface for the boyermoore package.
+
+    python -m boyermoore [options] PATTERN [PATH ...]
+    python -m boyermoore [options] -f PATTERNS_FILE [PATH ...]
+
+Searches files, directories (recursively) or standard input for a pattern, and prints
+each matching line like grep, along with the name of the file if more than one file is
+searched. Files compressed with gzip, bz2, xz or zstd are decompressed as they are
+searched. Exits with status 0 if anything was found, 1 if not, and 2 if an error occurred.
+"""
+
+import argparse
+import concurrent.futures
+import mmap
+import os
+import stat
+import sys
+import time
+from typing import *
+
+import boyermoore
+from boyermoore import (DEFAULT_BLOCK_SIZE, preprocess, _BlockSearch, _base_search_str,
+                        _decompressed, _expand_paths, _file_errors, _read_blocks)
+
+
+# Name printed for standard input, which is searched if '-' or no paths are given
+STDIN_NAME = "(standard input)"
+
+
+class _Options(object):
+    """
+    Settings shared by the search of every input, which are passed to worker processes.
+    """
+    def __init__(self, pps, args, with_filename):
+        self.pps = pps
+        self.count = args.count
+        self.greedy = not args.first
+        self.byte_offset = args.byte_offset
+        self.context = args.context
+        self.use_mmap = args.mmap
+        self.decompress = args.decompress
+        self.block_size = args.block_size
+        self.with_filename = with_filename
+
+
+class _LinePrinter(object):
+    """
+    Formats matching lines, and up to 'context' lines before and after each of them, like
+    grep. Lines are looked up in 'buf', which holds part of the input starting at offset
+    'base', and may be a bytes object or a memory-mapped file.
+    Occurrences must be passed to match() in order of offset.
+    """
+    def __init__(self, prefix, context, byte_offset):
+        self.prefix = prefix
+        self.context = context
+        self.byte_offset = byte_offset
+        self.printed_end = 0   # Offset just past the last line that was printed
+        self.after = 0         # Number of lines of trailing context still to print
+        self.printed_any = False
+
+    def _line(self, buf, base, start, end, sep, offset=None) -> bytes:
+        line = buf[start - base:end - base]
+        if not line.endswith(b'\n'):
+            line += b'\n'
+
+        prefix = self.prefix + sep if self.prefix else b''
+        if offset is not None:
+            prefix += str(offset).encode() + sep
+
+        return prefix + line
+
+    @staticmethod
+    def _line_end(buf, base, pos, eof):
+        """
+        Return the offset just past the end of the line containing 'pos', or None if
+        the line does not end inside buf and more input may follow.
+        """
+        end = buf.find(b'\n', pos - base)
+        if end >= 0:
+            return base + end + 1
+
+        return base + len(buf) if eof else None
+
+    def available(self, buf, base, last, eof) -> bool:
+        """
+        Return True if the whole line containing offset 'last' is inside buf.
+        """
+        return self._line_end(buf, base, last, eof) is not None
+
+    def flush(self, buf, base, limit, eof, write):
+        """
+        Write trailing context lines that start before offset 'limit'.
+        """
+        while self.after > 0 and self.printed_end < limit:
+            end = self._line_end(buf, base, self.printed_end, eof)
+            if end is None or end == self.printed_end:
+                return
+
+            write(self._line(buf, base, self.printed_end, end, b'-'))
+            self.printed_end = end
+            self.after -= 1
+
+    def match(self, buf, base, offset, last, eof, write):
+        """
+        Write the line containing the occurrence that spans offsets [offset, last], along
+        with any context lines before it.
+        """
+        start = base + buf.rfind(b'\n', 0, offset - base) + 1
+        end = self._line_end(buf, base, last, eof)
+        offset_str = offset if self.byte_offset else None
+
+        if start < self.printed_end:
+            # Line has already been printed, either for an earlier occurrence or as context
+            if self.byte_offset:
+                write(self._line(buf, base, start, end, b':', offset_str))
+            elif end > self.printed_end:
+                write(self._line(buf, base, self.printed_end, end, b':'))
+        else:
+            self.flush(buf, base, start, eof, write)
+
+            context_start = start
+            for _ in range(self.context):
+                if context_start <= max(self.printed_end, base):
+                    break
+
+                context_start = base + buf.rfind(b'\n', 0, context_start - base - 1) + 1
+
+            if self.context and self.printed_any and context_start > self.printed_end:
+                write(b'--\n')
+
+            while context_start < start:
+                context_end = self._line_end(buf, base, context_start, eof)
+                write(self._line(buf, base, context_start, context_end, b'-'))
+                context_start = context_end
+
+            write(self._line(buf, base, start, end, b':', offset_str))
+
+        self.printed_end = max(self.printed_end, end)
+        self.after = self.context
+        self.printed_any = True
+
+    def keep_from(self, buf, base, pos) -> int:
+        """
+        Return the offset of the earliest byte that must be kept in buf, so that context
+        lines can still be printed for an occurrence at offset 'pos' or later.
+        """
+        keep = base + buf.rfind(b'\n', 0, pos - base) + 1
+        for _ in range(self.context):
+            if keep <= base:
+                break
+
+            keep = base + buf.rfind(b'\n', 0, keep - base - 1) + 1
+
+        if self.after > 0:
+            keep = min(keep, self.printed_end)
+
+        return max(keep, base)
+
+
+def _search_blocks(options, blocks, printer, write) -> Tuple[int, int]:
+    """
+    Search a sequence of consecutive blocks for every pattern. Occurrences are passed to the
+    printer in order of offset, as soon as no earlier occurrence can be found and the whole
+    line containing them has been read. Returns a tuple of (number of occurrences found,
+    number of bytes searched).
+    """
+    searches = [(_BlockSearch(pp, options.greedy), len(pp)) for pp in options.pps if len(pp)]
+    max_length = max([plen for _, plen in searches], default=1)
+    pending = []        # (first offset, last offset) of occurrences not yet printed
+    buf = bytearray()   # Input that may be needed to print lines, starting at offset 'base'
+    base = 0
+    found = 0
+    size = 0
+
+    def process(eof):
+        nonlocal found, searches
+        # No occurrence that has not been found yet can start before this offset
+        safe = base + len(buf) - max_length + 1
+
+        done = 0
+        for offset, last in pending:
+            if not eof and offset >= safe:
+                break
+
+            if printer is not None:
+                if not printer.available(buf, base, last, eof):
+                    break
+
+                printer.match(buf, base, offset, last, eof, write)
+
+            done += 1
+            found += 1
+
+            if not options.greedy:
+                searches = []
+                done = len(pending)
+                break
+
+        del pending[:done]
+
+        if printer is not None:
+            # Lines that may contain an occurrence that has not been printed yet are not context
+            limit = base + len(buf)
+            if not eof:
+                pos = min(pending[0][0], safe) if pending else safe
+                limit = base + buf.rfind(b'\n', 0, max(pos - base, 0)) + 1
+
+            printer.flush(buf, base, limit, eof, write)
+
+    for block in blocks:
+        size += len(block)
+
+        for search, plen in searches:
+            pending.extend((offset, offset + plen - 1) for offset in search.feed(block))
+
+        pending.sort()
+
+        if printer is None:
+            base += len(block)
+        else:
+            buf += block
+
+        process(False)
+
+        if printer is not None:
+            keep = printer.keep_from(buf, base, pending[0][0] if pending else base + len(buf))
+            del buf[:keep - base]
+            base = keep
+
+        if not searches and not pending and (printer is None or printer.after == 0):
+            break
+
+    process(True)
+    return found, size
+
+
+def _search_mapped(options, mapped, printer, write) -> Tuple[int, int]:
+    """
+    Search a memory-mapped file for every pattern, without copying it. Returns a tuple of
+    (number of occurrences found, number of bytes searched).
+    """
+    occurrences = []
+
+    for pp in options.pps:
+        plen = len(pp)
+        for offset in _base_search_str(pp, mapped, len(mapped), options.greedy):
+            occurrences.append((offset, offset + plen - 1))
+
+    occurrences.sort()
+    if not options.greedy:
+        occurrences = occurrences[:1]
+
+    if printer is not None:
+        for offset, last in occurrences:
+            printer.match(mapped, 0, offset, last, True, write)
+
+        printer.flush(mapped, 0, len(mapped), True, write)
+
+    return len(occurrences), len(mapped)
+
+
+def _search_input(options, name, fh, write) -> Tuple[int, int]:
+    """
+    Search an open binary file, passing output to the 'write' function as it is found.
+    Returns a tuple of (number of occurrences found, number of bytes searched).
+    """
+    prefix = os.fsencode(name) if options.with_filename else b''
+    printer = None if options.count else _LinePrinter(prefix, options.context,
+                                                      options.byte_offset)
+
+    reader = _decompressed(fh) if options.decompress else fh
+
+    mapped = None
+    if options.use_mmap and (reader is fh) and stat.S_ISREG(os.fstat(fh.fileno()).st_mode):
+        try:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files cannot be mapped
+            pass
+
+    if mapped is None:
+        found, size = _search_blocks(options, _read_blocks(reader, options.block_size), printer,
+                                     write)
+    else:
+        with mapped:
+            found, size = _search_mapped(options, mapped, printer, write)
+
+    if options.count:
+        write((prefix + b':' if prefix else b'') + str(found).encode() + b'\n')
+
+    return found, size
+
+
+def _error_message(filename, e) -> str:
+    if isinstance(e, OSError):
+        return f"{filename}: {e.strerror or e}"
+
+    return f"{filename}: {e}"
+
+
+def _worker_init(options):
+    """
+    Initializer for worker processes used when --jobs is greater than 1.
+    """
+    global _worker_options
+    _worker_options = options
+
+
+def _worker_search(filename) -> Tuple[bytes, int, int, Optional[str]]:
+    """
+    Search a single file in a worker process. Returns a tuple of (output, number of
+    occurrences found, number of bytes searched, error message or None).
+    """
+    out = []
+    try:
+        with open(filename, 'rb') as fh:
+            found, size = _search_input(_worker_options, filename, fh, out.append)
+    except _file_errors() as e:
+        return b''.join(out), 0, 0, _error_message(filename, e)
+
+    return b''.join(out), found, size, None
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="boyermoore", description="Search files for "
+                                     "occurrences of a pattern, and print each matching line")
+    parser.add_argument("pattern", nargs="?", help="Pattern to search for. Omit this if -f "
+                        "is given.")
+    parser.add_argument("paths", nargs="*", help="Files or directories to search. Directories "
+                        "are searched recursively, and standard input is searched if no "
+                        "paths or '-' are given.")
+    parser.add_argument("-f", "--file", dest="patterns_file", help="Read patterns from this "
+                        "file, one per line, and print lines that contain any of them")
+    parser.add_argument("-c", "--count", action="store_true", help="Print only the number "
+                        "of occurrences in each file")
+    parser.add_argument("--first", action="store_true", help="Stop searching each file "
+                        "after the first occurrence")
+    parser.add_argument("-b", "--byte-offset", action="store_true", help="Print the byte "
+                        "offset of each occurrence before the line containing it")
+    parser.add_argument("-C", "--context", type=int, default=0, metavar="N", help="Print N "
+                        "lines before and after each matching line")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N", help="Search N "
+                        "files at a time, in separate processes (default: %(default)s)")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map files instead of "
+                        "reading them")
+    parser.add_argument("--no-decompress", dest="decompress", action="store_false",
+                        help="Search compressed files as they are, instead of decompressing "
+                        "them")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, metavar="BYTES",
+                        help="Number of bytes to read at a time (default: %(default)s)")
+    parser.add_argument("--stats", action="store_true", help="Print the number of files and "
+                        "bytes searched, and the search speed, to standard error")
+    return parser
+
+
+def _load_patterns(parser, args) -> List[bytes]:
+    if args.patterns_file is None:
+        if args.pattern is None:
+            parser.error("a pattern is required unless -f is given")
+
+        # Arguments that are not valid in the filesystem encoding are searched for as given
+        return [os.fsencode(args.pattern)]
+
+    if args.pattern is not None:
+        args.paths.insert(0, args.pattern)
+
+    try:
+        with open(args.patterns_file, 'rb') as fh:
+            patterns = [p.rstrip(b'\r\n') for p in fh]
+    except OSError as e:
+        parser.error(f"{args.patterns_file}: {e.strerror or e}")
+
+    return [p for p in patterns if p]
+
+
+def _run(args, patterns, stdout, stderr) -> int:
+    paths = args.paths or ['-']
+    with_filename = len(paths) > 1 or any(os.path.isdir(p) for p in paths)
+    options = _Options([preprocess(p) for p in patterns], args, with_filename)
+
+    # Standard input is searched in this process, in the position it was given in
+    filenames = []
+    for path in paths:
+        filenames.extend([None] if path == '-' else _expand_paths(path, True))
+
+    start_time = time.perf_counter()
+    totals = [0, 0, 0]     # Files searched, occurrences found, bytes searched
+    errors = 0
+
+    def report(found, size):
+        totals[0] += 1
+        totals[1] += found
+        totals[2] += size
+        stdout.flush()
+
+    def error(message):
+        nonlocal errors
+        errors += 1
+        stdout.flush()
+        stderr.write(f"boyermoore: {message}\n".encode(errors='replace'))
+
+    def search_here(filename):
+        try:
+            if filename is None:
+                report(*_search_input(options, STDIN_NAME, sys.stdin.buffer, stdout.write))
+                return
+
+            with open(filename, 'rb') as fh:
+                report(*_search_input(options, filename, fh, stdout.write))
+        except BrokenPipeError:
+            raise
+        except _file_errors() as e:
+            error(_error_message(STDIN_NAME if filename is None else filename, e))
+
+    if args.jobs == 1:
+        for filename in filenames:
+            search_here(filename)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs,
+                                                    initializer=_worker_init,
+                                                    initargs=(options,)) as executor:
+            # Results are printed in the same order as the files were given
+            files = [f for f in filenames if f is not None]
+            results = executor.map(_worker_search, files)
+
+            for filename in filenames:
+                if filename is None:
+                    search_here(None)
+                    continue
+
+                out, found, size, message = next(results)
+                stdout.write(out)
+                if message is None:
+                    report(found, size)
+                else:
+                    error(message)
+
+    if args.stats:
+        secs = time.perf_counter() - start_time
+        rate = (totals[2] / (1024 * 1024)) / secs if secs > 0 else 0.0
+        algorithms = ",".join(sorted(set(pp.algorithm for pp in options.pps))) or "none"
+        stderr.write((f"files: {totals[0]}, bytes: {totals[2]}, matches: {totals[1]}, "
+                      f"time: {secs:.4f}s, {rate:.2f} MB/s, algorithm: {algorithms}, "
+                      f"backend: {boyermoore.backend}\n").encode())
+
+    if errors:
+        return 2
+
+    return 0 if totals[1] else 1
+
+
+def main(argv=None) -> int:
+    """
+    Entry point for the 'boyermoore' command. Returns the exit status.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    if args.context < 0:
+        parser.error("--context must not be negative")
+
+    if args.jobs < 1:
+        parser.error("--jobs must be greater than 0")
+
+    if args.block_size < 1:
+        parser.error("--block-size must be greater than 0")
+
+    patterns = _load_patterns(parser, args)
+
+    try:
+        return _run(args, patterns, sys.stdout.buffer, sys.stderr.buffer)
+    except BrokenPipeError:
+        # Output was closed early (e.g. piped into head), which is not an error
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
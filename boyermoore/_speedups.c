@@ -0,0 +1,813 @@
+/*
+ * Optional native implementation of the shift loops used by the boyermoore
+ * package. Each function in this module has exactly the same signature and
+ * behaviour as the python function of the same name with a leading underscore
+ * (e.g. scan and boyermoore._scan), which remain the reference implementation
+ * and are used whenever this module is not available.
+ *
+ * Erik K. Nyquist 2022
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+#include <string.h>
+
+#define ALPHABET_SIZE 256
+
+/* Shift loops implemented by this module */
+typedef enum {
+    ALG_BM,
+    ALG_BM_COMPACT,
+    ALG_HORSPOOL,
+    ALG_RAITA,
+    ALG_SUNDAY,
+    ALG_TWO_WAY,
+    ALG_BYTE_CLASS,
+    ALG_RARE_BYTE
+} algorithm_t;
+
+/*
+ * Get a buffer for one of the integer tables (R rows, L or F), which must be
+ * array.array('q') objects or anything else exporting a contiguous buffer of
+ * 64-bit signed integers.
+ */
+static int get_table(PyObject *obj, Py_buffer *view, const char *name)
+{
+    if (PyObject_GetBuffer(obj, view, PyBUF_FORMAT | PyBUF_C_CONTIGUOUS) < 0) {
+        return -1;
+    }
+
+    if ((view->itemsize != sizeof(long long)) || (view->format == NULL) ||
+        (strcmp(view->format, "q") != 0)) {
+        PyBuffer_Release(view);
+        PyErr_Format(PyExc_TypeError, "%s must be an array of 64-bit signed integers", name);
+        return -1;
+    }
+
+    return 0;
+}
+
+/*
+ * Check that the first 'n' entries of a table are all between 'low' and 'high'.
+ * Pattern.from_bytes already rejects tables like this, but a shift loop given
+ * one anyway could move outside of T, or never finish.
+ */
+static int check_range(const Py_buffer *view, Py_ssize_t start, Py_ssize_t n, long long low,
+                       long long high, const char *name)
+{
+    const long long *table = (const long long *) view->buf;
+
+    for (Py_ssize_t i = start; i < n; i++) {
+        if ((table[i] < low) || (table[i] > high)) {
+            PyErr_Format(PyExc_ValueError, "%s holds a value out of range", name);
+            return -1;
+        }
+    }
+
+    return 0;
+}
+
+/* Growable list of match offsets, filled in while the GIL is released */
+typedef struct {
+    long long *items;
+    Py_ssize_t len;
+    Py_ssize_t size;
+} match_list_t;
+
+static int match_list_append(match_list_t *list, long long offset)
+{
+    if (list->len == list->size) {
+        Py_ssize_t new_size = (list->size == 0) ? 64 : list->size * 2;
+        long long *new_items = realloc(list->items, new_size * sizeof(long long));
+        if (new_items == NULL) {
+            return -1;
+        }
+
+        list->items = new_items;
+        list->size = new_size;
+    }
+
+    list->items[list->len++] = offset;
+    return 0;
+}
+
+/*
+ * Shift loop for the Boyer-Moore algorithm, shared by scan and scan_compact.
+ * Exactly one of 'rows' (full bad character table) or 'compact' (compact bad
+ * character table) is non-NULL.
+ * Returns 0 on success, or -1 if memory could not be allocated.
+ */
+static int run_scan(const long long **rows, const long long *compact, const long long *L,
+                    const long long *F, const unsigned char *P, Py_ssize_t plen,
+                    const unsigned char *T, Py_ssize_t T_size, Py_ssize_t *k_out,
+                    Py_ssize_t *previous_k_out, long long base, int greedy,
+                    match_list_t *matches)
+{
+    Py_ssize_t k = *k_out;
+    Py_ssize_t previous_k = *previous_k_out;
+
+    while (k < T_size) {
+        Py_ssize_t i = plen - 1;  /* Character to compare in P */
+        Py_ssize_t h = k;         /* Character to compare in T */
+
+        /* Matches starting from end of P. h >= i whenever i >= 0, so T[h] is always valid */
+        while ((i >= 0) && (h > previous_k) && (P[i] == T[h])) {
+            i--;
+            h--;
+        }
+
+        if ((i == -1) || (h == previous_k)) {  /* Match has been found (Galil's rule) */
+            if (match_list_append(matches, base + k - plen + 1) < 0) {
+                return -1;
+            }
+
+            previous_k = k;  /* Shifting by the period of P keeps everything up to k matched */
+            k += (plen > 1) ? plen - F[1] : 1;
+
+            if (!greedy) {
+                break;
+            }
+        } else {  /* No match, shift by max of bad character and good suffix rules */
+            unsigned char peeked = T[h];
+            Py_ssize_t char_shift, suffix_shift, shift;
+
+            if (rows != NULL) {
+                /* Rows are not range checked by scan_common, since that would take
+                 * 256 * len(P) steps on every call, so the shift is clamped instead */
+                long long last = rows[peeked][i];
+                char_shift = (last < -1) ? i + 1 : i - (Py_ssize_t) last;
+            } else {
+                char_shift = i - (Py_ssize_t) compact[peeked];
+            }
+
+            if (i + 1 == plen) {           /* Mismatch happened on first attempt */
+                suffix_shift = 1;
+            } else if (L[i + 1] == -1) {   /* Matched suffix does not appear anywhere in P */
+                suffix_shift = plen - F[i + 1];
+            } else {                       /* Matched suffix appears in P */
+                suffix_shift = plen - 1 - L[i + 1];
+            }
+
+            /* Galil's rule only holds when the good suffix rule decides the shift */
+            if (char_shift > suffix_shift) {
+                shift = char_shift;
+                previous_k = -1;
+            } else {
+                shift = suffix_shift;
+                previous_k = (shift >= i + 1) ? k : -1;
+            }
+
+            k += shift;
+        }
+    }
+
+    *k_out = k;
+    *previous_k_out = previous_k;
+    return 0;
+}
+
+/*
+ * Shift loop for the Boyer-Moore-Horspool algorithm, and Raita's variant of it
+ * if 'raita' is non-zero. 'shifts' is the table from _horspool_shift_table.
+ */
+static int run_horspool(const long long *shifts, const unsigned char *P, Py_ssize_t plen,
+                        const unsigned char *T, Py_ssize_t T_size, Py_ssize_t *k_out,
+                        long long base, int greedy, int raita, match_list_t *matches)
+{
+    Py_ssize_t k = *k_out;
+    Py_ssize_t last = plen - 1;
+    Py_ssize_t mid = last / 2;
+
+    while (k < T_size) {
+        unsigned char c = T[k];
+        const unsigned char *s = T + k - last;
+
+        if ((c == P[last]) &&
+            (!raita || ((s[0] == P[0]) && (s[mid] == P[mid]))) &&
+            (memcmp(s, P, last) == 0)) {
+            if (match_list_append(matches, base + k - last) < 0) {
+                return -1;
+            }
+
+            k += shifts[c];
+            if (!greedy) {
+                break;
+            }
+        } else {
+            k += shifts[c];
+        }
+    }
+
+    *k_out = k;
+    return 0;
+}
+
+/*
+ * Shift loop for Sunday's quick search algorithm. 'shifts' is the table from
+ * _sunday_shift_table.
+ */
+static int run_sunday(const long long *shifts, const unsigned char *P, Py_ssize_t plen,
+                      const unsigned char *T, Py_ssize_t T_size, Py_ssize_t *k_out,
+                      long long base, int greedy, match_list_t *matches)
+{
+    Py_ssize_t k = *k_out;
+    Py_ssize_t last = plen - 1;
+
+    while (k < T_size) {
+        const unsigned char *s = T + k - last;
+        int found = (s[0] == P[0]) && (memcmp(s, P, plen) == 0);
+
+        if (found && (match_list_append(matches, base + k - last) < 0)) {
+            return -1;
+        }
+
+        k += (k + 1 < T_size) ? shifts[T[k + 1]] : 1;
+
+        if (found && !greedy) {
+            break;
+        }
+    }
+
+    *k_out = k;
+    return 0;
+}
+
+/*
+ * Shift loop for the Crochemore-Perrin Two-Way algorithm. 'params' is the
+ * table from _two_way_table, and previous_k is the position of the last byte
+ * of the prefix of P that is known to match, as in boyermoore._scan_two_way.
+ */
+static int run_two_way(const long long *params, const unsigned char *P, Py_ssize_t plen,
+                       const unsigned char *T, Py_ssize_t T_size, Py_ssize_t *k_out,
+                       Py_ssize_t *previous_k_out, long long base, int greedy,
+                       match_list_t *matches)
+{
+    Py_ssize_t k = *k_out;
+    Py_ssize_t previous_k = *previous_k_out;
+    Py_ssize_t crit = (Py_ssize_t) params[0];
+    Py_ssize_t period = (Py_ssize_t) params[1];
+    int periodic = (params[2] != 0);
+
+    while (k < T_size) {
+        const unsigned char *s = T + k - plen + 1;  /* Start of the current alignment */
+        Py_ssize_t memory = previous_k - (k - plen);
+        Py_ssize_t i;
+
+        if (memory < 0) {
+            memory = 0;
+        }
+
+        /* Compare right half of P, left to right */
+        i = (crit > memory) ? crit : memory;
+        while ((i < plen) && (P[i] == s[i])) {
+            i++;
+        }
+
+        if (i < plen) {  /* Mismatch in right half */
+            k += i - crit + 1;
+            previous_k = -1;
+            continue;
+        }
+
+        /* Compare left half of P, right to left */
+        i = crit - 1;
+        while ((i >= memory) && (P[i] == s[i])) {
+            i--;
+        }
+
+        /* Shifting by the period of P keeps everything up to k matched */
+        previous_k = periodic ? k : -1;
+        k += period;
+
+        if (i < memory) {  /* Match has been found */
+            if (match_list_append(matches, base + (s - T)) < 0) {
+                return -1;
+            }
+
+            if (!greedy) {
+                break;
+            }
+        }
+    }
+
+    *k_out = k;
+    *previous_k_out = previous_k;
+    return 0;
+}
+
+/*
+ * Shift loop for the "byte-class" algorithm. 'shifts' is the table from
+ * _class_shift_table, 'masks' is the table from _class_mask_table, and 'plen'
+ * is the number of byte classes.
+ */
+static int run_byte_class(const long long *shifts, const long long *masks, Py_ssize_t plen,
+                          const unsigned char *T, Py_ssize_t T_size, Py_ssize_t *k_out,
+                          long long base, int greedy, match_list_t *matches)
+{
+    Py_ssize_t k = *k_out;
+    Py_ssize_t last = plen - 1;
+
+    while (k < T_size) {
+        const unsigned char *s = T + k - last;
+        Py_ssize_t i = last;
+
+        while ((i >= 0) &&
+               (((unsigned long long) masks[(i << 2) | (s[i] >> 6)] >> (s[i] & 63)) & 1)) {
+            i--;
+        }
+
+        if (i < 0) {
+            if (match_list_append(matches, base + k - last) < 0) {
+                return -1;
+            }
+
+            k += shifts[T[k]];
+            if (!greedy) {
+                break;
+            }
+        } else {
+            k += shifts[T[k]];
+        }
+    }
+
+    *k_out = k;
+    return 0;
+}
+
+/*
+ * Shift loop for the rare byte prefilter. 'rare' is the offset in P of the byte
+ * that memchr looks for, from _rare_byte_table.
+ */
+static int run_rare_byte(Py_ssize_t rare, const unsigned char *P, Py_ssize_t plen,
+                         const unsigned char *T, Py_ssize_t T_size, Py_ssize_t *k_out,
+                         long long base, int greedy, match_list_t *matches)
+{
+    Py_ssize_t k = *k_out;
+    Py_ssize_t last = plen - 1;
+    unsigned char c = P[rare];
+
+    while (k < T_size) {
+        const unsigned char *pos = memchr(T + k - last + rare, c, (size_t) (T_size - k));
+        if (pos == NULL) {
+            k = T_size;
+            break;
+        }
+
+        k = (pos - T) - rare + last;
+
+        if (memcmp(T + k - last, P, plen) == 0) {
+            if (match_list_append(matches, base + k - last) < 0) {
+                return -1;
+            }
+
+            k += 1;
+            if (!greedy) {
+                break;
+            }
+        } else {
+            k += 1;
+        }
+    }
+
+    *k_out = k;
+    return 0;
+}
+
+static PyObject *scan_common(PyObject *args, algorithm_t algorithm)
+{
+    PyObject *R, *L_obj, *F_obj, *P_obj, *T_obj, *matches;
+    Py_ssize_t T_size, k, previous_k;
+    long long base;
+    int greedy;
+
+    Py_buffer R_views[ALPHABET_SIZE];
+    const long long *rows[ALPHABET_SIZE];
+    Py_buffer L_view, F_view, P_view, T_view;
+    const unsigned char *T_data;
+    Py_ssize_t T_len;
+    int R_count = 0;
+    int have_L = 0, have_F = 0, have_P = 0, have_T = 0;
+    PyObject *ret = NULL;
+    match_list_t found = {NULL, 0, 0};
+    int status;
+
+    if (!PyArg_ParseTuple(args, "OOOOOnnnLpO!", &R, &L_obj, &F_obj, &P_obj, &T_obj, &T_size,
+                          &k, &previous_k, &base, &greedy, &PyList_Type, &matches)) {
+        return NULL;
+    }
+
+    if ((algorithm == ALG_TWO_WAY) || (algorithm == ALG_RARE_BYTE)) {
+        /* R is not used */
+    } else if (algorithm != ALG_BM) {
+        if (get_table(R, &R_views[0], "R") < 0) {
+            goto done;
+        }
+
+        R_count = 1;
+        if (R_views[0].len < (Py_ssize_t) (ALPHABET_SIZE * sizeof(long long))) {
+            PyErr_SetString(PyExc_ValueError, "R is too short");
+            goto done;
+        }
+    } else {
+        PyObject *seq = PySequence_Fast(R, "R must be a sequence");
+        if (seq == NULL) {
+            goto done;
+        }
+
+        if (PySequence_Fast_GET_SIZE(seq) != ALPHABET_SIZE) {
+            Py_DECREF(seq);
+            PyErr_SetString(PyExc_ValueError, "R must have one row per byte value");
+            goto done;
+        }
+
+        for (R_count = 0; R_count < ALPHABET_SIZE; R_count++) {
+            PyObject *row = PySequence_Fast_GET_ITEM(seq, R_count);
+            if (get_table(row, &R_views[R_count], "R") < 0) {
+                break;
+            }
+
+            rows[R_count] = (const long long *) R_views[R_count].buf;
+        }
+
+        Py_DECREF(seq);
+        if (R_count < ALPHABET_SIZE) {
+            goto done;
+        }
+    }
+
+    if (get_table(L_obj, &L_view, "L") < 0) {
+        goto done;
+    }
+
+    have_L = 1;
+    if (get_table(F_obj, &F_view, "F") < 0) {
+        goto done;
+    }
+
+    have_F = 1;
+    if (PyObject_GetBuffer(P_obj, &P_view, PyBUF_C_CONTIGUOUS) < 0) {
+        goto done;
+    }
+
+    have_P = 1;
+    if (PyUnicode_Check(T_obj)) {
+        /* An ASCII str stores one byte per character, so it can be searched like bytes */
+        if (!PyUnicode_IS_ASCII(T_obj)) {
+            PyErr_SetString(PyExc_TypeError, "T must be an ASCII str or a buffer of bytes");
+            goto done;
+        }
+
+        T_data = PyUnicode_1BYTE_DATA(T_obj);
+        T_len = PyUnicode_GET_LENGTH(T_obj);
+    } else {
+        if (PyObject_GetBuffer(T_obj, &T_view, PyBUF_C_CONTIGUOUS) < 0) {
+            goto done;
+        }
+
+        have_T = 1;
+        T_data = (const unsigned char *) T_view.buf;
+        T_len = T_view.len;
+    }
+
+    if (T_size > T_len) {
+        T_size = T_len;
+    }
+
+    if ((algorithm == ALG_BM) || (algorithm == ALG_BM_COMPACT)) {
+        if ((L_view.len < P_view.len * (Py_ssize_t) sizeof(long long)) ||
+            (F_view.len < P_view.len * (Py_ssize_t) sizeof(long long))) {
+            PyErr_SetString(PyExc_ValueError, "L and F must have one entry per pattern byte");
+            goto done;
+        }
+    }
+
+    if (algorithm == ALG_BM) {
+        for (int i = 0; i < ALPHABET_SIZE; i++) {
+            if (R_views[i].len < (P_view.len + 1) * (Py_ssize_t) sizeof(long long)) {
+                PyErr_SetString(PyExc_ValueError, "R rows must have len(P) + 1 entries");
+                goto done;
+            }
+        }
+    }
+
+    /* Every shift must be at least 1 and no more than len(P) + 1 */
+    if ((algorithm == ALG_BM) || (algorithm == ALG_BM_COMPACT)) {
+        if (((algorithm == ALG_BM_COMPACT) &&
+             (check_range(&R_views[0], 0, ALPHABET_SIZE, -1, P_view.len - 1, "R") < 0)) ||
+            (check_range(&L_view, 0, P_view.len, -1, P_view.len - 2, "L") < 0) ||
+            (check_range(&F_view, 0, 1, 0, P_view.len, "F") < 0) ||
+            (check_range(&F_view, 1, P_view.len, 0, P_view.len - 1, "F") < 0)) {
+            goto done;
+        }
+    }
+
+    if ((algorithm == ALG_HORSPOOL) || (algorithm == ALG_RAITA) || (algorithm == ALG_SUNDAY)) {
+        long long high = P_view.len + (algorithm == ALG_SUNDAY);
+
+        if (check_range(&R_views[0], 0, ALPHABET_SIZE, 1, high, "R") < 0) {
+            goto done;
+        }
+    }
+
+    if (algorithm == ALG_TWO_WAY) {
+        const long long *params = (const long long *) L_view.buf;
+
+        if ((L_view.len < 3 * (Py_ssize_t) sizeof(long long)) || (params[0] < 0) ||
+            (params[0] > P_view.len) || (params[1] < 1) || (params[1] > P_view.len + 1)) {
+            PyErr_SetString(PyExc_ValueError, "L must hold the Two-Way parameters for P");
+            goto done;
+        }
+    }
+
+    if (algorithm == ALG_RARE_BYTE) {
+        const long long *params = (const long long *) L_view.buf;
+
+        if ((L_view.len < (Py_ssize_t) sizeof(long long)) || (params[0] < 0) ||
+            (params[0] >= P_view.len)) {
+            PyErr_SetString(PyExc_ValueError, "L must hold the offset of a byte in P");
+            goto done;
+        }
+    }
+
+    if (algorithm == ALG_BYTE_CLASS) {
+        const long long *params = (const long long *) L_view.buf;
+
+        if ((L_view.len < (Py_ssize_t) sizeof(long long)) || (params[0] < 1) ||
+            (params[0] > F_view.len / (4 * (Py_ssize_t) sizeof(long long)))) {
+            PyErr_SetString(PyExc_ValueError, "F must hold a byte class mask for each of the "
+                                              "L[0] classes");
+            goto done;
+        }
+
+        if (check_range(&R_views[0], 0, ALPHABET_SIZE, 1, params[0], "R") < 0) {
+            goto done;
+        }
+    }
+
+    if (P_view.len == 0) {
+        PyErr_SetString(PyExc_ValueError, "P must not be empty");
+        goto done;
+    }
+
+    /* k is the position in T of the last byte of the first alignment */
+    if (k < ((algorithm == ALG_BYTE_CLASS) ? ((const long long *) L_view.buf)[0] :
+             P_view.len) - 1) {
+        PyErr_SetString(PyExc_ValueError, "k must be at least len(P) - 1");
+        goto done;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    switch (algorithm) {
+        case ALG_BM:
+        case ALG_BM_COMPACT:
+            status = run_scan((algorithm == ALG_BM) ? rows : NULL,
+                              (algorithm == ALG_BM) ? NULL : (const long long *) R_views[0].buf,
+                              (const long long *) L_view.buf, (const long long *) F_view.buf,
+                              (const unsigned char *) P_view.buf, P_view.len,
+                              T_data, T_size, &k, &previous_k, base, greedy, &found);
+            break;
+
+        case ALG_HORSPOOL:
+        case ALG_RAITA:
+            status = run_horspool((const long long *) R_views[0].buf,
+                                  (const unsigned char *) P_view.buf, P_view.len,
+                                  T_data, T_size, &k, base, greedy, algorithm == ALG_RAITA,
+                                  &found);
+            break;
+
+        case ALG_TWO_WAY:
+            status = run_two_way((const long long *) L_view.buf,
+                                 (const unsigned char *) P_view.buf, P_view.len,
+                                 T_data, T_size, &k, &previous_k, base, greedy, &found);
+            break;
+
+        case ALG_BYTE_CLASS:
+            status = run_byte_class((const long long *) R_views[0].buf,
+                                    (const long long *) F_view.buf,
+                                    (Py_ssize_t) ((const long long *) L_view.buf)[0],
+                                    T_data, T_size, &k, base, greedy, &found);
+            break;
+
+        case ALG_RARE_BYTE:
+            status = run_rare_byte((Py_ssize_t) ((const long long *) L_view.buf)[0],
+                                   (const unsigned char *) P_view.buf, P_view.len,
+                                   T_data, T_size, &k, base, greedy, &found);
+            break;
+
+        default:
+            status = run_sunday((const long long *) R_views[0].buf,
+                                (const unsigned char *) P_view.buf, P_view.len,
+                                T_data, T_size, &k, base, greedy, &found);
+            break;
+    }
+    Py_END_ALLOW_THREADS
+
+    if (status < 0) {
+        PyErr_NoMemory();
+        goto done;
+    }
+
+    for (Py_ssize_t i = 0; i < found.len; i++) {
+        PyObject *offset = PyLong_FromLongLong(found.items[i]);
+        if ((offset == NULL) || (PyList_Append(matches, offset) < 0)) {
+            Py_XDECREF(offset);
+            goto done;
+        }
+
+        Py_DECREF(offset);
+    }
+
+    ret = Py_BuildValue("(nn)", k, previous_k);
+
+done:
+    free(found.items);
+
+    for (int i = 0; i < R_count; i++) {
+        PyBuffer_Release(&R_views[i]);
+    }
+
+    if (have_L) {
+        PyBuffer_Release(&L_view);
+    }
+
+    if (have_F) {
+        PyBuffer_Release(&F_view);
+    }
+
+    if (have_P) {
+        PyBuffer_Release(&P_view);
+    }
+
+    if (have_T) {
+        PyBuffer_Release(&T_view);
+    }
+
+    return ret;
+}
+
+static PyObject *scan(PyObject *self, PyObject *args)
+{
+    return scan_common(args, ALG_BM);
+}
+
+static PyObject *scan_compact(PyObject *self, PyObject *args)
+{
+    return scan_common(args, ALG_BM_COMPACT);
+}
+
+static PyObject *scan_horspool(PyObject *self, PyObject *args)
+{
+    return scan_common(args, ALG_HORSPOOL);
+}
+
+static PyObject *scan_raita(PyObject *self, PyObject *args)
+{
+    return scan_common(args, ALG_RAITA);
+}
+
+static PyObject *scan_sunday(PyObject *self, PyObject *args)
+{
+    return scan_common(args, ALG_SUNDAY);
+}
+
+static PyObject *scan_two_way(PyObject *self, PyObject *args)
+{
+    return scan_common(args, ALG_TWO_WAY);
+}
+
+static PyObject *scan_byte_class(PyObject *self, PyObject *args)
+{
+    return scan_common(args, ALG_BYTE_CLASS);
+}
+
+/*
+ * Set the bit chosen by boyermoore._trigram_bit in 'signature' for every 3-byte
+ * sequence in T that starts at an offset in [start, end).
+ */
+static PyObject *block_signature(PyObject *self, PyObject *args)
+{
+    Py_buffer T_view, sig_view;
+    Py_ssize_t start, end;
+
+    if (!PyArg_ParseTuple(args, "y*nnw*", &T_view, &start, &end, &sig_view)) {
+        return NULL;
+    }
+
+    const unsigned char *T = T_view.buf;
+    unsigned char *signature = sig_view.buf;
+    uint32_t bits = (uint32_t) (sig_view.len * 8);
+
+    if (start < 0) {
+        start = 0;
+    }
+
+    if (end > T_view.len - 2) {
+        end = T_view.len - 2;
+    }
+
+    if (bits > 0) {
+        Py_BEGIN_ALLOW_THREADS
+        for (Py_ssize_t i = start; i < end; i++) {
+            uint32_t gram = ((uint32_t) T[i] << 16) | ((uint32_t) T[i + 1] << 8) | T[i + 2];
+            uint32_t bit = ((uint32_t) (gram * 2654435761u) >> 8) % bits;
+            signature[bit >> 3] |= (unsigned char) (1u << (bit & 7));
+        }
+        Py_END_ALLOW_THREADS
+    }
+
+    PyBuffer_Release(&T_view);
+    PyBuffer_Release(&sig_view);
+    Py_RETURN_NONE;
+}
+
+static PyObject *suffix_lengths(PyObject *self, PyObject *args)
+{
+    Py_buffer S_view, N_view;
+
+    if (!PyArg_ParseTuple(args, "y*w*", &S_view, &N_view)) {
+        return NULL;
+    }
+
+    const unsigned char *S = S_view.buf;
+    int64_t *N = N_view.buf;
+    Py_ssize_t m = S_view.len;
+
+    if (N_view.len < m * (Py_ssize_t) sizeof(int64_t)) {
+        PyBuffer_Release(&S_view);
+        PyBuffer_Release(&N_view);
+        PyErr_SetString(PyExc_ValueError, "N is too small for S");
+        return NULL;
+    }
+
+    if (m > 0) {
+        Py_BEGIN_ALLOW_THREADS
+        Py_ssize_t g = m - 1;
+        Py_ssize_t f = m - 1;
+
+        N[m - 1] = m;
+        for (Py_ssize_t i = m - 2; i >= 0; i--) {
+            if ((i > g) && (N[i + m - 1 - f] < i - g)) {
+                N[i] = N[i + m - 1 - f];
+            } else {
+                if (i < g) {
+                    g = i;
+                }
+
+                f = i;
+                while ((g >= 0) && (S[g] == S[g + m - 1 - f])) {
+                    g--;
+                }
+
+                N[i] = f - g;
+            }
+        }
+        Py_END_ALLOW_THREADS
+    }
+
+    PyBuffer_Release(&S_view);
+    PyBuffer_Release(&N_view);
+    Py_RETURN_NONE;
+}
+
+static PyObject *scan_rare_byte(PyObject *self, PyObject *args)
+{
+    return scan_common(args, ALG_RARE_BYTE);
+}
+
+static PyMethodDef speedups_methods[] = {
+    {"scan", scan, METH_VARARGS,
+     "Native implementation of boyermoore._scan"},
+    {"scan_compact", scan_compact, METH_VARARGS,
+     "Native implementation of boyermoore._scan_compact"},
+    {"scan_horspool", scan_horspool, METH_VARARGS,
+     "Native implementation of boyermoore._scan_horspool"},
+    {"scan_raita", scan_raita, METH_VARARGS,
+     "Native implementation of boyermoore._scan_raita"},
+    {"scan_sunday", scan_sunday, METH_VARARGS,
+     "Native implementation of boyermoore._scan_sunday"},
+    {"scan_two_way", scan_two_way, METH_VARARGS,
+     "Native implementation of boyermoore._scan_two_way"},
+    {"scan_byte_class", scan_byte_class, METH_VARARGS,
+     "Native implementation of boyermoore._scan_byte_class"},
+    {"scan_rare_byte", scan_rare_byte, METH_VARARGS,
+     "Native implementation of boyermoore._scan_rare_byte"},
+    {"block_signature", block_signature, METH_VARARGS,
+     "Native implementation of boyermoore._block_signature"},
+    {"suffix_lengths", suffix_lengths, METH_VARARGS,
+     "Native implementation of boyermoore._suffix_lengths"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef speedups_module = {
+    PyModuleDef_HEAD_INIT,
+    "boyermoore._speedups",
+    "Optional native implementation of the Boyer-Moore shift loop",
+    -1,
+    speedups_methods
+};
+
+PyMODINIT_FUNC PyInit__speedups(void)
+{
+    return PyModule_Create(&speedups_module);
+}
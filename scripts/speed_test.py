@@ -1,95 +1,324 @@
+"""
+Benchmarks for the boyermoore package.
+
+Run from the root of the repository:
+
+    python -m scripts.speed_test [--size BYTES] [--repeat N] [--suite NAME ...] [--output FILE]
+
+All test data is generated in a temporary directory, which is removed when the
+benchmarks finish. Results are printed as they are measured, and can also be
+written to a JSON file so that they can be compared across commits.
+"""
+
+import argparse
+import json
 import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
 import time
+import tracemalloc
+
+import boyermoore
+from boyermoore import (preprocess, search_string_pp, search_file_pp, search_file_mmap_pp,
+                        search_stream_pp, iter_search_string_pp)
+
+
+DEFAULT_DATA_SIZE = 4 * 1024 * 1024
+DEFAULT_REPEAT = 3
 
-from boyermoore import search_file_pp, search_file, preprocess
+# Byte values used for generated text data (lower case letters, spaces and newlines)
+TEXT_ALPHABET = b"abcdefghijklmnopqrstuvwxyz      \n"
 
+UNICODE_PATTERN = "Hello नमस्ते Привет こんにちは".encode()
 
-test_data = b"abcdefghijklmnopqrstuvwxyz" * 16384
 
-def _write_rand_data(fh, num):
-    ret = b""
+def _best_time(func, repeat):
+    """
+    Call func 'repeat' times, and return the shortest time taken along with the
+    return value of the last call.
+    """
+    best = None
+    ret = None
 
-    written = 0
-    while written < num:
-        remaining = num - written
-        size = remaining if remaining < len(test_data) else len(test_data)
-        fh.write(test_data[:size])
-        written += size
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        ret = func()
+        secs = time.perf_counter() - start_time
 
-    return ret
+        if (best is None) or (secs < best):
+            best = secs
 
-def make_big_file(filename, pattern, offsets):
-    last_offset = 0
+    return best, ret
 
-    with open(filename, 'wb') as fh:
-        for offset in offsets:
-            data_size = offset - last_offset
-            _write_rand_data(fh, data_size)
-            fh.write(pattern)
 
-            last_offset += len(pattern) + data_size
+def _text_data(size, seed=1234):
+    """
+    Generate 'size' bytes of random text, using only bytes from TEXT_ALPHABET.
+    """
+    rng = random.Random(seed)
+    table = bytes(TEXT_ALPHABET[i % len(TEXT_ALPHABET)] for i in range(256))
+    return rng.getrandbits(size * 8).to_bytes(size, 'little').translate(table)
 
-def linear_search(filename, pattern):
-    pos = 0
-    last_start_pos = 0
+
+def _insert_pattern(data, pattern, interval):
+    """
+    Overwrite 'data' with an instance of 'pattern' every 'interval' bytes.
+    """
+    data = bytearray(data)
+    for offset in range(0, len(data) - len(pattern) + 1, interval):
+        data[offset:offset + len(pattern)] = pattern
+
+    return bytes(data)
+
+
+def _find_all(pattern, data):
+    """
+    Find all (possibly overlapping) occurrences of pattern in data with bytes.find.
+    """
     matches = []
-    curr_match = 0
-
-    with open(filename, 'rb') as fh:
-        while True:
-            c = fh.read(1)
-            if not c:
-                break
-
-            c = c[0]
-            if pattern[pos] == c:
-                pos += 1
-                if pos == 1:
-                    curr_match = fh.tell()
-
-                if pos >= len(pattern):
-                    matches.append(curr_match)
-                    pos = 0
-            else:
-                pos = 0
+    pos = data.find(pattern)
+    while pos >= 0:
+        matches.append(pos)
+        pos = data.find(pattern, pos + 1)
 
     return matches
 
+
+def _re_find_all(pattern, data):
+    """
+    Find all (possibly overlapping) occurrences of pattern in data with the re module.
+    """
+    regex = re.compile(b"(?=" + re.escape(pattern) + b")")
+    return [m.start() for m in regex.finditer(data)]
+
+
+class Benchmark(object):
+    """
+    Runs benchmarks and collects the results.
+    """
+    def __init__(self, size, repeat, tmpdir):
+        self.size = size
+        self.repeat = repeat
+        self.tmpdir = tmpdir
+        self.results = []
+
+    def record(self, suite, name, secs, data_size=None, **params):
+        result = {"suite": suite, "name": name, "seconds": secs}
+        if data_size is not None:
+            result["bytes"] = data_size
+            result["mb_per_sec"] = (data_size / (1024 * 1024)) / secs if secs > 0 else None
+
+        result.update(params)
+        self.results.append(result)
+
+        param_str = ", ".join(f"{k}={v}" for k, v in params.items())
+        rate = f", {result['mb_per_sec']:.2f} MB/s" if result.get("mb_per_sec") else ""
+        print(f"[{suite}] {name}: {secs:.4f}s{rate} ({param_str})")
+
+    def write_file(self, name, data):
+        filename = os.path.join(self.tmpdir, name)
+        with open(filename, 'wb') as fh:
+            fh.write(data)
+
+        return filename
+
+    def suite_preprocess(self):
+        """
+        Boyer-Moore pre-processing time and peak memory vs. pattern length, for both bad
+        character tables
+        """
+        pattern_sizes = [8, 64, 512, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024]
+        data = _text_data(max(pattern_sizes))
+
+        for size in pattern_sizes:
+            pattern = data[:size]
+
+            # The full table holds 256 entries per pattern byte, 512 MB for a 256 KB pattern
+            for compact_table in [False, True] if size <= 64 * 1024 else [True]:
+                tracemalloc.start()
+                secs, _ = _best_time(lambda: preprocess(pattern, compact_table, "bm"), 1)
+                _, peak_bytes = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                # Time again without tracemalloc, which slows down allocation-heavy code
+                secs, _ = _best_time(lambda: preprocess(pattern, compact_table, "bm"),
+                                     self.repeat)
+
+                table = "compact" if compact_table else "full"
+                self.record("preprocess", f"{table} table", secs, pattern_length=size,
+                            peak_memory_bytes=peak_bytes)
+
+    def suite_engines(self):
+        """
+        The same search using each of the search engines, and bytes.find / re for comparison
+        """
+        data = _insert_pattern(_text_data(self.size), UNICODE_PATTERN, (self.size // 4) + 1)
+        filename = self.write_file("engines.bin", data)
+        pp_data = preprocess(UNICODE_PATTERN)
+
+        def stream():
+            with open(filename, 'rb') as fh:
+                return list(search_stream_pp(pp_data, fh))
+
+        text = data.decode('utf-8', 'replace')
+        text_offsets = lambda: search_string_pp(pp_data, text, byte_offsets=True)
+
+        engines = [
+            ("search_string_pp", lambda: search_string_pp(pp_data, data)),
+            ("iter_search_string_pp", lambda: list(iter_search_string_pp(pp_data, data))),
+            ("search_file_pp", lambda: search_file_pp(pp_data, filename)),
+            ("search_file_mmap_pp", lambda: search_file_mmap_pp(pp_data, filename)),
+            ("search_stream_pp", stream),
+            ("search_string_pp (str)", text_offsets),
+            ("bytes.find", lambda: _find_all(UNICODE_PATTERN, data)),
+            ("re", lambda: _re_find_all(UNICODE_PATTERN, data)),
+        ]
+
+        expected = _find_all(UNICODE_PATTERN, data)
+        for name, func in engines:
+            secs, matches = _best_time(func, self.repeat)
+            if matches != expected:
+                raise RuntimeError(f"{name} returned wrong offsets")
+
+            self.record("engines", name, secs, len(data), matches=len(matches))
+
+    def suite_density(self):
+        """
+        Search time vs. number of matches, from no matches to a match at every offset
+        """
+        pattern = b"0123456789abcdef"
+        base_data = _text_data(self.size)
+        pp_data = preprocess(pattern)
+
+        intervals = [None, 1024 * 1024, 4096, 64, len(pattern)]
+        for interval in intervals:
+            data = base_data if interval is None else _insert_pattern(base_data, pattern, interval)
+            secs, matches = _best_time(lambda: search_string_pp(pp_data, data), self.repeat)
+            self.record("density", "search_string_pp", secs, len(data), interval=interval,
+                        matches=len(matches))
+
+        data = b"x" * self.size
+        pp_data = preprocess(b"x")
+        secs, matches = _best_time(lambda: search_string_pp(pp_data, data), self.repeat)
+        self.record("density", "search_string_pp", secs, len(data), interval=1,
+                    matches=len(matches))
+
+    def suite_periodic(self):
+        """
+        Adversarial periodic patterns, such as a*m in a*n, for each algorithm
+        """
+        size = max(self.size // 8, 1)
+
+        for unit in [b"a", b"ab", b"abcd"]:
+            data = (unit * ((size // len(unit)) + 1))[:size]
+
+            for pattern_size in [2, 16, 256]:
+                pattern = (unit * pattern_size)[:pattern_size]
+
+                for algorithm in ["auto"] + list(boyermoore.ALGORITHMS):
+                    pp_data = preprocess(pattern, algorithm=algorithm)
+                    secs, matches = _best_time(lambda: search_string_pp(pp_data, data),
+                                               self.repeat)
+                    self.record("periodic", "search_string_pp", secs, len(data),
+                                unit=unit.decode(), pattern_length=pattern_size,
+                                algorithm=pp_data.algorithm, matches=len(matches))
+
+                # Almost periodic pattern, where every alignment matches all but one byte
+                near = pattern[:pattern_size // 2] + b"x" + pattern[(pattern_size // 2) + 1:]
+                for algorithm in list(boyermoore.ALGORITHMS):
+                    pp_data = preprocess(near, algorithm=algorithm)
+                    secs, matches = _best_time(lambda: search_string_pp(pp_data, data),
+                                               self.repeat)
+                    self.record("periodic", "search_string_pp (near-periodic)", secs, len(data),
+                                unit=unit.decode(), pattern_length=pattern_size,
+                                algorithm=algorithm, matches=len(matches))
+
+                secs, matches = _best_time(lambda: _find_all(pattern, data), self.repeat)
+                self.record("periodic", "bytes.find", secs, len(data), unit=unit.decode(),
+                            pattern_length=pattern_size, matches=len(matches))
+
+    def suite_algorithms(self):
+        """
+        Search time for each algorithm vs. pattern length, on text and on data made of
+        only a few different byte values, which is what the thresholds used by "auto"
+        (boyermoore.AUTO_*) are chosen from
+        """
+        datasets = [
+            ("text", _text_data(self.size)),
+            ("dna", _text_data(self.size).translate(bytes(b"ACGT"[i % 4] for i in range(256)))),
+        ]
+
+        for alphabet_size in [2, 6, 8, 16]:
+            table = bytes(TEXT_ALPHABET[i % alphabet_size] for i in range(256))
+            datasets.append((f"{alphabet_size} bytes", _text_data(self.size).translate(table)))
+
+        for data_name, data in datasets:
+            for pattern_size in [4, 16, 32, 64, 256]:
+                pattern = data[self.size // 2:(self.size // 2) + pattern_size]
+                expected = _find_all(pattern, data)
+
+                for algorithm in ["auto"] + list(boyermoore.ALGORITHMS):
+                    pp_data = preprocess(pattern, algorithm=algorithm)
+                    secs, matches = _best_time(lambda: search_string_pp(pp_data, data),
+                                               self.repeat)
+                    if matches != expected:
+                        raise RuntimeError(f"{algorithm} returned wrong offsets")
+
+                    self.record("algorithms", algorithm, secs, len(data), data=data_name,
+                                pattern_length=pattern_size, chosen=pp_data.algorithm,
+                                matches=len(matches))
+
+    SUITES = ["preprocess", "engines", "density", "periodic", "algorithms"]
+
+    def run(self, suites):
+        for suite in suites:
+            getattr(self, "suite_" + suite)()
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
 def main():
-    sizes = [
-        1024 * 1024,
-        1024 * 1024 * 2,
-        1024 * 1024 * 32,
-        1024 * 1024 * 64,
-        1024 * 1024 * 128,
-        1024 * 1024 * 256,
-        1024 * 1024 * 512,
-        1024 * 1024 * 1024,
-        1024 * 1024 * 1024 * 2,
-    ]
-
-    pattern = "Hello नमस्ते Привет こんにちは".encode()
-    pp_data = preprocess(pattern)
-
-    count = 0
-    for size in sizes:
-        offsets = [0, size - len(pattern)]
-        filename = "__big_testfile%d.txt" % count
-        count += 1
-
-        make_big_file(filename, pattern, offsets)
-
-        start_time = time.time()
-        search_file_pp(pp_data, filename)
-        bm_time_secs = time.time() - start_time
-
-        start_time = time.time()
-        linear_search(filename, pattern)
-        linear_time_secs = time.time() - start_time
-
-        print(f"{size:,} bytes, linear={linear_time_secs:.2f}, bm=f{bm_time_secs:.2f}")
-
-        os.remove(filename)
+    parser = argparse.ArgumentParser(description="Run benchmarks for the boyermoore package")
+    parser.add_argument("-s", "--size", type=int, default=DEFAULT_DATA_SIZE,
+                        help="Size in bytes of generated test data (default: %(default)s)")
+    parser.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Number of times to repeat each measurement, the fastest time "
+                             "is reported (default: %(default)s)")
+    parser.add_argument("--suite", action="append", choices=Benchmark.SUITES,
+                        help="Benchmark suite to run, may be given multiple times (default: all)")
+    parser.add_argument("-o", "--output", help="Write results to this file as JSON")
+    parser.add_argument("--tmpdir", help="Directory to create temporary test files in")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmpdir:
+        bench = Benchmark(args.size, args.repeat, tmpdir)
+        bench.run(args.suite or Benchmark.SUITES)
+
+    if args.output:
+        output = {
+            "boyermoore_version": boyermoore.__version__,
+            "git_commit": _git_commit(),
+            "python_version": sys.version,
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "data_size": args.size,
+            "repeat": args.repeat,
+            "results": bench.results,
+        }
+
+        with open(args.output, 'w') as fh:
+            json.dump(output, fh, indent=4)
+
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,6 @@
 import unittest
 import os
-from setuptools import setup
+from setuptools import setup, Extension
 from distutils.core import Command
 
 from boyermoore import __version__
@@ -35,6 +35,17 @@ setup(
     author_email='eknyquist@gmail.com',
     license='Apache 2.0',
     packages=['boyermoore'],
+    ext_modules=[
+        # Optional, the pure python implementation is used if this fails to build
+        Extension('boyermoore._speedups', ['boyermoore/_speedups.c'], optional=True)
+    ],
+    extras_require={
+        # Only needed to search zstd compressed files
+        'zstd': ['zstandard'],
+    },
+    entry_points={
+        'console_scripts': ['boyermoore=boyermoore.__main__:main'],
+    },
     cmdclass={'test': RunBoyerMooreTests},
     include_package_data=True,
     zip_safe=False,
@@ -1,7 +1,40 @@
+import array
+import asyncio
+import bz2
+import concurrent.futures
+import functools
+import gzip
+import io
+import lzma
+import mmap
+import multiprocessing
 import os
+import pickle
+import random
+import re
+import shutil
+import threading
 import unittest
 
-from boyermoore import search_string, search_string_pp, search_file, search_file_pp, preprocess
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import boyermoore
+
+from boyermoore import (search_string, search_string_pp, search_file, search_file_pp,
+                        search_file_mmap, search_file_mmap_pp, search_stream,
+                        search_stream_pp, iter_search_string, iter_search_string_pp,
+                        iter_search_file, iter_search_file_pp, search_file_parallel,
+                        search_file_parallel_pp, search_files, search_files_pp,
+                        search_string_many, search_string_many_pp, search_file_many,
+                        search_file_many_pp, async_search_file, async_search_file_pp,
+                        follow_file, follow_file_pp, rsearch_string, rsearch_string_pp,
+                        search_file_reverse, search_file_reverse_pp,
+                        async_search_stream, async_search_stream_pp, preprocess_many,
+                        preprocess, Pattern, SearchStats, IndexedFile, build_index,
+                        pattern_cache_info, pattern_cache_clear)
 
 from tests.common import make_big_bytes, make_big_file
 
@@ -71,6 +104,205 @@ class TestBoyerMoore(unittest.TestCase):
                 actual_offsets = search_string_pp(pp_data, test_string, greedy=False)
                 self.assertEqual(actual_offsets, [expected_offsets[0]])
 
+    def test_search_string_pp_algorithms(self):
+        for pattern in TEST_DATA:
+            for algorithm in ["auto", "bm", "horspool", "sunday", "raita", "two-way",
+                              "rare-byte"]:
+                pp_data = preprocess(pattern, algorithm=algorithm)
+                for expected_offsets in TEST_DATA[pattern]:
+                    test_string = make_big_bytes(pattern.encode(), expected_offsets)
+                    actual_offsets = search_string_pp(pp_data, test_string)
+                    self.assertEqual(actual_offsets, expected_offsets)
+
+                    actual_offsets = search_string_pp(pp_data, test_string, greedy=False)
+                    self.assertEqual(actual_offsets, [expected_offsets[0]])
+
+    def test_search_string_algorithms_overlapping(self):
+        test_string = b'aaaaaabaaaa'
+        for algorithm in ["bm", "horspool", "sunday", "raita", "two-way", "rare-byte"]:
+            pp_data = preprocess('aaa', algorithm=algorithm)
+            self.assertEqual(search_string_pp(pp_data, test_string), [0, 1, 2, 3, 7, 8])
+
+            actual_offsets = search_stream_pp(pp_data, io.BytesIO(test_string), 2)
+            self.assertEqual(list(actual_offsets), [0, 1, 2, 3, 7, 8])
+
+    def test_search_rare_byte(self):
+        # The rarest byte of the pattern is the one that is searched for
+        self.assertEqual(preprocess("error: disk full", algorithm="rare-byte").L[0], 10)
+        self.assertEqual(preprocess("ab~cd", algorithm="rare-byte").L[0], 2)
+        self.assertEqual(preprocess("e\x00e", algorithm="rare-byte").L[0], 1)
+
+        test_string = b"x: error: disk 2 error: disk full\nerror: disk full" * 50
+        pp_data = preprocess("error: disk full", algorithm="rare-byte")
+        expected_offsets = search_string("error: disk full", test_string)
+
+        for T in [test_string, bytearray(test_string), memoryview(test_string),
+                  test_string.decode()]:
+            self.assertEqual(search_string_pp(pp_data, T), expected_offsets)
+            self.assertEqual(search_string_pp(pp_data, T, greedy=False), expected_offsets[:1])
+
+        self.assertEqual(list(search_stream_pp(pp_data, io.BytesIO(test_string), 7)),
+                         expected_offsets)
+
+    def test_scan_rare_byte_chunks(self):
+        # Buffers with no find method are scanned in chunks copied into bytes, which must
+        # find occurrences that straddle the boundaries between chunks
+        R, L, F, P = preprocess("error: disk full", algorithm="rare-byte")
+        test_string = (b"x" * (boyermoore._SCAN_CHUNK_SIZE - 5) + b"error: disk full") * 3
+        expected_offsets = search_string("error: disk full", test_string)
+        self.assertEqual(len(expected_offsets), 3)
+
+        for scan in [boyermoore._scan_rare_byte,
+                     functools.partial(boyermoore._scan_rare_byte_stats, SearchStats())]:
+            for greedy in [True, False]:
+                matches = []
+                scan(R, L, F, P, memoryview(test_string), len(test_string), len(P) - 1, -1, 0,
+                     greedy, matches)
+                self.assertEqual(matches, expected_offsets if greedy else expected_offsets[:1])
+
+    def test_preprocess_auto_algorithm(self):
+        self.assertEqual(preprocess("hello, world!").algorithm, "horspool")
+        self.assertEqual(preprocess("q").algorithm, "horspool")
+        self.assertEqual(preprocess("AAAAAAA").algorithm, "horspool")
+        self.assertEqual(preprocess("abababab").algorithm, "horspool")
+        self.assertEqual(preprocess(b"\x00" * 512).algorithm, "two-way")
+        self.assertEqual(preprocess("ab" * 32).algorithm, "two-way")
+        self.assertEqual(preprocess("aab" * 32).algorithm, "bm")
+        self.assertEqual(preprocess("ab" * 15 + "ba").algorithm, "bm")
+        self.assertEqual(preprocess("hello, world! " * 4).algorithm, "horspool")
+        self.assertEqual(preprocess("ACGT" * 16).algorithm, "horspool")
+        self.assertEqual(preprocess(bytes(range(64))).algorithm, "horspool")
+
+    def test_good_suffix_tables(self):
+        rng = random.Random(1234)
+
+        for _ in range(300):
+            size = rng.randint(1, 60)
+            pattern = bytes(rng.choice(b"ab" if size % 2 else b"abc") for _ in range(size))
+            if rng.random() < 0.3:
+                pattern = (pattern[:rng.randint(1, size)] * size)[:size]
+
+            # Tables computed straight from their definitions. L[i] is the largest j such
+            # that pattern[:j + 1] ends with pattern[i:], but not with pattern[i - 1:]
+            expected_L = [-1] * size
+            for j in range(size - 1):
+                for i in range(1, size):
+                    if (pattern[:j + 1].endswith(pattern[i:]) and
+                            not pattern[:j + 1].endswith(pattern[i - 1:])):
+                        expected_L[i] = j
+
+            expected_F = [max(j for j in range(size - i + 1) if pattern.endswith(pattern[:j]))
+                          for i in range(size)]
+
+            for text in [False, True]:
+                pp_data = preprocess(pattern.decode() if text else pattern, algorithm="bm")
+                pp_data = boyermoore._text_pattern(pp_data) if text else pp_data
+                self.assertEqual(list(pp_data.L), expected_L)
+                self.assertEqual(list(pp_data.F), expected_F)
+
+    def test_search_large_pattern(self):
+        rng = random.Random(99)
+        pattern = bytes(rng.getrandbits(8) for _ in range(64 * 1024))
+        test_string = make_big_bytes(pattern, [0, 70000, 300000])
+
+        for algorithm in ["bm", "two-way", "auto"]:
+            pp_data = preprocess(pattern, algorithm=algorithm)
+            self.assertEqual(search_string_pp(pp_data, test_string), [0, 70000, 300000])
+
+    def test_search_two_way_periodic(self):
+        for unit in [b"\x00", b"ab", b"abc"]:
+            pp_data = preprocess(unit * 20, algorithm="two-way")
+            data = (unit * 100) + b"x" + (unit * 30)
+            expected = [i for i in range(len(data)) if data[i:i + len(pp_data)] == pp_data.pattern]
+
+            self.assertEqual(search_string_pp(pp_data, data), expected)
+            self.assertEqual(list(iter_search_string_pp(pp_data, data, start=7)),
+                             [i for i in expected if i >= 7])
+
+            for block_size in [1, 7, 4096]:
+                actual = list(search_stream_pp(pp_data, io.BytesIO(data), block_size))
+                self.assertEqual(actual, expected)
+
+    def test_search_ignore_case(self):
+        pp_data = preprocess("Hello, World", ignore_case=True)
+        self.assertEqual(pp_data.algorithm, "byte-class")
+
+        test_string = b"hello, world HELLO, WORLD hElLo, WoRlD hello, w0rld"
+        self.assertEqual(search_string_pp(pp_data, test_string), [0, 13, 26])
+        self.assertEqual(list(search_stream_pp(pp_data, io.BytesIO(test_string), 5)), [0, 13, 26])
+        self.assertEqual(list(iter_search_string_pp(pp_data, test_string, start=1)), [13, 26])
+
+        # Non-letters and non-ASCII bytes are still matched exactly
+        pp_data = preprocess("[ճ]", ignore_case=True)
+        self.assertEqual(search_string_pp(pp_data, "[ճ] [Ճ] {ճ}".encode()), [0])
+
+        for pattern in TEST_DATA:
+            # Only ASCII letters are case-insensitive
+            pp_data = preprocess(pattern.swapcase() if pattern.isascii() else pattern,
+                                 ignore_case=True)
+            regex = re.compile(b"(?=" + re.escape(pattern.encode()) + b")", re.IGNORECASE)
+
+            for expected_offsets in TEST_DATA[pattern][:3]:
+                test_string = make_big_bytes(pattern.encode(), expected_offsets)
+                expected = [m.start() for m in regex.finditer(test_string)]
+                self.assertEqual(search_string_pp(pp_data, test_string), expected)
+
+    def test_search_wildcards(self):
+        test_string = b"a1c abc a-c a?c 12:34 1:234 ab]c a\\c"
+
+        def search(pattern, ignore_case=False):
+            pp_data = preprocess(pattern, wildcards=True, ignore_case=ignore_case)
+            return search_string_pp(pp_data, test_string)
+
+        self.assertEqual(search("a?c"), [0, 4, 8, 12, 33])
+        self.assertEqual(search("a[0-9]c"), [0])
+        self.assertEqual(search("a[!0-9]c"), [4, 8, 12, 33])
+        self.assertEqual(search("a[^b1\\\\]c"), [8, 12])
+        self.assertEqual(search("a[-b]c"), [4, 8])
+        self.assertEqual(search("a\\?c"), [12])
+        self.assertEqual(search("[0-9][0-9]:[0-9][0-9]"), [16])
+        self.assertEqual(search("b[]]c"), [29])
+        self.assertEqual(search("a\\\\c"), [33])
+        self.assertEqual(search("A[B-C]C", ignore_case=True), [4])
+        self.assertEqual(search("A[!B]C", ignore_case=True), [0, 8, 12, 33])
+        self.assertEqual(search("x?"), [])
+
+        # Without wildcards=True, wildcard characters are matched literally
+        self.assertEqual(search_string_pp(preprocess("a?c", ignore_case=True), test_string), [12])
+
+    def test_preprocess_wildcards_invalid(self):
+        for pattern in ["[abc", "abc\\", "a[z-a]", "[\\", b"[!\x00-\xff]", "[]"]:
+            self.assertRaises(ValueError, preprocess, pattern, wildcards=True)
+
+        self.assertRaises(ValueError, preprocess, "abc", algorithm="bm", ignore_case=True)
+        self.assertRaises(ValueError, preprocess, "abc", algorithm="sunday", wildcards=True)
+
+        pp_data = preprocess("abc", ignore_case=True)
+        self.assertRaises(ValueError, search_string_pp, pp_data, "abc")
+
+    def test_preprocess_invalid_algorithm(self):
+        self.assertRaises(ValueError, preprocess, "abc", algorithm="two-step")
+
+    def test_search_string_pp_compact_table(self):
+        for pattern in TEST_DATA:
+            for compact_table in [True, False]:
+                pp_data = preprocess(pattern, compact_table=compact_table)
+                for expected_offsets in TEST_DATA[pattern]:
+                    test_string = make_big_bytes(pattern.encode(), expected_offsets)
+                    actual_offsets = search_string_pp(pp_data, test_string)
+                    self.assertEqual(actual_offsets, expected_offsets)
+
+    def test_preprocess_compact_table_default(self):
+        R, _, _, _ = preprocess("a" * 8, algorithm="bm")
+        self.assertEqual(len(R), 256)
+        self.assertEqual(len(R[ord("a")]), 9)
+
+        R, _, _, _ = preprocess("ab" * 1024, algorithm="bm")
+        self.assertEqual(len(R), 256)
+        self.assertEqual(R[ord("a")], 2046)
+        self.assertEqual(R[ord("b")], 2047)
+        self.assertEqual(R[ord("c")], -1)
+
     def test_search_string_empty_pattern(self):
         test_string = b'hhhhhhhhhh'
         offsets = search_string('', test_string)
@@ -86,6 +318,16 @@ class TestBoyerMoore(unittest.TestCase):
         offsets = search_string('abcd', test_string)
         self.assertEqual(offsets, [8])
 
+    def test_search_string_overlapping_pattern(self):
+        test_string = b'aaaaaa'
+        offsets = search_string('aaa', test_string)
+        self.assertEqual(offsets, [0, 1, 2, 3])
+
+    def test_search_string_periodic_no_false_positives(self):
+        test_string = b'abbbbbaaaabbabbababa'
+        offsets = search_string('abab', test_string)
+        self.assertEqual(offsets, [15])
+
     def test_search_string_nonexistent_pattern(self):
         test_string = b'hhhhhhhhhh'
         offsets = search_string('y', test_string)
@@ -96,6 +338,111 @@ class TestBoyerMoore(unittest.TestCase):
         offsets = search_string('q', test_string)
         self.assertEqual(offsets, [2])
 
+    def test_search_string_str(self):
+        test_string = "xxabcdxxճմնշxabcd\U0001F600abcd"
+        for algorithm in ["auto", "bm", "horspool", "sunday", "raita", "two-way"]:
+            self.assertEqual(search_string_pp(preprocess("abcd", algorithm=algorithm), test_string),
+                             [2, 13, 18])
+            self.assertEqual(search_string_pp(preprocess("նշxa", algorithm=algorithm), test_string),
+                             [10])
+
+        self.assertEqual(search_string(b"abcd", test_string, greedy=False), [2])
+        self.assertEqual(search_string("abcd", "abcabcabc"), [])
+        self.assertEqual(search_string("aa", "aaaa"), [0, 1, 2])
+        self.assertEqual(search_string("", "aaaa"), [])
+        self.assertEqual(search_string("é", "aaaa"), [])
+
+    def test_search_string_str_big(self):
+        for pattern in TEST_DATA:
+            for expected_offsets in TEST_DATA[pattern][:3]:
+                test_bytes = make_big_bytes(pattern.encode(), expected_offsets)
+                test_string = test_bytes.decode('latin-1')
+                expected = [len(test_bytes[:o].decode('latin-1')) for o in expected_offsets]
+                self.assertEqual(search_string(pattern.encode().decode('latin-1'), test_string),
+                                 expected)
+
+    def test_search_string_str_byte_offsets(self):
+        test_string = "ճմնշ abcd ճմնշ abcd"
+        self.assertEqual(search_string("abcd", test_string), [5, 15])
+        self.assertEqual(search_string("abcd", test_string, byte_offsets=True), [9, 23])
+        self.assertEqual(search_string("ճմ", test_string, byte_offsets=True), [0, 14])
+        self.assertEqual(search_string("abcd", b"abcd", byte_offsets=True), [0])
+
+        expected = [m for m in search_string("abcd", test_string.encode())]
+        self.assertEqual(search_string("abcd", test_string, byte_offsets=True), expected)
+
+    def test_iter_search_string_str(self):
+        test_string = "日本語 abcd 日本語 abcd 日本語"
+        self.assertEqual(list(iter_search_string("日本語", test_string)), [0, 9, 18])
+        self.assertEqual(list(iter_search_string("日本語", test_string, start=1, end=18)), [9])
+        self.assertEqual(list(iter_search_string("日本語", test_string, max_matches=2,
+                                                 byte_offsets=True)), [0, 15])
+
+    def test_search_string_str_invalid_pattern(self):
+        self.assertRaises(ValueError, search_string, b"\xff", "abc")
+        self.assertRaises(ValueError, iter_search_string, b"\xc3", "abc")
+
+    def test_search_stats(self):
+        test_string = b"xxabcxxabcabxabc" * 100
+        expected = search_string("abc", test_string)
+
+        algorithms = [{"algorithm": a} for a in boyermoore.ALGORITHMS]
+        for kwargs in algorithms + [{"algorithm": "bm", "compact_table": True}]:
+            pp_data = preprocess("abc", **kwargs)
+            stats = SearchStats()
+            self.assertEqual(search_string_pp(pp_data, test_string, stats=stats), expected)
+            self.assertEqual(stats.matches, len(expected))
+            self.assertEqual(stats.bytes_scanned, len(test_string))
+            self.assertGreaterEqual(stats.comparisons, 3 * len(expected))
+            self.assertAlmostEqual(stats.average_shift, stats.total_shift / stats.alignments)
+            self.assertEqual(stats.reads, 0)
+
+            # Rare byte skips straight from one candidate to the next
+            if pp_data.algorithm != "rare-byte":
+                self.assertLessEqual(stats.max_shift, 4)
+
+            if pp_data.algorithm == "bm":
+                self.assertEqual(stats.bad_character_shifts + stats.good_suffix_shifts,
+                                 stats.alignments - stats.matches)
+
+        stats = SearchStats()
+        self.assertEqual(search_string("abc", test_string.decode(), stats=stats), expected)
+        self.assertEqual(search_string("abc", test_string, greedy=False, stats=stats), [2])
+        self.assertEqual(stats.matches, len(expected) + 1)
+        self.assertEqual(stats.as_dict()["bytes_scanned"], len(test_string) * 2)
+        self.assertIn("matches=", repr(stats))
+
+    def test_search_stats_file(self):
+        filename = "file_stats.txt"
+        pattern = "ճմնշոչպ ջռսվ տրց"
+        make_big_file(filename, pattern.encode(), TEST_OFFSETS[1])
+        size = os.path.getsize(filename)
+
+        for search in [search_file, search_file_mmap]:
+            stats = SearchStats()
+            self.assertEqual(search(pattern, filename, stats=stats), TEST_OFFSETS[1])
+            self.assertEqual(stats.bytes_scanned, size)
+            self.assertGreater(stats.search_time, 0.0)
+            self.assertGreater(stats.preprocess_time, 0.0)
+
+        self.assertEqual(stats.reads, 0)
+
+        stats = SearchStats()
+        self.assertEqual(search_file(pattern, filename, block_size=4096, stats=stats),
+                         TEST_OFFSETS[1])
+        self.assertEqual(stats.reads, (size + 4095) // 4096)
+        self.assertEqual(stats.bytes_read, size)
+        self.assertGreaterEqual(stats.search_time, stats.read_time)
+
+        stats = SearchStats()
+        with open(filename, 'rb') as fh:
+            offsets = search_stream(pattern, fh, block_size=4096, stats=stats)
+            self.assertEqual(list(offsets), TEST_OFFSETS[1])
+
+        self.assertEqual(stats.bytes_read, size)
+        self.assertEqual(stats.matches, len(TEST_OFFSETS[1]))
+        os.remove(filename)
+
     def test_search_file_empty_pattern(self):
         filename = "testfile.txt"
         with open(filename, 'wb') as fh:
@@ -190,6 +537,1145 @@ class TestBoyerMoore(unittest.TestCase):
 
                 os.remove(filename)
 
+    def test_search_file_pp_block_sizes(self):
+        filename = "file_pp_block_sizes.txt"
+        test_data = {
+            "AAAAAA": [[0, 7, 14, 24, 31, 100]],
+            "abcq": [[3, 7, 11, 4095, 4099, 8191]],
+            "ճմնշոչպ ջռսվ տրց": TEST_OFFSETS[:3],
+        }
+
+        for pattern in test_data:
+            pp_data = preprocess(pattern)
+            for expected_offsets in test_data[pattern]:
+                make_big_file(filename, pattern.encode(), expected_offsets)
+
+                for block_size in [1, 2, 3, 7, 64, 4096]:
+                    actual_offsets = search_file_pp(pp_data, filename, block_size=block_size)
+                    self.assertEqual(actual_offsets, expected_offsets)
+
+                    actual_offsets = search_file_pp(pp_data, filename, greedy=False, block_size=block_size)
+                    self.assertEqual(actual_offsets, [expected_offsets[0]])
+
+                os.remove(filename)
+
+    def test_search_file_pp_compact_table(self):
+        filename = "file_pp_compact_table.txt"
+
+        for pattern in TEST_DATA:
+            pp_data = preprocess(pattern, compact_table=True)
+            for expected_offsets in TEST_DATA[pattern]:
+                make_big_file(filename, pattern.encode(), expected_offsets)
+
+                actual_offsets = search_file_pp(pp_data, filename)
+                self.assertEqual(actual_offsets, expected_offsets)
+
+                os.remove(filename)
+
+    def test_search_file_invalid_block_size(self):
+        self.assertRaises(ValueError, search_file, "abc", "nonexistent.txt", block_size=0)
+
+    def test_search_file_mmap_greedy(self):
+        count = 0
+
+        for pattern in TEST_DATA:
+            for expected_offsets in TEST_DATA[pattern]:
+                filename = "file_mmap_greedy%d.txt" % count
+                count += 1
+
+                make_big_file(filename, pattern.encode(), expected_offsets)
+
+                actual_offsets = search_file_mmap(pattern, filename)
+                self.assertEqual(actual_offsets, expected_offsets)
+
+                os.remove(filename)
+
+    def test_search_file_mmap_pp_notgreedy(self):
+        count = 0
+
+        for pattern in TEST_DATA:
+            pp_data = preprocess(pattern)
+            for expected_offsets in TEST_DATA[pattern]:
+                filename = "file_mmap_pp_notgreedy%d.txt" % count
+                count += 1
+
+                make_big_file(filename, pattern.encode(), expected_offsets)
+
+                actual_offsets = search_file_mmap_pp(pp_data, filename, greedy=False)
+                self.assertEqual(actual_offsets, [expected_offsets[0]])
+
+                os.remove(filename)
+
+    def test_search_file_mmap_empty_file(self):
+        filename = "file_mmap_empty.txt"
+        with open(filename, 'wb') as fh:
+            pass
+
+        offsets = search_file_mmap('q', filename)
+        self.assertEqual(offsets, [])
+
+        os.remove(filename)
+
+    def test_search_file_mmap_non_regular_file(self):
+        offsets = search_file_mmap('q', os.devnull)
+        self.assertEqual(offsets, [])
+
+    def test_search_stream_pp_file_object(self):
+        for pattern in TEST_DATA:
+            pp_data = preprocess(pattern)
+            for expected_offsets in TEST_DATA[pattern]:
+                test_string = make_big_bytes(pattern.encode(), expected_offsets)
+
+                for block_size in [13, 4096]:
+                    actual_offsets = search_stream_pp(pp_data, io.BytesIO(test_string), block_size)
+                    self.assertEqual(list(actual_offsets), expected_offsets)
+
+    def test_search_stream_iterable(self):
+        pattern = "ճմնշոչպ ջռսվ տրց"
+        expected_offsets = TEST_OFFSETS[0]
+        test_string = make_big_bytes(pattern.encode(), expected_offsets)
+
+        def chunks():
+            pos = 0
+            size = 1
+            while pos < len(test_string):
+                yield b''
+                yield memoryview(test_string)[pos:pos + size]
+                pos += size
+                size = (size * 3) % 97 + 1
+
+        actual_offsets = search_stream(pattern, chunks())
+        self.assertEqual(list(actual_offsets), expected_offsets)
+
+    def test_search_stream_gzip(self):
+        pattern = "hello, world!"
+        expected_offsets = TEST_OFFSETS[1]
+        compressed = gzip.compress(make_big_bytes(pattern.encode(), expected_offsets))
+
+        with gzip.open(io.BytesIO(compressed), 'rb') as fh:
+            actual_offsets = search_stream(pattern, fh, block_size=1000)
+            self.assertEqual(list(actual_offsets), expected_offsets)
+
+    def test_search_stream_yields_incrementally(self):
+        def chunks():
+            yield b'xxabcxx'
+            yield b'xxxxxxx'
+            raise RuntimeError("stream should not be read past the first match")
+
+        actual_offsets = search_stream('abc', chunks())
+        self.assertEqual(next(actual_offsets), 2)
+
+    def test_search_stream_empty_pattern(self):
+        actual_offsets = search_stream('', io.BytesIO(b'hhhhhhhhhh'))
+        self.assertEqual(list(actual_offsets), [])
+
+    def test_search_stream_invalid_block_size(self):
+        self.assertRaises(ValueError, search_stream, "abc", io.BytesIO(b'abc'), 0)
+
+    def test_iter_search_string_pp(self):
+        for pattern in TEST_DATA:
+            pp_data = preprocess(pattern)
+            for expected_offsets in TEST_DATA[pattern]:
+                test_string = make_big_bytes(pattern.encode(), expected_offsets)
+                actual_offsets = iter_search_string_pp(pp_data, test_string)
+                self.assertEqual(list(actual_offsets), expected_offsets)
+
+                actual_offsets = iter_search_string_pp(pp_data, test_string, max_matches=2)
+                self.assertEqual(list(actual_offsets), expected_offsets[:2])
+
+    def test_iter_search_string_range(self):
+        test_string = b'abcdabcdabcdabcd'
+        self.assertEqual(list(iter_search_string('abcd', test_string, start=1)), [4, 8, 12])
+        self.assertEqual(list(iter_search_string('abcd', test_string, end=15)), [0, 4, 8])
+        self.assertEqual(list(iter_search_string('abcd', test_string, start=4, end=12)), [4, 8])
+        self.assertEqual(list(iter_search_string('abcd', test_string, start=5, end=8)), [])
+        self.assertEqual(list(iter_search_string('abcd', test_string, max_matches=0)), [])
+        self.assertEqual(list(iter_search_string('', test_string)), [])
+
+    def test_iter_search_file_pp(self):
+        filename = "file_iter_pp.txt"
+
+        for pattern in TEST_DATA:
+            pp_data = preprocess(pattern)
+            for expected_offsets in TEST_DATA[pattern]:
+                make_big_file(filename, pattern.encode(), expected_offsets)
+
+                actual_offsets = iter_search_file_pp(pp_data, filename)
+                self.assertEqual(list(actual_offsets), expected_offsets)
+
+                actual_offsets = iter_search_file_pp(pp_data, filename, max_matches=1)
+                self.assertEqual(list(actual_offsets), expected_offsets[:1])
+
+                os.remove(filename)
+
+    def test_iter_search_file_range(self):
+        filename = "file_iter_range.txt"
+        with open(filename, 'wb') as fh:
+            fh.write(b'abcdabcdabcdabcd')
+
+        for block_size in [1, 3, 4096]:
+            actual_offsets = iter_search_file('abcd', filename, start=1, block_size=block_size)
+            self.assertEqual(list(actual_offsets), [4, 8, 12])
+
+            actual_offsets = iter_search_file('abcd', filename, end=15, block_size=block_size)
+            self.assertEqual(list(actual_offsets), [0, 4, 8])
+
+            actual_offsets = iter_search_file('abcd', filename, 1, 4, 12, block_size)
+            self.assertEqual(list(actual_offsets), [4])
+
+        os.remove(filename)
+
+    def test_iter_search_file_early_exit(self):
+        filename = "file_iter_early_exit.txt"
+        with open(filename, 'wb') as fh:
+            fh.write(b'xxabcxxabcxx')
+
+        actual_offsets = iter_search_file('abc', filename)
+        self.assertEqual(next(actual_offsets), 2)
+        actual_offsets.close()
+
+        os.remove(filename)
+
+    def test_iter_search_invalid_args(self):
+        self.assertRaises(ValueError, iter_search_string, 'abc', b'abc', max_matches=-1)
+        self.assertRaises(ValueError, iter_search_string, 'abc', b'abc', start=-1)
+        self.assertRaises(ValueError, iter_search_string, 'abc', b'abc', start=2, end=1)
+        self.assertRaises(ValueError, iter_search_file, 'abc', 'nonexistent.txt', block_size=0)
+
+    def test_search_string_buffers(self):
+        test_string = b'xxabcxxabcxxabc'
+        with open("file_buffers.txt", 'wb') as fh:
+            fh.write(test_string)
+
+        with open("file_buffers.txt", 'rb') as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffers = [bytearray(test_string), memoryview(test_string), array.array('B', test_string),
+                   memoryview(test_string).cast('B', (3, 5)), mapped]
+
+        for algorithm in boyermoore.ALGORITHMS:
+            pp_data = preprocess('abc', algorithm)
+            for buf in buffers:
+                self.assertEqual(search_string_pp(pp_data, buf), [2, 7, 12])
+                self.assertEqual(search_string_pp(pp_data, buf, start=3, end=14), [7])
+                self.assertEqual(list(iter_search_string_pp(pp_data, buf, start=3)), [7, 12])
+
+        for buf in buffers:
+            self.assertEqual(search_string_many(['abc', 'xa'], buf, start=2, end=12),
+                             [(0, 2), (1, 6), (0, 7)])
+
+        # Buffers that are not contiguous are searched in the order they are indexed in
+        strided = memoryview(b'xaxbxcabc')[1::2]
+        self.assertEqual(search_string('abc', strided), [0])
+        self.assertEqual(list(iter_search_string('abc', strided)), [0])
+        self.assertEqual(search_string_many(['abc', 'xb'], strided), [(0, 0)])
+        self.assertEqual(search_string('abc', memoryview(b'xxcbacba')[::-1]), [0, 3])
+
+        mapped.close()
+        os.remove("file_buffers.txt")
+
+    def test_search_string_range(self):
+        test_string = b'abcdabcdabcdabcd'
+        self.assertEqual(search_string('abcd', test_string, start=1), [4, 8, 12])
+        self.assertEqual(search_string('abcd', test_string, end=15), [0, 4, 8])
+        self.assertEqual(search_string('abcd', test_string, start=4, end=12), [4, 8])
+        self.assertEqual(search_string('abcd', test_string, start=5, end=8), [])
+        self.assertEqual(search_string('abcd', test_string, start=20), [])
+        self.assertEqual(search_string('abcd', test_string, False, start=5), [8])
+        self.assertEqual(search_string('abcd', test_string, stats=SearchStats(), start=1),
+                         [4, 8, 12])
+        self.assertEqual(search_string('cd', 'ճմabcdabcd', start=5), [8])
+        self.assertEqual(search_string('cd', 'ճմabcdabcd', start=5, byte_offsets=True), [10])
+        self.assertEqual(search_string_many(['ab', 'cd'], 'ճմabcdabcd', start=3, end=9),
+                         [(1, 4), (0, 6)])
+        self.assertRaises(ValueError, search_string, 'abc', b'abc', start=-1)
+        self.assertRaises(ValueError, search_string, 'abc', b'abc', start=2, end=1)
+
+    def test_search_string_segments_threads(self):
+        pattern = b'needle'
+        expected_offsets = [0, 4093, 65530, 65536 * 3 - 3, 1024 * 1024 - 6]
+        test_string = bytearray(make_big_bytes(pattern, expected_offsets))
+        pp_data = preprocess(pattern)
+        view = memoryview(test_string)
+
+        segment_size = len(test_string) // 4
+        plen = len(pattern)
+
+        def search_segment(start):
+            # Segments overlap by len(pattern) - 1 bytes, so each occurrence ends in one segment
+            end = start + segment_size + plen - 1
+            return search_string_pp(pp_data, view, start=start, end=end)
+
+        starts = range(0, len(test_string), segment_size)
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            actual_offsets = [o for r in executor.map(search_segment, starts) for o in r]
+
+        self.assertEqual(actual_offsets, expected_offsets)
+
+    def test_search_file_range(self):
+        filename = "file_range.txt"
+        with open(filename, 'wb') as fh:
+            fh.write(b'abcdabcdabcdabcd')
+
+        for func in [search_file, search_file_mmap]:
+            for stats in [None, SearchStats()]:
+                self.assertEqual(func('abcd', filename, stats=stats, start=1), [4, 8, 12])
+                self.assertEqual(func('abcd', filename, stats=stats, end=15), [0, 4, 8])
+                self.assertEqual(func('abcd', filename, stats=stats, start=4, end=12), [4, 8])
+                self.assertEqual(func('abcd', filename, False, stats=stats, start=5), [8])
+
+        self.assertEqual(search_file('abcd', filename, block_size=3, start=1, end=13), [4, 8])
+
+        with gzip.open(filename, 'wb') as fh:
+            fh.write(b'abcdabcdabcdabcd')
+
+        for func in [search_file, search_file_mmap]:
+            self.assertEqual(func('abcd', filename, start=1, end=13), [4, 8])
+
+        os.remove(filename)
+
+    def test_rsearch_string(self):
+        for pattern in TEST_DATA:
+            for algorithm in boyermoore.ALGORITHMS:
+                pp_data = preprocess(pattern, algorithm=algorithm)
+                for expected_offsets in TEST_DATA[pattern][:3]:
+                    test_string = make_big_bytes(pattern.encode(), expected_offsets)
+                    actual_offsets = rsearch_string_pp(pp_data, test_string, block_size=1000)
+                    self.assertEqual(actual_offsets, expected_offsets[::-1])
+
+                    actual_offsets = rsearch_string_pp(pp_data, test_string, max_matches=2)
+                    self.assertEqual(actual_offsets, expected_offsets[::-1][:2])
+
+        test_string = 'ճմabcdabcdաբcd'
+        self.assertEqual(rsearch_string('cd', test_string), [12, 8, 4])
+        self.assertEqual(rsearch_string('բcd', test_string, block_size=2), [11])
+        self.assertEqual(rsearch_string('cd', test_string, start=5, end=12), [8])
+        self.assertEqual(rsearch_string('abcd', b'abcdabcdabcd', 1, block_size=3), [8])
+        self.assertEqual(rsearch_string('aa', b'aaaa', max_matches=0), [])
+        self.assertEqual(rsearch_string_pp(preprocess('a?[c-d]', wildcards=True), b'abcxaxdx',
+                                           block_size=2), [4, 0])
+        self.assertRaises(ValueError, rsearch_string, 'abc', b'abc', max_matches=-1)
+        self.assertRaises(ValueError, rsearch_string, 'abc', b'abc', block_size=0)
+
+    def test_search_file_reverse(self):
+        filename = "file_reverse.txt"
+
+        for pattern in ["AAAAAAA", "ճմնշոչպ ջռսվ տրց"]:
+            pp_data = preprocess(pattern)
+            for expected_offsets in TEST_DATA[pattern]:
+                make_big_file(filename, pattern.encode(), expected_offsets)
+
+                for block_size in [1000, 65536]:
+                    actual_offsets = search_file_reverse_pp(pp_data, filename,
+                                                            block_size=block_size)
+                    self.assertEqual(actual_offsets, expected_offsets[::-1])
+
+                actual_offsets = search_file_reverse_pp(pp_data, filename, max_matches=1)
+                self.assertEqual(actual_offsets, expected_offsets[-1:])
+
+        with open(filename, 'wb') as fh:
+            fh.write(b'abcdabcdabcdabcd')
+
+        self.assertEqual(search_file_reverse('abcd', filename, 2, block_size=3), [12, 8])
+        self.assertEqual(search_file_reverse('abcd', filename, start=1, end=15), [8, 4])
+
+        with gzip.open(filename, 'wb') as fh:
+            fh.write(b'abcdabcdabcdabcd')
+
+        self.assertEqual(search_file_reverse('abcd', filename, 2), [12, 8])
+        self.assertEqual(search_file_reverse('abcd', filename, start=1, end=15), [8, 4])
+        self.assertEqual(search_file_reverse('abcd', filename, decompress=False), [])
+
+        os.remove(filename)
+
+    def test_follow_file(self):
+        filename = "file_follow.txt"
+        with open(filename, 'wb') as fh:
+            fh.write(b'xxERRORxx')
+
+        def append(data):
+            with open(filename, 'ab') as fh:
+                fh.write(data)
+
+        offsets = follow_file_pp(preprocess('ERROR'), filename, poll_interval=0.01, timeout=0.1)
+        self.assertEqual(next(offsets), 2)
+
+        # An occurrence split across two appends is found once it is complete
+        append(b'xxER')
+        append(b'ROR')
+        self.assertEqual(next(offsets), 11)
+
+        # Rotation: the rest of the old file is searched, then the new file from its start
+        append(b'ERROR')
+        os.rename(filename, filename + ".1")
+        with open(filename, 'wb') as fh:
+            fh.write(b'ERRORxxxxxx')
+
+        self.assertEqual(next(offsets), 16)
+        self.assertEqual(next(offsets), 0)
+
+        # Truncation: the search starts again at the start of the file, once the file is
+        # shorter than the data that has already been searched
+        with open(filename, 'wb') as fh:
+            fh.write(b'xERROR')
+
+        self.assertEqual(next(offsets), 1)
+        self.assertEqual(list(offsets), [])
+
+        self.assertEqual(list(follow_file('ERROR', filename, None, 0.01, timeout=0.05)), [])
+        self.assertEqual(list(follow_file('ERROR', filename, 2, 0.01, timeout=0.05)), [])
+        self.assertRaises(ValueError, follow_file, 'ERROR', filename, -1)
+
+        os.remove(filename)
+        os.remove(filename + ".1")
+
+    def test_follow_file_checkpoint(self):
+        filename = "file_follow_checkpoint.txt"
+        checkpoint = "file_follow_checkpoint.json"
+        with open(filename, 'wb') as fh:
+            fh.write(b'ERRORxERRORxERR')
+
+        offsets = follow_file('ERROR', filename, 0, 0.01, 3, checkpoint, timeout=0.05)
+        self.assertEqual(next(offsets), 0)
+        self.assertEqual(next(offsets), 6)
+        offsets.close()
+
+        # The search resumes after the last occurrence that the caller asked for the next
+        # occurrence after, and the partial occurrence at the end is searched again
+        with open(filename, 'ab') as fh:
+            fh.write(b'ORxxERROR')
+
+        offsets = follow_file('ERROR', filename, 0, 0.01, 3, checkpoint, timeout=0.05)
+        self.assertEqual(list(offsets), [6, 12, 19])
+        self.assertEqual(list(follow_file('ERROR', filename, 0, 0.01, 3, checkpoint, 0.05)), [])
+
+        # A checkpoint for a file that has since been replaced is not used
+        os.remove(filename)
+        with open(filename, 'wb') as fh:
+            fh.write(b'ERROR' + (b'x' * 30))
+
+        self.assertEqual(list(follow_file('ERROR', filename, 0, 0.01, 3, checkpoint, 0.05)), [0])
+
+        with open(checkpoint, 'w') as fh:
+            fh.write("not a checkpoint")
+
+        self.assertRaises(ValueError, list, follow_file('ERROR', filename, checkpoint=checkpoint))
+
+        os.remove(filename)
+        os.remove(checkpoint)
+
+    def test_async_search_file_pp(self):
+        filename = "file_async_pp.txt"
+
+        async def collect(pp_data, block_size, executor):
+            return [o async for o in async_search_file_pp(pp_data, filename, block_size, executor)]
+
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            for pattern in ["AAAAAAA", "ճմնշոչպ ջռսվ տրց"]:
+                pp_data = preprocess(pattern)
+                for expected_offsets in TEST_DATA[pattern]:
+                    make_big_file(filename, pattern.encode(), expected_offsets)
+
+                    for block_size in [1000, 65536]:
+                        actual_offsets = asyncio.run(collect(pp_data, block_size, None))
+                        self.assertEqual(actual_offsets, expected_offsets)
+
+                    actual_offsets = asyncio.run(collect(pp_data, 4096, executor))
+                    self.assertEqual(actual_offsets, expected_offsets)
+
+                    os.remove(filename)
+
+    def test_async_search_file_early_exit(self):
+        filename = "file_async_early_exit.txt"
+        with open(filename, 'wb') as fh:
+            fh.write(b'xxabcxxabcxx')
+
+        async def first():
+            offsets = async_search_file('abc', filename, block_size=1)
+            async for offset in offsets:
+                await offsets.aclose()
+                return offset
+
+        self.assertEqual(asyncio.run(first()), 2)
+        os.remove(filename)
+
+    @unittest.skipUnless(hasattr(os, "mkfifo"), "named pipes not supported")
+    def test_async_search_file_cancel(self):
+        filename = "file_async_cancel.fifo"
+        os.mkfifo(filename)
+
+        async def search():
+            found = []
+
+            async def consume():
+                async for offset in async_search_file('abc', filename, block_size=7):
+                    found.append(offset)
+
+            task = asyncio.ensure_future(consume())
+            writer = await asyncio.get_running_loop().run_in_executor(None, open, filename, 'wb')
+            writer.write(b'xxabcxx')
+            writer.flush()
+
+            while not found:
+                await asyncio.sleep(0.01)
+
+            # The next read waits for more data. Cancelling the task must not close the
+            # file under it, so the task only finishes once the read does.
+            closer = threading.Timer(0.3, writer.close)
+            closer.start()
+            task.cancel()
+            await asyncio.sleep(0.1)
+            self.assertFalse(task.done())
+
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            self.assertFalse(closer.is_alive())
+            return found
+
+        try:
+            self.assertEqual(asyncio.run(search()), [2])
+        finally:
+            os.remove(filename)
+
+    def test_async_search_stream_pp(self):
+        pattern = "hello, world!"
+        pp_data = preprocess(pattern)
+        test_string = make_big_bytes(pattern.encode(), TEST_OFFSETS[0])
+
+        async def collect(block_size):
+            reader = asyncio.StreamReader()
+            for pos in range(0, len(test_string), 1000):
+                reader.feed_data(test_string[pos:pos + 1000])
+            reader.feed_eof()
+
+            return [o async for o in async_search_stream_pp(pp_data, reader, block_size)]
+
+        async def concurrent_searches():
+            return await asyncio.gather(*[collect(block_size) for block_size in [1, 13, 4096]])
+
+        for actual_offsets in asyncio.run(concurrent_searches()):
+            self.assertEqual(actual_offsets, TEST_OFFSETS[0])
+
+    def test_async_search_stream_cancel(self):
+        async def search():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'xxabcxx')
+            found = []
+
+            async def consume():
+                async for offset in async_search_stream('abc', reader):
+                    found.append(offset)
+
+            # The stream is never closed, so the search only ends when the task is cancelled
+            task = asyncio.ensure_future(consume())
+            while not found:
+                await asyncio.sleep(0.01)
+
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            return found
+
+        self.assertEqual(asyncio.run(search()), [2])
+
+    def test_async_search_invalid_block_size(self):
+        self.assertRaises(ValueError, async_search_file, 'abc', 'nonexistent.txt', 0)
+        self.assertRaises(ValueError, async_search_stream, 'abc', None, 0)
+
+    def test_search_file_parallel_pp(self):
+        filename = "file_parallel_pp.txt"
+
+        for pattern in ["AAAAAAA", "ճմնշոչպ ջռսվ տրց"]:
+            pp_data = preprocess(pattern)
+            for expected_offsets in TEST_DATA[pattern]:
+                make_big_file(filename, pattern.encode(), expected_offsets)
+
+                actual_offsets = search_file_parallel_pp(pp_data, filename, workers=3)
+                self.assertEqual(actual_offsets, expected_offsets)
+
+                actual_offsets = search_file_parallel_pp(pp_data, filename, greedy=False, workers=3)
+                self.assertEqual(actual_offsets, [expected_offsets[0]])
+
+                os.remove(filename)
+
+    def test_search_file_parallel_boundaries(self):
+        filename = "file_parallel_boundaries.txt"
+        with open(filename, 'wb') as fh:
+            fh.write(b'aaaaaaaaaa')
+
+        # More workers than bytes, and ranges that split occurrences
+        for workers in [1, 2, 3, 4, 16]:
+            actual_offsets = search_file_parallel('aaa', filename, workers=workers)
+            self.assertEqual(actual_offsets, [0, 1, 2, 3, 4, 5, 6, 7])
+
+        os.remove(filename)
+
+    def test_search_file_parallel_stops_early(self):
+        filename = "file_parallel_stops_early.txt"
+        with open(filename, 'wb') as fh:
+            fh.write((b'abc' + (b'x' * 997)) * 4)
+
+        self.assertEqual(search_file_parallel('abc', filename, False, workers=4, block_size=64),
+                         [0])
+
+        # A worker stops as soon as an occurrence has been found in an earlier range, even
+        # though its own range has an occurrence, since the executor waits for it
+        pp_data = preprocess('abc')
+        first_match = multiprocessing.Value('q', 4)
+        self.addCleanup(boyermoore._parallel_init, None)
+        boyermoore._parallel_init(pp_data, first_match)
+
+        self.assertEqual(boyermoore._parallel_search_range(filename, 2000, 3000, False, 64, 2),
+                         [2000])
+        self.assertEqual(first_match.value, 2)
+        self.assertEqual(boyermoore._parallel_search_range(filename, 3000, 4000, False, 64, 3), [])
+        self.assertEqual(boyermoore._parallel_search_range(filename, 1000, 2000, False, 64, 1),
+                         [1000])
+        self.assertEqual(first_match.value, 1)
+
+        os.remove(filename)
+
+    def test_search_file_parallel_empty_file(self):
+        filename = "file_parallel_empty.txt"
+        with open(filename, 'wb') as fh:
+            pass
+
+        self.assertEqual(search_file_parallel('a', filename, workers=2), [])
+
+        os.remove(filename)
+
+    def test_search_file_parallel_invalid_args(self):
+        self.assertRaises(ValueError, search_file_parallel, 'abc', 'nonexistent.txt', workers=0)
+        self.assertRaises(ValueError, search_file_parallel, 'abc', 'nonexistent.txt', block_size=0)
+
+    def _write_compressed_files(self, data, pieces):
+        files = {
+            "compressed.gz": gzip.compress(data),
+            "compressed_members.gz": b"".join(gzip.compress(p) for p in pieces),
+            "compressed.bz2": bz2.compress(data),
+            "compressed.xz": lzma.compress(data),
+        }
+
+        if zstandard is not None:
+            compressor = zstandard.ZstdCompressor()
+            files["compressed.zst"] = compressor.compress(data)
+            files["compressed_frames.zst"] = b"".join(compressor.compress(p) for p in pieces)
+
+        for filename, compressed in files.items():
+            with open(filename, 'wb') as fh:
+                fh.write(compressed)
+
+        self.addCleanup(lambda: [os.remove(f) for f in files])
+        return list(files)
+
+    def test_search_file_compressed(self):
+        pattern = "hello, world!"
+        expected_offsets = TEST_OFFSETS[0]
+        data = make_big_bytes(pattern.encode(), expected_offsets)
+
+        # Member boundaries that split occurrences, and an empty member
+        pieces = [data[:503], data[503:2506], b"", data[2506:]]
+
+        for filename in self._write_compressed_files(data, pieces):
+            self.assertEqual(search_file(pattern, filename), expected_offsets)
+            self.assertEqual(search_file(pattern, filename, block_size=7), expected_offsets)
+            self.assertEqual(search_file(pattern, filename, greedy=False), [expected_offsets[0]])
+            self.assertEqual(search_file_mmap(pattern, filename), expected_offsets)
+            self.assertEqual(list(iter_search_file(pattern, filename, start=1000, end=4013)),
+                             [1000, 1500, 2000, 2500, 3000, 3500, 4000])
+            self.assertEqual(list(search_files(pattern, filename, workers=1)),
+                             [(filename, o) for o in expected_offsets])
+
+            stats = SearchStats()
+            search_file(pattern, filename, stats=stats)
+            self.assertEqual(stats.bytes_read, len(data))
+
+            self.assertNotEqual(search_file(pattern, filename, decompress=False),
+                                expected_offsets)
+            self.assertNotEqual(search_file_mmap(pattern, filename, decompress=False),
+                                expected_offsets)
+
+    def test_search_file_not_compressed(self):
+        filename = "not_compressed.txt"
+        with open(filename, 'wb') as fh:
+            fh.write(b"BZh9 is not a bz2 header\n\x1f\x8b")
+
+        self.assertEqual(search_file("BZh9", filename), [0])
+        self.assertEqual(search_file_parallel(b"\x1f\x8b", filename, workers=2), [25])
+
+        os.remove(filename)
+
+    @unittest.skipIf(zstandard is not None, "zstandard is installed")
+    def test_search_file_zstd_missing(self):
+        filename = "compressed.zst"
+        with open(filename, 'wb') as fh:
+            fh.write(b"\x28\xb5\x2f\xfd" + bytes(10))
+
+        self.assertRaises(ImportError, search_file, "abc", filename)
+        self.assertEqual(search_file("abc", filename, decompress=False), [])
+
+        os.remove(filename)
+
+    def test_search_file_parallel_compressed(self):
+        data = b"".join(bytes([97 + (i * i) % 3]) * (i % 5 + 1) for i in range(20000))
+        pieces = [data[i:i + 977] for i in range(0, len(data), 977)]
+        filenames = self._write_compressed_files(data, pieces)
+
+        for pattern in [b"aaaa", b"bcccbaaaab", b"a"]:
+            expected_offsets = search_string(pattern, data)
+
+            for filename in filenames:
+                for workers in [1, 2, 5]:
+                    actual_offsets = search_file_parallel(pattern, filename, workers=workers)
+                    self.assertEqual(actual_offsets, expected_offsets)
+
+                    actual_offsets = search_file_parallel(pattern, filename, greedy=False,
+                                                          workers=workers)
+                    self.assertEqual(actual_offsets, expected_offsets[:1])
+
+    def test_search_file_parallel_false_gzip_header(self):
+        # An uncompressed member containing a gzip header, so that the file cannot be
+        # split there
+        data = (b"xyz" * 5000 + gzip.compress(b"abc")) * 4
+        filename = "compressed_stored.gz"
+        with open(filename, 'wb') as fh:
+            fh.write(gzip.compress(data, compresslevel=0) + gzip.compress(b"xyzabc"))
+
+        expected_offsets = search_string(b"zx", data + b"xyzabc")
+        self.assertEqual(search_file_parallel(b"zx", filename, workers=4), expected_offsets)
+
+        os.remove(filename)
+
+    def test_indexed_file_search(self):
+        filename = "indexed_file.txt"
+        index_path = "indexed_file.bmi"
+        rng = random.Random(99)
+        data = bytes(rng.choice(b"abcdefgh ") for _ in range(20000))
+
+        with open(filename, 'wb') as fh:
+            fh.write(data)
+
+        # Small blocks, so that occurrences span blocks and patterns are longer than blocks
+        build_index(filename, index_path, block_size=64, signature_size=16)
+
+        with IndexedFile(filename, index_path) as indexed:
+            self.assertEqual(indexed.indexed_size, len(data))
+            self.assertEqual(indexed.blocks, 313)
+
+            patterns = [b"a", b"ab", b"abc", b"zzz", data[5000:5200], data[19990:]]
+            patterns += [data[i:i + rng.randint(3, 12)] for i in range(0, 19000, 997)]
+
+            for pattern in patterns:
+                expected_offsets = search_string(pattern, data)
+                self.assertEqual(indexed.search(pattern), expected_offsets)
+                self.assertEqual(indexed.search(pattern, greedy=False), expected_offsets[:1])
+
+            pp_data = preprocess(b"ABC", ignore_case=True)
+            self.assertEqual(indexed.search_pp(pp_data), search_string_pp(pp_data, data))
+            self.assertEqual(indexed.search("fgh"), search_string(b"fgh", data))
+
+        os.remove(filename)
+        os.remove(index_path)
+
+    def test_indexed_file_update(self):
+        filename = "indexed_update.txt"
+        index_path = "indexed_update.bmi"
+        data = b"xyz" * 100 + b"hello, world!"
+
+        with open(filename, 'wb') as fh:
+            fh.write(data)
+
+        build_index(filename, index_path, block_size=32, signature_size=8)
+        index_size = os.path.getsize(index_path)
+
+        with IndexedFile(filename, index_path) as indexed:
+            with open(filename, 'ab') as fh:
+                fh.write(b" hello, world!")
+
+            # Appended data is searched directly until the index is updated
+            for _ in range(2):
+                self.assertEqual(indexed.search("world! hello"), [307])
+                self.assertEqual(indexed.search("hello"), [300, 314])
+                indexed.update()
+
+            self.assertEqual(indexed.indexed_size, len(data) + 14)
+            self.assertEqual(os.path.getsize(index_path), index_size + 8)
+
+            # Anything other than appending makes the index out of date
+            with open(filename, 'wb') as fh:
+                fh.write(b"hello")
+
+            self.assertRaises(ValueError, indexed.search, "hello")
+            indexed.update()
+            self.assertEqual(indexed.search("hello"), [0])
+
+            # Overwriting indexed data, without changing the size of the file, is
+            # detected by the checksum of the indexed data
+            with open(filename, 'wb') as fh:
+                fh.write(b"xyz" * 100 + b"hello, world!")
+
+            indexed.update()
+
+            with open(filename, 'r+b') as fh:
+                fh.write(b"world")
+
+            self.assertEqual(indexed.search("world"), [307])
+            indexed.update()
+            self.assertEqual(indexed.search("world"), [0, 307])
+
+        os.remove(filename)
+        os.remove(index_path)
+
+    def test_indexed_file_invalid(self):
+        filename = "indexed_invalid.txt"
+        with open(filename, 'wb') as fh:
+            fh.write(b"not an index")
+
+        self.assertRaises(ValueError, IndexedFile, filename, filename)
+        self.assertRaises(ValueError, build_index, filename, filename)
+        self.assertRaises(ValueError, build_index, filename, "indexed_invalid.bmi", block_size=0)
+        self.assertRaises(ValueError, build_index, filename, "indexed_invalid.bmi",
+                          signature_size=0)
+
+        os.remove(filename)
+
+    def _make_file_tree(self, dirname):
+        os.makedirs(os.path.join(dirname, "sub", "subsub"))
+
+        files = {
+            os.path.join(dirname, "a.log"): b"xxabcxxabc",
+            os.path.join(dirname, "b.txt"): b"abc",
+            os.path.join(dirname, "sub", "c.log"): b"xxxxxxxxx",
+            os.path.join(dirname, "sub", "subsub", "d.log"): b"xabcx",
+        }
+
+        for filename, data in files.items():
+            with open(filename, 'wb') as fh:
+                fh.write(data)
+
+    def test_search_files_directory(self):
+        dirname = "search_files_directory"
+        self._make_file_tree(dirname)
+
+        for workers in [1, 2]:
+            actual = set(search_files('abc', dirname, workers=workers))
+            self.assertEqual(actual, {
+                (os.path.join(dirname, "a.log"), 2),
+                (os.path.join(dirname, "a.log"), 7),
+                (os.path.join(dirname, "b.txt"), 0),
+                (os.path.join(dirname, "sub", "subsub", "d.log"), 1),
+            })
+
+            actual = set(search_files('abc', dirname, workers=workers, recursive=False))
+            self.assertEqual(actual, {
+                (os.path.join(dirname, "a.log"), 2),
+                (os.path.join(dirname, "a.log"), 7),
+                (os.path.join(dirname, "b.txt"), 0),
+            })
+
+        shutil.rmtree(dirname)
+
+    def test_search_files_pp_glob(self):
+        dirname = "search_files_pp_glob"
+        self._make_file_tree(dirname)
+        pp_data = preprocess('abc')
+
+        for workers in [1, 2]:
+            actual = search_files_pp(pp_data, os.path.join(dirname, "**", "*.log"),
+                                     greedy=False, workers=workers)
+            self.assertEqual(set(actual), {
+                (os.path.join(dirname, "a.log"), 2),
+                (os.path.join(dirname, "sub", "subsub", "d.log"), 1),
+            })
+
+            actual = search_files_pp(pp_data, [os.path.join(dirname, "b.txt"),
+                                               os.path.join(dirname, "*.log")], workers=workers)
+            self.assertEqual(sorted(actual), [
+                (os.path.join(dirname, "a.log"), 2),
+                (os.path.join(dirname, "a.log"), 7),
+                (os.path.join(dirname, "b.txt"), 0),
+            ])
+
+        shutil.rmtree(dirname)
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "symbolic links not supported")
+    def test_search_files_broken_symlink(self):
+        dirname = "search_files_broken_symlink"
+        self._make_file_tree(dirname)
+        broken = os.path.join(dirname, "broken.log")
+        os.symlink("nonexistent", broken)
+
+        for workers in [1, 2]:
+            actual = set(search_files('abc', dirname, workers=workers, recursive=False))
+            self.assertEqual(actual, {
+                (os.path.join(dirname, "a.log"), 2),
+                (os.path.join(dirname, "a.log"), 7),
+                (os.path.join(dirname, "b.txt"), 0),
+            })
+
+            errors = []
+            actual = set(search_files('abc', dirname, workers=workers, recursive=False,
+                                      onerror=lambda f, e: errors.append((f, type(e)))))
+            self.assertEqual(len(actual), 3)
+            self.assertEqual(errors, [(broken, FileNotFoundError)])
+
+            def onerror(filename, e):
+                raise e
+
+            self.assertRaises(FileNotFoundError, list,
+                              search_files('abc', dirname, workers=workers, onerror=onerror))
+
+        shutil.rmtree(dirname)
+
+    def test_search_files_invalid_args(self):
+        self.assertRaises(ValueError, search_files, 'abc', 'nonexistent', workers=0)
+        self.assertRaises(ValueError, search_files, 'abc', 'nonexistent', block_size=0)
+
+    def test_search_string_many(self):
+        patterns = ["abcd", "bc", "", b"d", "ճմնշ", "abcd"]
+        test_string = "xxabcdxxճմնշxd".encode()
+
+        expected = [(0, 2), (5, 2), (1, 3), (3, 5), (4, 8), (3, 17)]
+        self.assertEqual(search_string_many(patterns, test_string), expected)
+
+    def test_search_string_many_str(self):
+        patterns = ["abcd", "bc", "", b"d", "ճմնշ", "abcd", b"\x80"]
+        test_string = "xxabcdxxճմնշxd"
+
+        expected = [(0, 2), (5, 2), (1, 3), (3, 5), (4, 8), (3, 13)]
+        self.assertEqual(search_string_many(patterns, test_string), expected)
+
+    def test_search_string_many_pp(self):
+        patterns = list(TEST_DATA)
+        pp_data = preprocess_many(patterns)
+
+        for index, pattern in enumerate(patterns):
+            for expected_offsets in TEST_DATA[pattern][:3]:
+                test_string = make_big_bytes(pattern.encode(), expected_offsets)
+                actual = search_string_many_pp(pp_data, test_string)
+
+                # Some patterns also occur inside other patterns, so only check the
+                # occurrences of the pattern that was inserted
+                actual_offsets = [o for i, o in actual if i == index]
+                self.assertEqual(actual_offsets, expected_offsets)
+
+    def test_search_file_many_pp(self):
+        filename = "file_many_pp.txt"
+        patterns = ["AAAAA", "AAAAAA", "hello, world!", "ponm"]
+        pp_data = preprocess_many(patterns)
+
+        make_big_file(filename, b"AAAAAA", [7, 4096])
+
+        for block_size in [1, 5, 4096]:
+            actual = search_file_many_pp(pp_data, filename, block_size)
+            self.assertEqual(actual, [(0, 7), (1, 7), (0, 8), (0, 4096), (1, 4096), (0, 4097)])
+
+        self.assertEqual(search_file_many(["hello"], filename), [])
+
+        with open(filename, 'rb') as fh:
+            data = fh.read()
+
+        with open(filename, 'wb') as fh:
+            fh.write(gzip.compress(data))
+
+        self.assertEqual(search_file_many_pp(pp_data, filename, 1000),
+                         [(0, 7), (1, 7), (0, 8), (0, 4096), (1, 4096), (0, 4097)])
+        self.assertEqual(search_file_many([b"\x1f\x8b"], filename), [])
+        self.assertEqual(search_file_many([b"\x1f\x8b"], filename, decompress=False), [(0, 0)])
+
+        os.remove(filename)
+
+    def test_preprocess_many_invalid_type(self):
+        self.assertRaises(ValueError, preprocess_many, ["abc", 5.5])
+        self.assertRaises(ValueError, search_file_many, ["abc"], "nonexistent.txt", 0)
+
+    def test_pattern_to_bytes(self):
+        test_string = make_big_bytes("ճմնշոչպ ջռսվ տրց".encode(), TEST_OFFSETS[0])
+
+        for algorithm, compact_table in [("bm", True), ("bm", False), ("horspool", None),
+                                         ("raita", None), ("sunday", None), ("two-way", None),
+                                         ("byte-class", None), ("rare-byte", None)]:
+            for pattern in ["", "q", "ճմնշոչպ ջռսվ տրց"]:
+                pp_data = preprocess(pattern, compact_table, algorithm)
+                data = pp_data.to_bytes()
+
+                for loaded in [Pattern.from_bytes(data), Pattern.from_bytes(memoryview(data)),
+                               pickle.loads(pickle.dumps(pp_data))]:
+                    self.assertEqual(loaded.to_bytes(), data)
+                    self.assertEqual(loaded.pattern, pattern.encode())
+                    self.assertEqual(loaded.compact, bool(compact_table))
+                    self.assertEqual(loaded.algorithm, algorithm)
+                    self.assertEqual(len(loaded), len(pattern.encode()))
+                    self.assertEqual(search_string_pp(loaded, test_string),
+                                     search_string_pp(pp_data, test_string))
+
+    def test_pattern_from_bytes_invalid(self):
+        data = preprocess("abc").to_bytes()
+
+        self.assertRaises(ValueError, Pattern.from_bytes, data[:10])
+        self.assertRaises(ValueError, Pattern.from_bytes, data[:-1])
+        self.assertRaises(ValueError, Pattern.from_bytes, b'XXXX' + data[4:])
+
+    def test_pattern_from_bytes_corrupted(self):
+        def corrupted(pp_data, table, index, value):
+            getattr(pp_data, table)[index] = value
+            return pp_data.to_bytes()
+
+        # Each of these would make a search loop forever, or read outside of the data
+        for data in [
+            corrupted(preprocess("hello x", algorithm="horspool"), "R", ord("x"), -100000),
+            corrupted(preprocess("hello x", algorithm="raita"), "R", ord("x"), 0),
+            corrupted(preprocess("hello x", algorithm="sunday"), "R", ord("x"), 9),
+            corrupted(preprocess("hello x", compact_table=True, algorithm="bm"), "R", 0, 7),
+            corrupted(preprocess("hello x", compact_table=True, algorithm="bm"), "L", 3, 6),
+            corrupted(preprocess("hello x", compact_table=True, algorithm="bm"), "F", 1, 7),
+            corrupted(preprocess("hello x", compact_table=False, algorithm="bm"), "L", 2, -2),
+            corrupted(preprocess("hello x", algorithm="two-way"), "L", 0, 7),
+            corrupted(preprocess("hello x", algorithm="two-way"), "L", 1, 0),
+            corrupted(preprocess("hello x", algorithm="two-way"), "L", 2, 2),
+            corrupted(preprocess("hello x", algorithm="rare-byte"), "L", 0, -1),
+            corrupted(preprocess("hello x", ignore_case=True), "R", ord("x"), 0),
+            corrupted(preprocess("hello x", ignore_case=True), "L", 1, 5),
+        ]:
+            self.assertRaises(ValueError, Pattern.from_bytes, data)
+
+        pp_data = preprocess("hello x", compact_table=False, algorithm="bm")
+        pp_data.R[ord("x")][3] = 3
+        self.assertRaises(ValueError, Pattern.from_bytes, pp_data.to_bytes())
+
+        # Byte class patterns hold a mask for each class, so L[0] must match the data size
+        pp_data = preprocess("he?lo", wildcards=True)
+        pp_data.L[0] = 6
+        self.assertRaises(ValueError, Pattern.from_bytes, pp_data.to_bytes())
+
+    def test_pattern_to_bytes_byte_class(self):
+        pp_data = preprocess("ab[0-9]?", ignore_case=True, wildcards=True)
+        data = pp_data.to_bytes()
+        loaded = Pattern.from_bytes(data)
+
+        self.assertEqual(loaded.to_bytes(), data)
+        self.assertEqual(loaded.pattern, b"ab[0-9]?")
+        self.assertEqual(len(loaded), 4)
+        self.assertEqual(search_string_pp(loaded, b"xxAB1cab2"), [2])
+        self.assertRaises(ValueError, Pattern.from_bytes, data[:-8])
+
+    def test_pattern_unpack(self):
+        R, L, F, P = preprocess("abc")
+        self.assertEqual(list(P), [ord("a"), ord("b"), ord("c")])
+        self.assertEqual(repr(preprocess("abc", algorithm="sunday")),
+                         "Pattern(b'abc', algorithm='sunday')")
+
+    def test_pattern_cache(self):
+        pattern_cache_clear()
+        test_string = b'xxabcxxabc'
+
+        self.assertEqual(search_string('abc', test_string), [2, 7])
+        self.assertEqual(search_string(b'abc', test_string), [2, 7])
+        self.assertEqual(list(iter_search_string('abc', test_string)), [2, 7])
+
+        info = pattern_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 1, 1))
+
+        pattern_cache_clear()
+        info = pattern_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (0, 0, 0))
+
+    def test_backend(self):
+        self.assertIn(boyermoore.backend, ["native", "python"])
+        self.assertEqual(boyermoore.backend == "native", boyermoore._speedups is not None)
+
+    @unittest.skipIf(boyermoore._speedups is None, "native backend is not available")
+    def test_native_backend_matches_python(self):
+        rng = random.Random(1234)
+
+        for _ in range(2000):
+            alphabet = rng.choice([b"a", b"ab", b"abc", bytes(range(256))])
+            pattern = bytes(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+            data = bytes(rng.choice(alphabet) for _ in range(rng.randint(0, 300)))
+            greedy = rng.choice([True, False])
+
+            for algorithm, compact_table in [("bm", True), ("bm", False), ("horspool", None),
+                                             ("raita", None), ("sunday", None), ("two-way", None),
+                                             ("byte-class", None), ("rare-byte", None)]:
+                R, L, F, P = preprocess(pattern, compact_table, algorithm)
+                if algorithm != "bm":
+                    name = "scan_" + algorithm.replace("-", "_")
+                else:
+                    name = "scan_compact" if compact_table else "scan"
+
+                results = []
+                for func in [boyermoore._SCANNERS[name], getattr(boyermoore._speedups, name)]:
+                    matches = []
+                    state = func(R, L, F, P, data, len(data), len(P) - 1, -1, 100, greedy, matches)
+                    results.append((state, matches))
+
+                self.assertEqual(results[0], results[1])
+
+    @unittest.skipIf(boyermoore._speedups is None, "native backend is not available")
+    def test_native_block_signature_matches_python(self):
+        rng = random.Random(4321)
+
+        for _ in range(200):
+            data = bytes(rng.choice(b"abcdefgh") for _ in range(rng.randint(0, 300)))
+            start = rng.randint(0, 300)
+            end = rng.randint(start, 320)
+            size = rng.randint(1, 40)
+
+            signatures = [bytearray(size), bytearray(size)]
+            boyermoore._block_signature(data, start, end, signatures[0])
+            boyermoore._speedups.block_signature(data, start, end, signatures[1])
+            self.assertEqual(signatures[0], signatures[1])
+
+    @unittest.skipIf(boyermoore._speedups is None, "native backend is not available")
+    def test_native_suffix_lengths_matches_python(self):
+        rng = random.Random(4321)
+
+        for _ in range(500):
+            size = rng.randint(0, 300)
+            pattern = bytes(rng.choice(b"ab" if size % 2 else b"abcdefgh") for _ in range(size))
+
+            N = [array.array('q', [0]) * size, array.array('q', [0]) * size]
+            boyermoore._suffix_lengths(pattern, N[0])
+            boyermoore._speedups.suffix_lengths(pattern, N[1])
+            self.assertEqual(N[0], N[1])
+
+        self.assertRaises(ValueError, boyermoore._speedups.suffix_lengths, b"abc",
+                          array.array('q', [0, 0]))
+
+    @unittest.skipIf(boyermoore._speedups is None, "native backend is not available")
+    def test_native_backend_invalid_tables(self):
+        R, L, F, P = preprocess("abc", compact_table=False, algorithm="bm")
+        self.assertRaises(ValueError, boyermoore._speedups.scan, R[:10], L, F, P, b"abc", 3, 2, -1, 0, True, [])
+        self.assertRaises(TypeError, boyermoore._speedups.scan, R, list(L), F, P, b"abc", 3, 2, -1, 0, True, [])
+
+        R, L, F, P = preprocess("abc", algorithm="horspool")
+        self.assertRaises(ValueError, boyermoore._speedups.scan_compact, R, L, F, P, b"abc", 3, 2, -1, 0, True, [])
+        self.assertRaises(ValueError, boyermoore._speedups.scan_horspool, R[:10], L, F, P, b"abc", 3, 2, -1, 0, True, [])
+
+        R, L, F, P = preprocess("abc", algorithm="two-way")
+        self.assertRaises(ValueError, boyermoore._speedups.scan_two_way, R, L[:2], F, P, b"abc", 3, 2, -1, 0, True, [])
+        self.assertRaises(ValueError, boyermoore._speedups.scan_two_way, R, array.array('q', [4, 1, 0]), F, P, b"abc", 3, 2, -1, 0, True, [])
+        self.assertRaises(ValueError, boyermoore._speedups.scan_two_way, R, array.array('q', [1, 5, 0]), F, P, b"abc", 3, 2, -1, 0, True, [])
+
+        # Shifts that would move backwards, or past the start of T
+        R, L, F, P = preprocess("abc", algorithm="horspool")
+        R[ord("x")] = -100000
+        self.assertRaises(ValueError, boyermoore._speedups.scan_horspool, R, L, F, P, b"xxxabc", 6, 2, -1, 0, True, [])
+        R, L, F, P = preprocess("abc", algorithm="sunday")
+        self.assertRaises(ValueError, boyermoore._speedups.scan_sunday, R, L, F, P, b"xxxabc", 6, 1, -1, 0, True, [])
+
+        R, L, F, P = preprocess("abc", compact_table=True, algorithm="bm")
+        L[2] = 5
+        self.assertRaises(ValueError, boyermoore._speedups.scan_compact, R, L, F, P, b"xxxabc", 6, 2, -1, 0, True, [])
+
+        R, L, F, P = preprocess("abc", compact_table=False, algorithm="bm")
+        R[ord("x")][2] = -100000
+        matches = []
+        boyermoore._speedups.scan(R, L, F, P, b"xxxabc", 6, 2, -1, 0, True, matches)
+        self.assertEqual(matches, [3])
+
     def test_preprocess_invalid_type(self):
         self.assertRaises(ValueError, preprocess, 5.5)
         self.assertRaises(ValueError, preprocess, {})
@@ -0,0 +1,131 @@
+import contextlib
+import gzip
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from boyermoore.__main__ import main
+
+
+TEST_TEXT = b"one\ntwo foo\nthree\nfour\nfive foo foo\nsix\nseven\neight\nnine\nten foo"
+
+
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+        self.a_txt = self.write_file("a.txt", TEST_TEXT)
+        self.b_txt = self.write_file("b.txt", b"nothing here\n")
+        self.sub_dir = os.path.join(self.tmpdir.name, "sub")
+        os.mkdir(self.sub_dir)
+        self.c_txt = self.write_file(os.path.join("sub", "c.txt"), b"x foo\n")
+
+    def write_file(self, name, data):
+        filename = os.path.join(self.tmpdir.name, name)
+        with open(filename, 'wb') as fh:
+            fh.write(data)
+
+        return filename
+
+    def run_main(self, *args):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        stderr = io.TextIOWrapper(io.BytesIO())
+
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            status = main(list(args))
+
+        return status, stdout.buffer.getvalue(), stderr.buffer.getvalue()
+
+    def test_cli_matching_lines(self):
+        for args in [[], ["--mmap"], ["--block-size", "1"]]:
+            status, out, _ = self.run_main("foo", self.a_txt, *args)
+            self.assertEqual(status, 0)
+            self.assertEqual(out, b"two foo\nfive foo foo\nten foo\n")
+
+        status, out, _ = self.run_main("zzz", self.a_txt)
+        self.assertEqual(status, 1)
+        self.assertEqual(out, b"")
+
+    def test_cli_byte_offset_context(self):
+        expected = (b"one\n8:two foo\nthree\nfour\n28:five foo foo\n32:five foo foo\nsix\n"
+                    b"--\nnine\n61:ten foo\n")
+
+        for args in [[], ["--mmap"], ["--block-size", "3"]]:
+            status, out, _ = self.run_main("-b", "-C", "1", "foo", self.a_txt, *args)
+            self.assertEqual(out, expected)
+
+    def test_cli_count(self):
+        status, out, _ = self.run_main("-c", "foo", self.a_txt, self.b_txt, self.sub_dir)
+        self.assertEqual(status, 0)
+        self.assertEqual(out, (f"{self.a_txt}:4\n{self.b_txt}:0\n{self.c_txt}:1\n").encode())
+
+        status, out, _ = self.run_main("-c", "--first", "foo", self.a_txt)
+        self.assertEqual(out, b"1\n")
+
+    def test_cli_first(self):
+        for args in [[], ["--mmap"], ["--block-size", "1"]]:
+            status, out, _ = self.run_main("--first", "-C", "1", "foo", self.a_txt, *args)
+            self.assertEqual(out, b"one\ntwo foo\nthree\n")
+
+    def test_cli_patterns_file(self):
+        patterns = self.write_file("patterns.txt", b"six\nfoo\n\n")
+
+        status, out, _ = self.run_main("-f", patterns, self.a_txt)
+        self.assertEqual(out, b"two foo\nfive foo foo\nsix\nten foo\n")
+
+        status, out, _ = self.run_main("-f", patterns, "-c", self.a_txt, self.b_txt)
+        self.assertEqual(out, (f"{self.a_txt}:5\n{self.b_txt}:0\n").encode())
+
+    def test_cli_jobs(self):
+        args = ["-b", "foo", self.tmpdir.name, self.a_txt]
+        status, expected, _ = self.run_main(*args)
+
+        for jobs_args in [["-j", "2"], ["-j", "2", "--mmap"]]:
+            status, out, _ = self.run_main(*(jobs_args + args))
+            self.assertEqual(status, 0)
+            self.assertEqual(out, expected)
+
+    def test_cli_stats(self):
+        status, out, err = self.run_main("--stats", "-c", "foo", self.a_txt, self.b_txt)
+        self.assertTrue(err.startswith(f"files: 2, bytes: {len(TEST_TEXT) + 13}, "
+                                       "matches: 4, ".encode()))
+
+    def test_cli_errors(self):
+        missing = os.path.join(self.tmpdir.name, "missing.txt")
+
+        for args in [[], ["-j", "2"]]:
+            status, out, err = self.run_main("foo", missing, self.a_txt, *args)
+            self.assertEqual(status, 2)
+            self.assertIn(b"missing.txt", err)
+            self.assertIn(b"a.txt:ten foo\n", out)
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, main, [])
+            self.assertRaises(SystemExit, main, ["-j", "0", "foo"])
+            self.assertRaises(SystemExit, main, ["-f", missing])
+
+    def test_cli_compressed(self):
+        a_gz = self.write_file("a.gz", gzip.compress(TEST_TEXT[:20]) + gzip.compress(TEST_TEXT[20:]))
+        bad_gz = self.write_file("bad.gz", gzip.compress(TEST_TEXT)[:30])
+
+        for args in [[], ["--mmap"], ["-j", "2"]]:
+            status, out, _ = self.run_main("-b", "foo", a_gz, *args)
+            self.assertEqual(out, b"8:two foo\n28:five foo foo\n32:five foo foo\n61:ten foo\n")
+
+        status, out, _ = self.run_main("-c", "--no-decompress", "foo", a_gz)
+        self.assertEqual(status, 1)
+
+        status, out, err = self.run_main("-c", "foo", bad_gz, self.a_txt)
+        self.assertEqual(status, 2)
+        self.assertIn(b"bad.gz", err)
+        self.assertIn(b"a.txt:4\n", out)
+
+    def test_cli_stdin(self):
+        proc = subprocess.run([sys.executable, "-m", "boyermoore", "-b", "foo"], input=TEST_TEXT,
+                              stdout=subprocess.PIPE)
+        self.assertEqual(proc.returncode, 0)
+        self.assertEqual(proc.stdout, b"8:two foo\n28:five foo foo\n32:five foo foo\n61:ten foo\n")